@@ -1,15 +1,17 @@
 # app.py
-from flask import Flask, send_from_directory
+from flask import Flask, jsonify
 from models import db
+from database import init_engine
 from config import Config
 from flask_cors import CORS
 from flask_migrate import Migrate
 from flask_jwt_extended import JWTManager
-from token_blacklist import blacklist
-import os
+import token_blacklist
+import jobs
+from passwords import HasherBusy
 
 # Import Blueprints
-from routes import auth_bp, admin_bp, hotel_bp, worker_bp, media_bp
+from routes import auth_bp, admin_bp, hotel_bp, worker_bp, media_bp, events_bp, jobs_bp
 from routes.superadmin_routes import superadmin_bp
 
 def create_app():
@@ -17,11 +19,13 @@ def create_app():
     app.config.from_object(Config)
 
     #  Enable CORS for React frontend with credentials
-    CORS(app, resources={r"/api/*": {"origins": "http://localhost:5173"}}, supports_credentials=True)
+    CORS(app, resources={r"/api/*": {"origins": "http://localhost:5173"}}, supports_credentials=True,
+         expose_headers=["X-Total-Count"])  # include_total on NDJSON listings
 
 
     #  Initialize database and JWT manager
     db.init_app(app)
+    init_engine(app)
     jwt = JWTManager(app)
 
     #  Register Blueprints
@@ -31,17 +35,24 @@ def create_app():
     app.register_blueprint(worker_bp, url_prefix="/api")
     app.register_blueprint(superadmin_bp, url_prefix="/api")
     app.register_blueprint(media_bp, url_prefix="/api")
+    app.register_blueprint(events_bp, url_prefix="/api")
+    app.register_blueprint(jobs_bp, url_prefix="/api")
 
-    #  Serve uploaded media files from /uploads folder
-    @app.route('/api/uploads/<path:filename>')
-    def uploaded_file(filename):
-        uploads_dir = os.path.join(app.root_path, 'uploads')
-        return send_from_directory(uploads_dir, filename)
+    #  Uploaded media files are served by media_bp.serve_uploaded_file
     
     
     @jwt.token_in_blocklist_loader
     def check_if_token_revoked(jwt_header, jwt_payload):
-        return jwt_payload['jti'] in blacklist
+        return token_blacklist.is_revoked(jwt_payload)
+
+    @app.before_request
+    def start_job_workers():
+        # Background job threads for this process (JOBS_EMBEDDED_WORKERS); a no-op after the first request
+        jobs.start_embedded(app)
+
+    @app.errorhandler(HasherBusy)
+    def password_hashing_busy(e):
+        return jsonify({'error': 'Too many login attempts right now, please retry'}), 503, {'Retry-After': '2'}
 
 
     return app
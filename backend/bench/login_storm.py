@@ -0,0 +1,159 @@
+# backend/bench/login_storm.py
+#
+# A shift-start burst of logins and token refreshes against a threaded dev
+# server, with GET /api/areas polled alongside to show what the burst does to
+# the rest of the API.
+#
+# A throwaway SQLite database is seeded with --employees accounts that share
+# one password, hashed with the configured PASSWORD_HASH_METHOD so that no
+# login re-hashes. --concurrency clients then share --logins logins. After
+# each login the client calls POST /api/refresh --refreshes times with the
+# refresh token it got.
+#
+# Usage, from the repository root:
+#
+#     python backend/bench/login_storm.py [--logins 200] [--concurrency 32] [--hash-workers 0]
+#
+# --hash-workers sets PASSWORD_HASH_WORKERS (0 = hash in the request thread).
+# Compare runs with 0 and with the number of spare cores.
+import argparse
+import json
+import logging
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+parser = argparse.ArgumentParser(description='Login and refresh burst against a threaded dev server.')
+parser.add_argument('--logins', type=int, default=200, help='logins in the burst')
+parser.add_argument('--concurrency', type=int, default=32, help='concurrent clients')
+parser.add_argument('--refreshes', type=int, default=5, help='refreshes after each login')
+parser.add_argument('--employees', type=int, default=200, help='accounts to log in as')
+parser.add_argument('--hash-workers', type=int, default=0, help='PASSWORD_HASH_WORKERS')
+args = parser.parse_args()
+
+# Config reads the environment when it is imported
+tmp_dir = tempfile.mkdtemp(prefix='hotel-bench-')
+os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(tmp_dir, 'bench.db')}"
+os.environ['UPLOAD_FOLDER'] = os.path.join(tmp_dir, 'uploads')
+os.environ['CERTIFICATE_FOLDER'] = os.path.join(tmp_dir, 'certificates')
+os.environ['JOBS_EMBEDDED_WORKERS'] = '0'
+os.environ['PASSWORD_HASH_WORKERS'] = str(args.hash_workers)
+
+from werkzeug.serving import make_server
+from app import create_app
+from models import db, City, Employee
+from passwords import hash_password
+
+PASSWORD = 'shift-start'
+
+
+def seed():
+    db.create_all()
+    city = City(name='Pune')
+    db.session.add(city)
+    db.session.flush()
+    password = hash_password(PASSWORD)
+    db.session.add_all(Employee(
+        name=f"worker-{i}", username=f"worker-{i}", email=f"worker-{i}@example.com", phone='0000000000',
+        address='-', password=password, role='worker', city_id=city.id, is_active=True
+    ) for i in range(args.employees))
+    db.session.commit()
+
+
+def call(url, body=None, token=None):
+    """(seconds, status code, JSON body or None) of one request."""
+    headers = {'Content-Type': 'application/json'}
+    if token:
+        headers['Authorization'] = f"Bearer {token}"
+    data = json.dumps(body).encode() if body is not None else None
+    started = time.perf_counter()
+    try:
+        with urllib.request.urlopen(urllib.request.Request(url, data=data, headers=headers)) as response:
+            status, payload = response.status, json.load(response)
+    except urllib.error.HTTPError as e:
+        status, payload = e.code, None
+    return time.perf_counter() - started, status, payload
+
+
+def percentile(values, fraction):
+    if not values:
+        return float('nan')
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def summary(name, seconds):
+    return (f"{name} p50 {statistics.median(seconds) * 1000 if seconds else float('nan'):.0f} ms "
+            f"p95 {percentile(seconds, 0.95) * 1000:.0f} ms (n={len(seconds)})")
+
+
+def main():
+    app = create_app()
+    with app.app_context():
+        seed()
+
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)  # no access log line per request
+    server = make_server('127.0.0.1', 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f"http://127.0.0.1:{server.server_port}/api"
+
+    lock = threading.Lock()
+    logins, refreshes, areas, statuses = [], [], [], {}
+    burst_over = threading.Event()
+
+    def record(bucket, seconds, status):
+        with lock:
+            bucket.append(seconds)
+            statuses[status] = statuses.get(status, 0) + 1
+
+    def client(first):
+        for n in range(first, args.logins, args.concurrency):
+            seconds, status, payload = call(f"{base}/login", {
+                'email': f"worker-{n % args.employees}@example.com", 'password': PASSWORD})
+            record(logins, seconds, status)
+            if status != 200:
+                continue
+            for _ in range(args.refreshes):
+                seconds, status, _ = call(f"{base}/refresh", {}, token=payload['refresh_token'])
+                record(refreshes, seconds, status)
+
+    def poll_areas():
+        while not burst_over.is_set():
+            areas.append(call(f"{base}/areas")[0])
+            time.sleep(0.01)
+
+    poller = threading.Thread(target=poll_areas)
+    poller.start()
+    started = time.perf_counter()
+    clients = [threading.Thread(target=client, args=(i,)) for i in range(args.concurrency)]
+    for thread in clients:
+        thread.start()
+    for thread in clients:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    burst_over.set()
+    poller.join()
+    server.shutdown()
+
+    print(f"hash workers {args.hash_workers}, {args.logins} logins from {args.concurrency} clients, "
+          f"{args.refreshes} refreshes each, in {elapsed:.1f} s: {len(logins) / elapsed:.1f} logins/s")
+    print(f"  {summary('login', logins)}")
+    print(f"  {summary('refresh', refreshes)}")
+    print(f"  {summary('/areas during the burst', areas)}")
+    print(f"  status codes {dict(sorted(statuses.items()))}")
+
+
+if __name__ == '__main__':
+    try:
+        main()
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
@@ -0,0 +1,207 @@
+# backend/bench/media_indexes.py
+#
+# Query plans and latency of the media listings and the role screen, without
+# and then with the composite indexes declared in models.py.
+#
+# A throwaway SQLite database is created with the production engine setup
+# (WAL, pragmas), the indexes on media, employees, hotels and locations are
+# dropped, and the tables are seeded (1M media rows by default, taking about
+# a minute). Each listing is requested through the app. The SQL statement it
+# runs is captured and EXPLAIN QUERY PLAN is run on it. The request and the
+# statement are then timed over --runs repetitions. The indexes are then
+# created, ANALYZE runs and everything is measured again.
+#
+# Usage, from the repository root:
+#
+#     python backend/bench/media_indexes.py [--media 1000000] [--runs 5] [--db path]
+#
+# --db keeps the seeded database at that path instead of a temporary file.
+import argparse
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+import warnings
+from datetime import datetime, timedelta
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+parser = argparse.ArgumentParser(description='Media listing query plans and latency without and with the indexes.')
+parser.add_argument('--media', type=int, default=1_000_000, help='media rows to seed')
+parser.add_argument('--workers', type=int, default=2000, help='worker accounts to seed')
+parser.add_argument('--hotels', type=int, default=5000, help='hotels to seed')
+parser.add_argument('--cities', type=int, default=20, help='cities to seed')
+parser.add_argument('--runs', type=int, default=5, help='timed repetitions per query')
+parser.add_argument('--db', help='where to create the database (default: a temporary file)')
+args = parser.parse_args()
+
+# Config reads the environment when it is imported
+tmp_dir = tempfile.mkdtemp(prefix='hotel-bench-')
+db_path = os.path.abspath(args.db) if args.db else os.path.join(tmp_dir, 'bench.db')
+if os.path.exists(db_path):
+    sys.exit(f"{db_path} already exists")
+os.environ['DATABASE_URL'] = f"sqlite:///{db_path}"
+os.environ['UPLOAD_FOLDER'] = os.path.join(tmp_dir, 'uploads')
+os.environ['CERTIFICATE_FOLDER'] = os.path.join(tmp_dir, 'certificates')
+os.environ['JOBS_EMBEDDED_WORKERS'] = '0'
+
+from sqlalchemy import event
+from sqlalchemy.exc import SAWarning
+from flask_jwt_extended import create_access_token
+from app import create_app
+from models import db, Employee, Hotel, Media, Location
+from permissions import token_claims
+
+# Non-unique indexes only: the unique ones back upserts and constraints
+BENCH_INDEXES = [index for model in (Media, Employee, Hotel, Location)
+                 for index in model.__table__.indexes if not index.unique]
+
+# The listings pass subqueries to IN(); SQLAlchemy warns about it on every request
+warnings.filterwarnings('ignore', category=SAWarning)
+
+SQLITE_DATETIME = '%Y-%m-%d %H:%M:%S.%f'  # how SQLAlchemy stores DateTime on SQLite
+
+
+def seed(connection):
+    random.seed(1)
+    cursor = connection.cursor()
+    cursor.executemany('INSERT INTO cities (id, name) VALUES (?, ?)',
+                       [(city, f"city-{city}") for city in range(1, args.cities + 1)])
+
+    def employee(employee_id, role, city):
+        name = f"{role}-{employee_id}"
+        return (employee_id, name, name, '0000000000', f"{name}@example.com", '-', '-', role, 1, city)
+
+    # One superadmin, one admin per city, then the workers
+    employees = [employee(1, 'superadmin', 1)]
+    employees += [employee(1 + city, 'admin', city) for city in range(1, args.cities + 1)]
+    first_worker = len(employees) + 1
+    workers = range(first_worker, first_worker + args.workers)
+    employees += [employee(worker, 'worker', worker % args.cities + 1) for worker in workers]
+    cursor.executemany(
+        'INSERT INTO employees (id, name, username, phone, email, address, password, role, is_active, city_id) '
+        'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)', employees)
+
+    hotels_by_city = {}
+    for hotel in range(1, args.hotels + 1):
+        hotels_by_city.setdefault(hotel % args.cities + 1, []).append(hotel)
+    cursor.executemany(
+        'INSERT INTO hotels (id, name, phone, address, location, is_active, city_id) VALUES (?, ?, ?, ?, ?, ?, ?)',
+        [(hotel, f"hotel-{hotel}", '0000000000', '-', '-', 1, hotel % args.cities + 1)
+         for hotel in range(1, args.hotels + 1)])
+
+    # Workers upload to hotels in their own city, one upload every 30 s
+    start = datetime(2024, 1, 1)
+
+    def media_rows():
+        for media_id in range(1, args.media + 1):
+            worker = random.choice(workers)
+            yield (
+                media_id, f"{media_id}.jpg", 'video' if media_id % 5 == 0 else 'image',
+                (start + timedelta(seconds=30 * media_id)).strftime(SQLITE_DATETIME),
+                worker, random.choice(hotels_by_city[worker % args.cities + 1]),
+            )
+    cursor.executemany(
+        'INSERT INTO media (id, filename, media_type, uploaded_at, uploaded_by, hotel_id) VALUES (?, ?, ?, ?, ?, ?)',
+        media_rows())
+    connection.commit()
+    return {'superadmin': 1, 'admin': 2, 'worker': first_worker, 'hotel': hotels_by_city[1][0]}
+
+
+def capture(client, url, headers, table):
+    """Request url once; returns (response, the last statement that read from table, its parameters)."""
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append((statement, parameters))
+
+    event.listen(db.engine, 'before_cursor_execute', before_cursor_execute)
+    try:
+        response = client.get(url, headers=headers)
+        response.get_data()  # streamed listings run their query while the body is read
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', before_cursor_execute)
+    assert response.status_code == 200, (url, response.status_code, response.get_data(as_text=True))
+    statement, parameters = [s for s in statements if f'FROM {table}' in s[0]][-1]
+    return response, statement, parameters
+
+
+def measure(label, client, scenarios):
+    print(f"== {label}")
+    connection = db.engine.raw_connection()
+    try:
+        for name, url, headers, table in scenarios:
+            _, statement, parameters = capture(client, url, headers, table)
+            plan = ' | '.join(row[3] for row in connection.execute('EXPLAIN QUERY PLAN ' + statement, parameters))
+
+            started = time.perf_counter()
+            for _ in range(args.runs):
+                client.get(url, headers=headers).get_data()
+            request_ms = (time.perf_counter() - started) * 1000 / args.runs
+
+            started = time.perf_counter()
+            for _ in range(args.runs):
+                connection.execute(statement, parameters).fetchall()
+            query_ms = (time.perf_counter() - started) * 1000 / args.runs
+
+            print(f"{name:20s} request {request_ms:9.2f} ms  query {query_ms:9.2f} ms  {plan}")
+    finally:
+        connection.close()
+
+
+def main():
+    app = create_app()
+    client = app.test_client()
+    with app.app_context():
+        db.create_all()
+        for index in BENCH_INDEXES:
+            index.drop(db.engine)
+
+        started = time.perf_counter()
+        connection = db.engine.raw_connection()
+        try:
+            ids = seed(connection)
+        finally:
+            connection.close()
+        print(f"seeded {args.media} media rows in {time.perf_counter() - started:.1f} s ({db_path})")
+
+        headers = {}
+        for role in ('superadmin', 'admin', 'worker'):
+            employee = db.session.get(Employee, ids[role])
+            token = create_access_token(identity=str(employee.id), additional_claims=token_claims(employee))
+            headers[role] = {'Authorization': f"Bearer {token}"}
+        db.session.remove()
+
+    # The second page follows the cursor of the first, deep enough to matter
+    with app.app_context():
+        first_page = client.get('/api/media/superadmin/view?limit=200', headers=headers['superadmin']).get_json()
+    second_page = f"/api/media/superadmin/view?cursor={first_page['next_cursor']}"
+
+    scenarios = [
+        ('superadmin page', '/api/media/superadmin/view', headers['superadmin'], 'media'),
+        ('superadmin page 2', second_page, headers['superadmin'], 'media'),
+        ('worker page', '/api/media/worker/view', headers['worker'], 'media'),
+        ('admin page', '/api/media/admin/view', headers['admin'], 'media'),
+        ('hotel filter', f"/api/media/superadmin/view?hotel_id={ids['hotel']}", headers['superadmin'], 'media'),
+        ('video filter', '/api/media/superadmin/view?media_type=video', headers['superadmin'], 'media'),
+        ('role screen', '/api/admin/workers', headers['admin'], 'employees'),
+    ]
+
+    with app.app_context():
+        measure('without indexes', client, scenarios)
+        for index in BENCH_INDEXES:
+            index.create(db.engine)
+        with db.engine.begin() as connection:
+            connection.exec_driver_sql('ANALYZE')
+        measure('with indexes', client, scenarios)
+
+
+if __name__ == '__main__':
+    try:
+        main()
+    finally:
+        # Keeps nothing but the database given with --db
+        shutil.rmtree(tmp_dir, ignore_errors=True)
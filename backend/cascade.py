@@ -0,0 +1,105 @@
+# backend/cascade.py
+#
+# Deleting a hotel or an employee together with the rows that point at it.
+#
+# Nothing in the schema cascades, and a hotel can have tens of thousands of
+# uploads, so the request only deactivates the parent (no new uploads, no
+# logins) and queues a 'cascade.delete' job (see jobs.py). The job deletes the
+# children in chunks of CASCADE_BATCH_SIZE, one short transaction each, so
+# live requests get the SQLite write lock in between. After every chunk it
+# reports progress (GET /api/jobs/<id>). The parent row goes last. Each chunk
+# of uploads or certificates queues the release of its files. Derivatives and
+# partial chunked uploads left on disk are removed by the reconciliation
+# sweep (see reconcile.py).
+#
+# An admin's hotels and workers are not deleted along with it: they stay in
+# their city without a creator.
+from flask import current_app
+from models import (db, Employee, Hotel, Media, Certificate, UploadSession,
+                    Location, LocationHistory, LocationRollup)
+import storage
+import certificates
+import jobs
+
+PARENTS = {'hotel': Hotel, 'employee': Employee}
+
+# (progress key, model, column pointing at the parent), deleted in this order
+CHILDREN = {
+    'hotel': (
+        ('media', Media, Media.hotel_id),
+        ('certificates', Certificate, Certificate.hotel_id),
+        ('upload_sessions', UploadSession, UploadSession.hotel_id),
+    ),
+    'employee': (
+        ('media', Media, Media.uploaded_by),
+        ('upload_sessions', UploadSession, UploadSession.worker_id),
+        ('locations', Location, Location.worker_id),
+        ('location_history', LocationHistory, LocationHistory.worker_id),
+        ('location_rollups', LocationRollup, LocationRollup.worker_id),
+    ),
+}
+
+
+def _delete_chunk(model, column, parent_id, batch_size):
+    """Delete up to batch_size rows pointing at parent_id and commit; returns how many."""
+    if model is Media:
+        rows = db.session.query(Media.id, Media.filename, Media.original_file).filter(
+            column == parent_id
+        ).limit(batch_size).all()
+        # Their files go once no other row uses them
+        storage.release_later([f for _, filename, original in rows for f in (filename, original) if f])
+        ids = [media_id for media_id, _, _ in rows]
+    elif model is Certificate:
+        rows = db.session.query(Certificate.id, Certificate.content_hash, Certificate.mime_type).filter(
+            column == parent_id
+        ).limit(batch_size).all()
+        certificates.release_later([(content_hash, mime_type) for _, content_hash, mime_type in rows])
+        ids = [certificate_id for certificate_id, _, _ in rows]
+    else:
+        ids = [row_id for (row_id,) in db.session.query(model.id).filter(column == parent_id).limit(batch_size)]
+    if ids:
+        model.query.filter(model.id.in_(ids)).delete(synchronize_session=False)
+    db.session.commit()
+    return len(ids)
+
+
+@jobs.handler('cascade.delete')
+def _delete_job(payload):
+    kind, parent_id = payload['kind'], payload['id']
+    batch_size = current_app.config.get('CASCADE_BATCH_SIZE', 1000)
+    children = CHILDREN[kind]
+
+    # Counted again on a retry, so "total" is what was left at the start of this attempt
+    total = {name: model.query.filter(column == parent_id).count() for name, model, column in children}
+    deleted = dict.fromkeys(total, 0)
+    for name, model, column in children:
+        while True:
+            count = _delete_chunk(model, column, parent_id, batch_size)
+            if not count:
+                break
+            deleted[name] += count
+            if not jobs.progress(stage=name, deleted=deleted, total=total):
+                return  # the lease ran out and another worker carries on
+
+    if kind == 'employee':
+        Employee.query.filter(Employee.created_by == parent_id).update(
+            {'created_by': None}, synchronize_session=False)
+        Hotel.query.filter(Hotel.created_by == parent_id).update(
+            {'created_by': None}, synchronize_session=False)
+    PARENTS[kind].query.filter_by(id=parent_id).delete(synchronize_session=False)
+    db.session.commit()
+    jobs.progress(stage='done', deleted=deleted, total=total)
+
+
+def start(parent, requested_by):
+    """Deactivate a Hotel or Employee and queue its deletion. Caller commits; returns the Job."""
+    kind = 'hotel' if isinstance(parent, Hotel) else 'employee'
+    parent.is_active = False
+    job = jobs.enqueue('cascade.delete', {'kind': kind, 'id': parent.id, 'requested_by': requested_by})
+    db.session.flush()
+    return job
+
+
+def accepted(job, message):
+    """202 response body pointing the client at the job's status."""
+    return {'message': message, 'job_id': job.id, 'status_url': f"/api/jobs/{job.id}"}
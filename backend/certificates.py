@@ -0,0 +1,112 @@
+# backend/certificates.py
+#
+# Hotel certificates (licences, inspection reports) as files on disk.
+#
+# The contents live under CERTIFICATE_FOLDER in the same content-addressed
+# layout as uploads (see storage.py): ab/cd/<sha256>.<ext>, with the extension
+# taken from the MIME type. They are streamed in and out in COPY_BUFFER_SIZE
+# pieces, and the certificates table only keeps metadata. They are kept out
+# of UPLOAD_FOLDER on purpose: /api/uploads is served without authentication,
+# while certificates are downloaded through GET /api/certificates/<id>,
+# which checks the caller's city.
+import os
+import time
+from flask import current_app, send_file
+from models import db, Certificate
+import storage
+import jobs
+
+# What a certificate may be, recognised by its first bytes rather than the
+# client's Content-Type
+EXTENSIONS = {
+    'application/pdf': 'pdf',
+    'image/jpeg': 'jpg',
+    'image/png': 'png',
+    'image/webp': 'webp',
+}
+SNIFF_BYTES = 16
+
+
+def folder():
+    return current_app.config['CERTIFICATE_FOLDER']
+
+
+def sniff_mime(head):
+    """MIME type of a file from its first SNIFF_BYTES bytes, or None if not allowed."""
+    if head.startswith(b'%PDF-'):
+        return 'application/pdf'
+    if head.startswith(b'\xff\xd8\xff'):
+        return 'image/jpeg'
+    if head.startswith(b'\x89PNG\r\n\x1a\n'):
+        return 'image/png'
+    if head[:4] == b'RIFF' and head[8:12] == b'WEBP':
+        return 'image/webp'
+    return None
+
+
+def relpath(content_hash, mime_type):
+    return storage.content_path(content_hash, EXTENSIONS.get(mime_type, 'bin'))
+
+
+def save(stream, mime_type):
+    """Stream a file into CERTIFICATE_FOLDER; returns (sha256 hex digest, size in bytes)."""
+    stored, digest = storage.save_stream(stream, EXTENSIONS.get(mime_type, 'bin'), root=folder())
+    return digest, os.path.getsize(os.path.join(folder(), stored))
+
+
+def send(certificate):
+    """The certificate's file, with conditional GETs and byte ranges."""
+    response = send_file(
+        os.path.join(folder(), relpath(certificate.content_hash, certificate.mime_type)),
+        mimetype=certificate.mime_type,
+        download_name=certificate.filename or f"certificate-{certificate.id}.{EXTENSIONS.get(certificate.mime_type, 'bin')}",
+        conditional=True,
+        etag=certificate.content_hash,
+        last_modified=certificate.uploaded_at,
+    )
+    response.cache_control.private = True
+    return response
+
+
+def serialize(certificate):
+    return {
+        'id': certificate.id,
+        'hotel_id': certificate.hotel_id,
+        'filename': certificate.filename,
+        'mime_type': certificate.mime_type,
+        'size': certificate.size,
+        'content_hash': certificate.content_hash,
+        'uploaded_at': certificate.uploaded_at.isoformat() if certificate.uploaded_at else None,
+        'url': f"/api/certificates/{certificate.id}",
+    }
+
+
+@jobs.handler('certificates.release')
+def _release_job(payload):
+    grace = current_app.config.get('STORAGE_RELEASE_GRACE_SECONDS', 300)
+    hashes = [content_hash for content_hash, _ in payload['files']]
+    in_use = {content_hash for (content_hash,) in db.session.query(Certificate.content_hash).filter(
+        Certificate.content_hash.in_(hashes))}
+    recent = []
+    for content_hash, mime_type in payload['files']:
+        if content_hash in in_use:
+            continue
+        path = os.path.join(folder(), relpath(content_hash, mime_type))
+        try:
+            # Just deduplicated onto by an upload that may not have committed yet
+            if os.stat(path).st_mtime > time.time() - grace:
+                recent.append((content_hash, mime_type))
+                continue
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+    if recent:
+        release_later(recent, delay=grace)
+        db.session.commit()
+
+
+def release_later(rows, delay=0):
+    """Queue removal of the files of deleted (content_hash, mime_type) rows once unreferenced."""
+    files = [[content_hash, mime_type] for content_hash, mime_type in rows if content_hash]
+    if files:
+        jobs.enqueue('certificates.release', {'files': files}, delay=delay)
@@ -1,12 +1,54 @@
 import os
 from datetime import timedelta 
 
+BASE_DIR = os.path.abspath(os.path.dirname(__file__))
+
+
+def _database_url():
+    url = os.environ.get("DATABASE_URL", "sqlite:///app.db")
+    # Heroku-style URLs use the scheme SQLAlchemy 1.4+ no longer accepts
+    if url.startswith("postgres://"):
+        url = "postgresql://" + url[len("postgres://"):]
+    return url
+
+
+def _engine_options(url):
+    """Pool settings from the environment, with defaults per backend."""
+    if url in ("sqlite://", "sqlite:///:memory:"):
+        return {}  # Flask-SQLAlchemy uses a single static connection
+    if url.startswith("sqlite"):
+        return {
+            # sqlite3's own lock wait, in seconds; busy_timeout covers the rest
+            'connect_args': {'timeout': float(os.environ.get("SQLITE_BUSY_TIMEOUT_MS", 5000)) / 1000},
+            'pool_size': int(os.environ.get("DB_POOL_SIZE", 10)),
+            'max_overflow': int(os.environ.get("DB_MAX_OVERFLOW", 10)),
+            'pool_timeout': float(os.environ.get("DB_POOL_TIMEOUT", 30)),
+        }
+    return {
+        'pool_size': int(os.environ.get("DB_POOL_SIZE", 10)),
+        'max_overflow': int(os.environ.get("DB_MAX_OVERFLOW", 20)),
+        'pool_timeout': float(os.environ.get("DB_POOL_TIMEOUT", 30)),
+        'pool_recycle': int(os.environ.get("DB_POOL_RECYCLE", 1800)),  # under server idle timeouts
+        'pool_pre_ping': os.environ.get("DB_POOL_PRE_PING", "1") == "1",
+    }
+
 
 class Config:
     SECRET_KEY = os.environ.get("SECRET_KEY", "my-secret-key")
     
-    SQLALCHEMY_DATABASE_URI = "sqlite:///app.db"
+    # SQLite by default (instance/app.db); set DATABASE_URL for PostgreSQL
+    SQLALCHEMY_DATABASE_URI = _database_url()
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    SQLALCHEMY_ENGINE_OPTIONS = _engine_options(SQLALCHEMY_DATABASE_URI)
+    # Applied to every new SQLite connection (see database.py)
+    SQLITE_PRAGMAS = {
+        'journal_mode': os.environ.get("SQLITE_JOURNAL_MODE", "WAL"),  # readers don't block the writer
+        'synchronous': os.environ.get("SQLITE_SYNCHRONOUS", "NORMAL"),  # durable at checkpoints; safe with WAL
+        'busy_timeout': int(os.environ.get("SQLITE_BUSY_TIMEOUT_MS", 5000)),  # wait for the write lock
+        'cache_size': -int(os.environ.get("SQLITE_CACHE_KB", 64 * 1024)),  # negative = KiB
+        'mmap_size': int(os.environ.get("SQLITE_MMAP_BYTES", 256 * 1024 * 1024)),
+        'temp_store': 'MEMORY',
+    }
      
     JWT_SECRET_KEY = os.environ.get("JWT_SECRET_KEY", "my-jwt-secret")   
     JWT_ACCESS_TOKEN_EXPIRES = timedelta(minutes=55)
@@ -14,6 +56,66 @@ class Config:
     JWT_BLACKLIST_ENABLED = True
     JWT_BLACKLIST_TOKEN_CHECKS = ['access', 'refresh']
     JWT_REFRESH_TOKEN_EXPIRES = timedelta(days=7)
+    # Max delay before a logout in one worker process is seen by the others
+    TOKEN_REVOCATION_SYNC_SECONDS = float(os.environ.get("TOKEN_REVOCATION_SYNC_SECONDS", 1.0))
+
+    # Password hashing (see passwords.py); stored hashes with other parameters are upgraded at login
+    PASSWORD_HASH_METHOD = os.environ.get("PASSWORD_HASH_METHOD", "scrypt")
+    PASSWORD_SALT_LENGTH = int(os.environ.get("PASSWORD_SALT_LENGTH", 16))
+    PASSWORD_HASH_WORKERS = int(os.environ.get("PASSWORD_HASH_WORKERS", 0))  # 0 = hash in the request thread
+    PASSWORD_HASH_QUEUE = int(os.environ.get("PASSWORD_HASH_QUEUE", 32))  # waiting logins before 503
+    PASSWORD_HASH_TIMEOUT = float(os.environ.get("PASSWORD_HASH_TIMEOUT", 5))
+
+    # Live worker positions are served from memory (see live_locations.py)
+    LOCATION_CACHE_SYNC_SECONDS = float(os.environ.get("LOCATION_CACHE_SYNC_SECONDS", 1.0))  # other processes' writes
+    WORKER_CACHE_REFRESH_SECONDS = float(os.environ.get("WORKER_CACHE_REFRESH_SECONDS", 30))  # city/status changes
+
+    # Server-Sent Events hub (see events.py)
+    EVENTS_POLL_SECONDS = float(os.environ.get("EVENTS_POLL_SECONDS", 0.5))
+    EVENTS_HEARTBEAT_SECONDS = float(os.environ.get("EVENTS_HEARTBEAT_SECONDS", 15))
+    EVENTS_BUFFER_SIZE = int(os.environ.get("EVENTS_BUFFER_SIZE", 1000))  # per process, for fast resume
+    EVENTS_RETENTION_SECONDS = int(os.environ.get("EVENTS_RETENTION_SECONDS", 3600))  # Last-Event-ID replay window
+    EVENTS_GAP_SECONDS = float(os.environ.get("EVENTS_GAP_SECONDS", 5))  # wait for a lower id to commit
+
+    # Background jobs (see jobs.py). Run `python jobs_worker.py` next to the web
+    # server and set JOBS_EMBEDDED_WORKERS=0, or let each web process run a few threads.
+    JOBS_EMBEDDED_WORKERS = int(os.environ.get("JOBS_EMBEDDED_WORKERS", 1))
+    JOBS_POLL_SECONDS = float(os.environ.get("JOBS_POLL_SECONDS", 1.0))  # idle wait between claims
+    JOBS_VISIBILITY_SECONDS = int(os.environ.get("JOBS_VISIBILITY_SECONDS", 300))  # lease before a job is retried
+    JOBS_MAX_ATTEMPTS = int(os.environ.get("JOBS_MAX_ATTEMPTS", 5))
+    JOBS_BACKOFF_SECONDS = float(os.environ.get("JOBS_BACKOFF_SECONDS", 10))  # doubled per attempt
+    JOBS_BACKOFF_MAX_SECONDS = float(os.environ.get("JOBS_BACKOFF_MAX_SECONDS", 3600))
+    JOBS_RETENTION_SECONDS = int(os.environ.get("JOBS_RETENTION_SECONDS", 7 * 24 * 3600))  # finished jobs
+
+    # Hotels and employees are deleted with their rows in chunks by a job (see cascade.py)
+    CASCADE_BATCH_SIZE = int(os.environ.get("CASCADE_BATCH_SIZE", 1000))
+
+    # Uploads/Media reconciliation sweep (see reconcile.py)
+    RECONCILE_BATCH_SIZE = int(os.environ.get("RECONCILE_BATCH_SIZE", 500))  # files or rows per job
+    RECONCILE_PAUSE_SECONDS = float(os.environ.get("RECONCILE_PAUSE_SECONDS", 1.0))  # between batches
+    RECONCILE_GRACE_SECONDS = int(os.environ.get("RECONCILE_GRACE_SECONDS", 3600))  # younger files are left alone
+    RECONCILE_INTERVAL_SECONDS = int(os.environ.get("RECONCILE_INTERVAL_SECONDS", 0))  # 0 = only when started
+    RECONCILE_MAX_FINDINGS = int(os.environ.get("RECONCILE_MAX_FINDINGS", 200))
+
+    # Uploaded media lives here, in content-addressed shards (see storage.py)
+    UPLOAD_FOLDER = os.environ.get("UPLOAD_FOLDER", os.path.join(BASE_DIR, "uploads"))
+    # Unused files younger than this are left for a later try: an identical
+    # upload may have just deduplicated onto them (see storage.py)
+    STORAGE_RELEASE_GRACE_SECONDS = int(os.environ.get("STORAGE_RELEASE_GRACE_SECONDS", 300))
+    # Hotel certificates, same layout but never served without a login (see certificates.py)
+    CERTIFICATE_FOLDER = os.environ.get("CERTIFICATE_FOLDER", os.path.join(BASE_DIR, "certificates"))
+    # Uploaded photos are stripped of metadata and re-encoded (see photo_processing.py)
+    PHOTO_MAX_DIMENSION = int(os.environ.get("PHOTO_MAX_DIMENSION", 2560))  # longest side, pixels
+    PHOTO_QUALITY = int(os.environ.get("PHOTO_QUALITY", 82))  # JPEG quality
+    PHOTO_KEEP_ORIGINALS = os.environ.get("PHOTO_KEEP_ORIGINALS", "0") == "1"
+
+    # Uploads taken further than this from their hotel are flagged (see geofence.py)
+    GEOFENCE_RADIUS_METERS = float(os.environ.get("GEOFENCE_RADIUS_METERS", 200))
+
+    # Let a front proxy send upload bodies: "", "x-sendfile" or "x-accel-redirect"
+    UPLOADS_SENDFILE_MODE = os.environ.get("UPLOADS_SENDFILE_MODE", "")
+    UPLOADS_ACCEL_PREFIX = os.environ.get("UPLOADS_ACCEL_PREFIX", "/protected-uploads/")
+    USE_X_SENDFILE = UPLOADS_SENDFILE_MODE == "x-sendfile"
     
 
     
\ No newline at end of file
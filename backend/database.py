@@ -0,0 +1,26 @@
+# backend/database.py
+#
+# Engine setup that SQLALCHEMY_ENGINE_OPTIONS can't express.
+#
+# SQLite settings such as busy_timeout and cache_size are per connection, so
+# SQLITE_PRAGMAS is applied from a connect listener to every pooled
+# connection. journal_mode=WAL persists in the database file; with it readers
+# and the single writer no longer block each other.
+from sqlalchemy import event
+from models import db
+
+
+def init_engine(app):
+    pragmas = app.config.get('SQLITE_PRAGMAS') or {}
+
+    with app.app_context():
+        engine = db.engine
+        if engine.dialect.name != 'sqlite' or not pragmas:
+            return
+
+        @event.listens_for(engine, 'connect')
+        def set_sqlite_pragmas(dbapi_connection, connection_record):
+            cursor = dbapi_connection.cursor()
+            for name, value in pragmas.items():
+                cursor.execute(f'PRAGMA {name}={value}')
+            cursor.close()
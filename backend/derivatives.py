@@ -0,0 +1,168 @@
+# backend/derivatives.py
+#
+# Thumbnails and medium previews for uploaded images, poster frames for videos.
+#
+# Derivatives are written next to the originals under
+# UPLOAD_FOLDER/derived/<size>/ab/cd/<sha256>.<fmt>. They are made by a
+# background job (see jobs.py; photos get theirs from photo_processing.py) and
+# generated on first request if they are still missing. Pillow is optional:
+# without it the derivative URLs simply serve the original file.
+#
+# Videos are probed with ffprobe and a poster frame is cut with ffmpeg in a
+# 'video.probe' job; the results are written back to the Media row. Without
+# ffmpeg on PATH videos just have no poster.
+import os
+import json
+import shutil
+import tempfile
+import subprocess
+from flask import current_app
+from werkzeug.security import safe_join
+from models import db, Media
+import jobs
+
+try:
+    from PIL import Image, ImageOps, features
+except ImportError:  # pragma: no cover - Pillow not installed
+    Image = None
+
+SIZES = {
+    'thumb': (320, 320),
+    'preview': (1280, 1280),
+}
+QUALITY = 80
+
+if Image is not None and features.check('webp'):
+    FORMAT, EXT = 'WEBP', 'webp'
+else:
+    FORMAT, EXT = 'JPEG', 'jpg'
+
+POSTER_MAX_WIDTH = 1280
+FFMPEG_TIMEOUT = 120  # seconds per ffprobe / ffmpeg call
+
+def derivative_relpath(size, relpath):
+    return f"derived/{size}/{relpath.rsplit('.', 1)[0]}.{EXT}"
+
+
+def derivative_urls(media):
+    """Preview fields for a Media row: thumb/preview for images, poster/duration for videos."""
+    if media.media_type == 'video':
+        return {
+            'thumb_url': None,
+            'preview_url': None,
+            'poster_url': f"/api/uploads/{media.poster_filename}" if media.poster_filename else None,
+            'duration': media.duration
+        }
+    return {
+        'thumb_url': f"/api/media/derived/thumb/{media.filename}",
+        'preview_url': f"/api/media/derived/preview/{media.filename}",
+        'poster_url': None,
+        'duration': None
+    }
+
+
+def generate(upload_folder, relpath, size):
+    """Create one derivative if needed; returns its relative path or None."""
+    if Image is None or size not in SIZES:
+        return None
+
+    source = safe_join(upload_folder, relpath)
+    if source is None or not os.path.isfile(source):
+        return None
+
+    target_rel = derivative_relpath(size, relpath)
+    target = os.path.join(upload_folder, target_rel)
+    if os.path.exists(target):
+        return target_rel
+
+    try:
+        with Image.open(source) as img:
+            img = ImageOps.exif_transpose(img)
+            img.thumbnail(SIZES[size])
+            if FORMAT == 'JPEG' and img.mode not in ('RGB', 'L'):
+                img = img.convert('RGB')
+
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(target))
+            with os.fdopen(fd, 'wb') as out:
+                img.save(out, FORMAT, quality=QUALITY)
+            os.replace(tmp_path, target)
+    except Exception as e:
+        print(f"Warning: Could not create {size} for {relpath}: {e}")
+        return None
+
+    return target_rel
+
+
+def generate_all(upload_folder, relpath):
+    for size in SIZES:
+        generate(upload_folder, relpath, size)
+
+
+def probe_video(upload_folder, relpath):
+    """Read video metadata and cut a poster frame.
+
+    Returns a dict of Media column values (missing keys were not available).
+    """
+    source = os.path.join(upload_folder, relpath)
+    result = {}
+
+    probe = subprocess.run(
+        ['ffprobe', '-v', 'error', '-select_streams', 'v:0',
+         '-show_entries', 'stream=codec_name,width,height:format=duration',
+         '-of', 'json', source],
+        capture_output=True, text=True, timeout=FFMPEG_TIMEOUT
+    )
+    if probe.returncode == 0:
+        info = json.loads(probe.stdout or '{}')
+        stream = (info.get('streams') or [{}])[0]
+        duration = info.get('format', {}).get('duration')
+        result['video_codec'] = stream.get('codec_name')
+        result['width'] = stream.get('width')
+        result['height'] = stream.get('height')
+        result['duration'] = float(duration) if duration else None
+
+    # Seek a little way in to skip black lead-in frames on short clips.
+    seek = min(1.0, (result.get('duration') or 0) / 2)
+    poster_rel = f"derived/poster/{relpath.rsplit('.', 1)[0]}.jpg"
+    target = os.path.join(upload_folder, poster_rel)
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(target), suffix='.jpg')
+    os.close(fd)
+
+    cut = subprocess.run(
+        ['ffmpeg', '-y', '-v', 'error', '-ss', str(seek), '-i', source,
+         '-frames:v', '1', '-vf', f"scale='min({POSTER_MAX_WIDTH},iw)':-2", tmp_path],
+        capture_output=True, timeout=FFMPEG_TIMEOUT
+    )
+    if cut.returncode == 0 and os.path.getsize(tmp_path) > 0:
+        os.replace(tmp_path, target)
+        result['poster_filename'] = poster_rel
+    else:
+        os.remove(tmp_path)
+
+    return result
+
+
+@jobs.handler('video.probe')
+def _probe_video_job(payload):
+    media = db.session.get(Media, payload['media_id'])
+    if media is None or shutil.which('ffprobe') is None or shutil.which('ffmpeg') is None:
+        return
+    values = probe_video(current_app.config['UPLOAD_FOLDER'], media.filename)
+    if values:
+        Media.query.filter_by(id=media.id).update(values)
+        db.session.commit()
+
+
+@jobs.handler('derivatives.generate')
+def _generate_job(payload):
+    generate_all(current_app.config['UPLOAD_FOLDER'], payload['filename'])
+
+
+def enqueue(media):
+    """Queue the derivatives of a new Media row in the current transaction."""
+    if media.media_type == 'video':
+        jobs.enqueue('video.probe', {'media_id': media.id})
+    elif media.media_type == 'image':
+        jobs.enqueue('derivatives.generate', {'filename': media.filename})
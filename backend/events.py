@@ -0,0 +1,188 @@
+# backend/events.py
+#
+# Live field activity (worker locations, new uploads) for Server-Sent Events.
+#
+# publish() adds an Event row inside the caller's transaction, so an event
+# exists exactly when the change it describes was committed. Each process runs
+# one hub thread that polls the events table every EVENTS_POLL_SECONDS into an
+# in-memory ring buffer and wakes every subscriber through one Condition. An
+# idle subscriber is a sleeping waiter: no DB query and no thread of ours. The
+# WSGI server still keeps a connection per open stream, so deploy the app on
+# gevent/eventlet workers to make those greenlets instead of OS threads.
+#
+# Event ids come from the events table, so a client that reconnects to any
+# process with Last-Event-ID resumes where it stopped: from the buffer when it
+# reaches back far enough, otherwise from the table, which keeps events for
+# EVENTS_RETENTION_SECONDS.
+#
+# An id is handed out at INSERT but only becomes visible at COMMIT, so on
+# PostgreSQL a lower id can show up after a higher one. The hub therefore stops
+# at the first missing id and waits for it, for at most EVENTS_GAP_SECONDS,
+# since a rolled-back insert leaves a hole that never fills. Subscribers get
+# ids in increasing order either way. SQLite has a single writer and reuses the
+# id of a rolled-back insert, so there are no holes to wait for.
+import json
+import threading
+import time
+from collections import deque
+from datetime import datetime, timedelta
+from flask import current_app
+from models import db, Event
+
+REPLAY_LIMIT = 1000  # rows per poll, and most events replayed on reconnect
+PURGE_INTERVAL = 300  # seconds between DELETEs of expired events
+RETRY_MS = 3000  # client reconnect delay
+
+_hub = None
+_hub_lock = threading.Lock()
+
+
+def publish(type, city_id, payload):
+    """Queue an event in the current transaction; the caller's commit sends it."""
+    db.session.add(Event(type=type, city_id=city_id, payload=json.dumps(payload, default=str)))
+
+
+def _format(event_id, type, payload):
+    return f"id: {event_id}\nevent: {type}\ndata: {payload}\n\n"
+
+
+class _Hub:
+    def __init__(self, app):
+        self.app = app
+        self.cond = threading.Condition()
+        self.buffer = deque()  # (id, type, city_id, payload), ascending id
+        self.size = app.config.get('EVENTS_BUFFER_SIZE', 1000)
+        with app.app_context():
+            self.last_id = db.session.query(db.func.max(Event.id)).scalar() or 0
+        # Every event with id > floor is in the buffer
+        self.floor = self.last_id
+        self.holes = {}  # (first, last) missing id -> monotonic time first seen
+
+    def start(self):
+        threading.Thread(target=self._run, name='events-hub', daemon=True).start()
+
+    def _hole_expired(self, first, last):
+        """True once ids first..last have been missing for EVENTS_GAP_SECONDS."""
+        now = time.monotonic()
+        if (first, last) not in self.holes:
+            # What is left of a hole seen before keeps that hole's age
+            self.holes[(first, last)] = min(
+                (seen for (f, l), seen in self.holes.items() if f <= last and first <= l), default=now)
+        return now - self.holes[(first, last)] >= self.app.config.get('EVENTS_GAP_SECONDS', 5)
+
+    def _poll(self):
+        rows = db.session.query(Event.id, Event.type, Event.city_id, Event.payload).filter(
+            Event.id > self.last_id
+        ).order_by(Event.id).limit(REPLAY_LIMIT).all()
+        ready = []
+        expected = self.last_id + 1
+        for row in rows:
+            if row[0] != expected and not self._hole_expired(expected, row[0] - 1):
+                break  # the missing ids may still commit
+            ready.append(row)
+            expected = row[0] + 1
+        if ready:
+            with self.cond:
+                for row in ready:
+                    if len(self.buffer) >= self.size:
+                        self.floor = self.buffer.popleft()[0]
+                    self.buffer.append(tuple(row))
+                self.last_id = ready[-1][0]
+                self.cond.notify_all()
+            self.holes = {hole: seen for hole, seen in self.holes.items() if hole[1] > self.last_id}
+        return len(ready)
+
+    def _purge(self):
+        retention = timedelta(seconds=self.app.config.get('EVENTS_RETENTION_SECONDS', 3600))
+        Event.query.filter(Event.created_at < datetime.utcnow() - retention).delete(synchronize_session=False)
+        db.session.commit()
+
+    def _run(self):
+        next_purge = 0.0
+        while True:
+            try:
+                with self.app.app_context():
+                    while self._poll() == REPLAY_LIMIT:
+                        pass
+                    if time.monotonic() >= next_purge:
+                        self._purge()
+                        next_purge = time.monotonic() + PURGE_INTERVAL
+            except Exception as e:
+                print(f"Warning: events hub poll failed: {e}")
+            time.sleep(self.app.config.get('EVENTS_POLL_SECONDS', 0.5))
+
+    def newer_than(self, cursor):
+        """Buffered events after cursor; call with self.cond held."""
+        events = []
+        for event in reversed(self.buffer):
+            if event[0] <= cursor:
+                break
+            events.append(event)
+        events.reverse()
+        return events
+
+    def replay(self, cursor, city_id):
+        """Events after cursor that already left the buffer, from the table."""
+        with self.app.app_context():
+            query = db.session.query(Event.id, Event.type, Event.city_id, Event.payload).filter(
+                Event.id > cursor, Event.id <= self.floor
+            )
+            if city_id is not None:
+                query = query.filter(Event.city_id == city_id)
+            return query.order_by(Event.id).limit(REPLAY_LIMIT).all()
+
+
+def _get_hub():
+    # Started on first use, so with a pre-forking server each worker gets its own
+    global _hub
+    if _hub is None:
+        with _hub_lock:
+            if _hub is None:
+                _hub = _Hub(current_app._get_current_object())
+                _hub.start()
+    return _hub
+
+
+def stream(last_event_id, city_id):
+    """SSE generator for one subscriber. city_id None means every city.
+
+    Holds no app context or DB connection while it waits.
+    """
+    hub = _get_hub()
+    heartbeat = current_app.config.get('EVENTS_HEARTBEAT_SECONDS', 15)
+
+    def generate():
+        yield f"retry: {RETRY_MS}\n\n"
+
+        cursor = hub.last_id if last_event_id is None else last_event_id
+        if cursor < hub.floor:
+            for row in hub.replay(cursor, city_id):
+                yield _format(row[0], row[1], row[3])
+            # Anything past the replay limit is skipped
+            cursor = max(cursor, hub.floor)
+
+        last_write = time.monotonic()
+        while True:
+            with hub.cond:
+                if hub.last_id <= cursor:
+                    hub.cond.wait(timeout=heartbeat)
+                if cursor < hub.floor:
+                    # Fell behind the buffer: end the stream so the client
+                    # reconnects with Last-Event-ID and replays from the table.
+                    return
+                events = hub.newer_than(cursor)
+
+            out = []
+            for event_id, type, event_city_id, payload in events:
+                cursor = event_id
+                if city_id is None or event_city_id == city_id:
+                    out.append(_format(event_id, type, payload))
+            if out:
+                yield ''.join(out)
+                last_write = time.monotonic()
+            elif time.monotonic() - last_write >= heartbeat:
+                # Keeps proxies from closing the connection and notices gone clients
+                yield ": heartbeat\n\n"
+                last_write = time.monotonic()
+
+    return generate()
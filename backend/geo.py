@@ -0,0 +1,157 @@
+# backend/geo.py
+import json
+import math
+
+EARTH_RADIUS_M = 6371000.0
+
+GEOHASH_BASE32 = '0123456789bcdefghjkmnpqrstuvwxyz'
+GEOHASH_PRECISION = 9  # ~5 m cells
+
+
+def parse_lat_lon(value):
+    """Parse a client supplied location into a (latitude, longitude) pair.
+
+    Accepts the JSON object sent by the upload form
+    ({"latitude": .., "longitude": ..} or {"lat": .., "lon": ..}) as well as a
+    plain "lat,lon" string. Returns (None, None) for anything else.
+    """
+    if not value:
+        return None, None
+
+    lat = lon = None
+    if isinstance(value, dict):
+        data = value
+    else:
+        value = str(value).strip()
+        try:
+            data = json.loads(value)
+        except ValueError:
+            data = None
+        if not isinstance(data, dict):
+            data = None
+            parts = value.split(',')
+            if len(parts) == 2:
+                lat, lon = parts
+
+    if data is not None:
+        lat = data.get('latitude', data.get('lat'))
+        lon = data.get('longitude', data.get('lon'))
+
+    try:
+        lat, lon = float(lat), float(lon)
+    except (TypeError, ValueError):
+        return None, None
+
+    if not (-90 <= lat <= 90 and -180 <= lon <= 180):
+        return None, None
+    return lat, lon
+
+
+def simplify_track(points, tolerance):
+    """Douglas-Peucker simplification of an ordered track.
+
+    points are sequences starting with (latitude, longitude, ...); extra
+    fields are carried through. tolerance is in metres: every dropped point
+    lies within it of the simplified line. Coordinates are projected onto a
+    local plane (equirectangular around the first point), which is accurate
+    at city scale. Iterative, so long tracks don't hit the recursion limit.
+    """
+    n = len(points)
+    if n < 3 or not tolerance or tolerance <= 0:
+        return list(points)
+
+    kx = math.radians(1) * EARTH_RADIUS_M * math.cos(math.radians(points[0][0]))
+    ky = math.radians(1) * EARTH_RADIUS_M
+    xs = [p[1] * kx for p in points]
+    ys = [p[0] * ky for p in points]
+    tolerance_sq = tolerance * tolerance
+
+    keep = [False] * n
+    keep[0] = keep[-1] = True
+    stack = [(0, n - 1)]
+    while stack:
+        first, last = stack.pop()
+        ax, ay = xs[first], ys[first]
+        dx, dy = xs[last] - ax, ys[last] - ay
+        segment_sq = dx * dx + dy * dy
+
+        max_sq, index = tolerance_sq, None
+        for i in range(first + 1, last):
+            px, py = xs[i] - ax, ys[i] - ay
+            # Distance to the segment, not the infinite line: tracks double back
+            t = (px * dx + py * dy) / segment_sq if segment_sq else 0.0
+            t = 0.0 if t < 0 else 1.0 if t > 1 else t
+            ex, ey = px - t * dx, py - t * dy
+            dist_sq = ex * ex + ey * ey
+            if dist_sq > max_sq:
+                max_sq, index = dist_sq, i
+
+        if index is not None:
+            keep[index] = True
+            stack.append((first, index))
+            stack.append((index, last))
+
+    return [point for point, kept in zip(points, keep) if kept]
+
+
+def haversine_m(lat1, lon1, lat2, lon2):
+    """Great-circle distance in metres."""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    dphi = phi2 - phi1
+    dlambda = math.radians(lon2 - lon1)
+    a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlambda / 2) ** 2
+    return 2 * EARTH_RADIUS_M * math.asin(math.sqrt(a))
+
+
+def geohash_encode(lat, lon, precision=GEOHASH_PRECISION):
+    lat_lo, lat_hi, lon_lo, lon_hi = -90.0, 90.0, -180.0, 180.0
+    chars, bits, value, even = [], 0, 0, True
+    while len(chars) < precision:
+        # Bits alternate longitude, latitude, starting with longitude
+        if even:
+            mid = (lon_lo + lon_hi) / 2
+            value = value * 2 + (lon >= mid)
+            lon_lo, lon_hi = (mid, lon_hi) if lon >= mid else (lon_lo, mid)
+        else:
+            mid = (lat_lo + lat_hi) / 2
+            value = value * 2 + (lat >= mid)
+            lat_lo, lat_hi = (mid, lat_hi) if lat >= mid else (lat_lo, mid)
+        even = not even
+        bits += 1
+        if bits == 5:
+            chars.append(GEOHASH_BASE32[value])
+            bits, value = 0, 0
+    return ''.join(chars)
+
+
+def _geohash_cell_deg(precision):
+    """(height, width) in degrees of a geohash cell."""
+    lon_bits = (5 * precision + 1) // 2
+    lat_bits = 5 * precision // 2
+    return 180.0 / 2 ** lat_bits, 360.0 / 2 ** lon_bits
+
+
+def geohash_cover(lat, lon, radius_m):
+    """Geohash prefixes whose cells together contain the circle around (lat, lon).
+
+    Picks the finest precision whose cells are at least radius_m across and
+    returns the cell holding the centre plus its eight neighbours, so a
+    prefix range scan on an indexed geohash column finds every candidate.
+    """
+    metres_per_deg = math.radians(1) * EARTH_RADIUS_M
+    lon_scale = max(math.cos(math.radians(lat)), 1e-6)
+    precision = 1
+    for p in range(GEOHASH_PRECISION, 0, -1):
+        height, width = _geohash_cell_deg(p)
+        if height * metres_per_deg >= radius_m and width * metres_per_deg * lon_scale >= radius_m:
+            precision = p
+            break
+
+    height, width = _geohash_cell_deg(precision)
+    prefixes = set()
+    for dlat in (-height, 0, height):
+        for dlon in (-width, 0, width):
+            cell_lat = min(max(lat + dlat, -90.0), 90.0)
+            cell_lon = (lon + dlon + 180.0) % 360.0 - 180.0
+            prefixes.add(geohash_encode(cell_lat, cell_lon, precision))
+    return prefixes
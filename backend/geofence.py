@@ -0,0 +1,45 @@
+# backend/geofence.py
+#
+# Checks that an upload was taken near the hotel it is filed under.
+#
+# The upload's coordinates come from the client's location field or, for
+# photos without one, the EXIF GPS block (see photo_processing.py). The
+# distance to the hotel's geocoded position is stored on the Media row together
+# with a verified flag (None when either side has no coordinates), so listings
+# filter on an indexed column instead of recomputing distances.
+from flask import current_app
+from models import db, Media
+from geo import haversine_m
+
+
+def _verdict(latitude, longitude, hotel):
+    """(distance in metres, within the fence) or (None, None) without coordinates."""
+    if None in (latitude, longitude) or hotel is None or None in (hotel.latitude, hotel.longitude):
+        return None, None
+    distance = haversine_m(latitude, longitude, hotel.latitude, hotel.longitude)
+    return distance, distance <= current_app.config.get('GEOFENCE_RADIUS_METERS', 200)
+
+
+def check(media, hotel):
+    """Set media.distance_m and media.location_verified against the hotel's position."""
+    media.distance_m, media.location_verified = _verdict(media.latitude, media.longitude, hotel)
+
+
+def recheck_hotel(hotel, batch_size=1000):
+    """Recompute the flag for every upload of a hotel, e.g. after it was geocoded. Caller commits."""
+    last_id, updated = 0, 0
+    while True:
+        rows = db.session.query(Media.id, Media.latitude, Media.longitude).filter(
+            Media.hotel_id == hotel.id, Media.id > last_id
+        ).order_by(Media.id).limit(batch_size).all()
+        if not rows:
+            break
+        last_id = rows[-1].id
+
+        params = []
+        for media_id, latitude, longitude in rows:
+            distance, verified = _verdict(latitude, longitude, hotel)
+            params.append({'id': media_id, 'distance_m': distance, 'location_verified': verified})
+        db.session.execute(db.update(Media), params)
+        updated += len(params)
+    return updated
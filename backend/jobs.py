@@ -0,0 +1,309 @@
+# backend/jobs.py
+#
+# Durable background jobs, queued in the application database.
+#
+# enqueue() adds a Job row inside the caller's transaction, so work is queued
+# exactly when the change that needs it commits: an upload and its photo
+# processing, a deleted Media row and the release of its file. Workers claim
+# the next due job with a single UPDATE ... RETURNING that also takes a lease
+# (locked_until) of JOBS_VISIBILITY_SECONDS. If a worker dies or overruns
+# the lease, the job becomes claimable again. A handler that raises is
+# retried after JOBS_BACKOFF_SECONDS * 2^(attempt - 1), capped and jittered,
+# up to JOBS_MAX_ATTEMPTS. After that the job stays 'failed' for inspection.
+# A job can run more than once, so handlers must be idempotent. Long handlers
+# call progress() between steps, which records how far they got and renews
+# the lease.
+#
+# Workers run as JOBS_EMBEDDED_WORKERS daemon threads in each web process,
+# in a dedicated process (jobs_worker.py), or both. Any number of them can
+# claim from the same table. SQLite's single writer serialises the claims;
+# on PostgreSQL a claim skips rows locked by another one.
+import os
+import json
+import random
+import socket
+import threading
+import time
+import traceback
+from datetime import datetime, timedelta
+from flask import current_app
+from models import db, Job
+
+PURGE_INTERVAL = 300  # seconds between DELETEs of finished jobs
+MAX_ERROR_LENGTH = 4000
+
+HANDLERS = {}
+
+_embedded_started = False
+_embedded_lock = threading.Lock()
+_next_purge = 0.0
+_purge_lock = threading.Lock()
+_current = threading.local()  # (id, attempts) of the job this thread is running
+
+
+def handler(kind):
+    """Register a function(payload) as the handler for a job kind."""
+    def register(func):
+        HANDLERS[kind] = func
+        return func
+    return register
+
+
+def enqueue(kind, payload, delay=0, max_attempts=None):
+    """Queue a job in the current transaction; the caller's commit makes it visible."""
+    job = Job(
+        kind=kind,
+        payload=json.dumps(payload),
+        status='queued',
+        max_attempts=max_attempts or current_app.config.get('JOBS_MAX_ATTEMPTS', 5),
+        run_at=datetime.utcnow() + timedelta(seconds=delay)
+    )
+    db.session.add(job)
+    return job
+
+
+def worker_name(index=0):
+    return f"{socket.gethostname()}:{os.getpid()}:{index}"
+
+
+def _claim_statement(condition, order):
+    # Built once with bind parameters: the claim runs for every job, and
+    # constructing ORM statements cost more than executing them
+    jobs = Job.__table__
+    next_id = (
+        db.select(jobs.c.id).where(condition).order_by(*order).limit(1)
+        .with_for_update(skip_locked=True).scalar_subquery()
+    )
+    return db.update(jobs).where(jobs.c.id == next_id, condition).values(
+        status='running',
+        attempts=jobs.c.attempts + 1,
+        locked_by=db.bindparam('name'),
+        locked_until=db.bindparam('locked_until'),
+        started_at=db.bindparam('now')
+    ).returning(jobs.c.id, jobs.c.kind, jobs.c.payload, jobs.c.attempts, jobs.c.max_attempts)
+
+
+# Two probes instead of one OR, so each walks its index in order without a sort
+_CLAIM_EXPIRED = _claim_statement(  # lease ran out
+    db.and_(Job.__table__.c.status == 'running', Job.__table__.c.locked_until < db.bindparam('now')),
+    (Job.__table__.c.locked_until,)
+)
+_CLAIM_QUEUED = _claim_statement(
+    db.and_(Job.__table__.c.status == 'queued', Job.__table__.c.run_at <= db.bindparam('now')),
+    (Job.__table__.c.run_at, Job.__table__.c.id)
+)
+
+
+def claim(name):
+    """Lease the next due job: (id, kind, payload, attempts, max_attempts) or None."""
+    now = datetime.utcnow()
+    params = {
+        'now': now,
+        'name': name,
+        'locked_until': now + timedelta(seconds=current_app.config.get('JOBS_VISIBILITY_SECONDS', 300)),
+    }
+    row = (
+        db.session.execute(_CLAIM_EXPIRED, params).first()
+        or db.session.execute(_CLAIM_QUEUED, params).first()
+    )
+    db.session.commit()
+    return row
+
+
+def _owned(job_id, attempts):
+    # Matching on attempts: if the lease ran out and the job was claimed
+    # again, that newer run owns the row now
+    jobs = Job.__table__
+    return db.and_(jobs.c.id == job_id, jobs.c.attempts == attempts, jobs.c.status == 'running')
+
+
+_COMPLETE = Job.__table__.update().where(
+    _owned(db.bindparam('job_id'), db.bindparam('job_attempts'))
+).values(status='done', locked_until=None, finished_at=db.bindparam('now'))
+
+
+def progress(**values):
+    """Record the running job's progress and renew its lease; commits.
+
+    Returns False if the job is no longer this worker's (the lease ran out
+    and another worker claimed it), in which case the handler should stop.
+    Outside a job it does nothing.
+    """
+    job_id, attempts = getattr(_current, 'job', None) or (None, None)
+    if job_id is None:
+        return True
+    locked_until = datetime.utcnow() + timedelta(seconds=current_app.config.get('JOBS_VISIBILITY_SECONDS', 300))
+    result = db.session.execute(Job.__table__.update().where(_owned(job_id, attempts)).values(
+        progress=json.dumps(values), locked_until=locked_until
+    ))
+    db.session.commit()
+    return result.rowcount == 1
+
+
+def _finish(job_id, attempts, **values):
+    db.session.execute(Job.__table__.update().where(_owned(job_id, attempts)).values(locked_until=None, **values))
+    db.session.commit()
+
+
+def _backoff(attempts):
+    config = current_app.config
+    delay = min(config.get('JOBS_BACKOFF_SECONDS', 10) * 2 ** (attempts - 1),
+                config.get('JOBS_BACKOFF_MAX_SECONDS', 3600))
+    return delay * random.uniform(0.8, 1.2)
+
+
+def run_one(name):
+    """Claim and run one job; returns False when nothing was due."""
+    row = claim(name)
+    if row is None:
+        return False
+    job_id, kind, payload, attempts, max_attempts = row
+    now = datetime.utcnow()
+
+    if attempts > max_attempts:
+        # The last attempt's lease ran out: its worker died or the job is too slow
+        _finish(job_id, attempts, status='failed', finished_at=now,
+                last_error='Visibility timeout expired on the last attempt')
+        return True
+
+    _current.job = (job_id, attempts)
+    try:
+        func = HANDLERS.get(kind)
+        if func is None:
+            raise LookupError(f"No handler for job kind {kind!r}")
+        func(json.loads(payload))
+    except Exception:
+        db.session.rollback()
+        error = traceback.format_exc()[-MAX_ERROR_LENGTH:]
+        now = datetime.utcnow()
+        if attempts >= max_attempts:
+            _finish(job_id, attempts, status='failed', finished_at=now, last_error=error)
+        else:
+            _finish(job_id, attempts, status='queued', last_error=error,
+                    run_at=now + timedelta(seconds=_backoff(attempts)))
+        print(f"Warning: job {job_id} ({kind}) failed on attempt {attempts}/{max_attempts}")
+    else:
+        db.session.execute(_COMPLETE, {'job_id': job_id, 'job_attempts': attempts, 'now': datetime.utcnow()})
+        db.session.commit()
+    finally:
+        _current.job = None
+    return True
+
+
+def purge():
+    """Drop jobs that finished successfully more than JOBS_RETENTION_SECONDS ago."""
+    retention = timedelta(seconds=current_app.config.get('JOBS_RETENTION_SECONDS', 7 * 24 * 3600))
+    Job.query.filter(
+        Job.status == 'done', Job.finished_at < datetime.utcnow() - retention
+    ).delete(synchronize_session=False)
+    db.session.commit()
+
+
+def _maybe_purge():
+    global _next_purge
+    now = time.monotonic()
+    if now < _next_purge or not _purge_lock.acquire(blocking=False):
+        return
+    try:
+        _next_purge = now + PURGE_INTERVAL
+        purge()
+    finally:
+        _purge_lock.release()
+
+
+def work(app, stop, name):
+    """Worker loop: run due jobs until stop is set, polling when idle."""
+    poll = app.config.get('JOBS_POLL_SECONDS', 1.0)
+    while not stop.is_set():
+        busy = False
+        try:
+            with app.app_context():
+                busy = run_one(name)
+                _maybe_purge()
+        except Exception as e:
+            print(f"Warning: job worker {name} failed: {e}")
+        if not busy:
+            stop.wait(poll)
+
+
+def start_embedded(app):
+    """Start this process's JOBS_EMBEDDED_WORKERS threads, once.
+
+    Called on the first request rather than at import, so with a pre-forking
+    server every worker process starts its own.
+    """
+    global _embedded_started
+    if _embedded_started:
+        return
+    with _embedded_lock:
+        if _embedded_started:
+            return
+        stop = threading.Event()
+        for index in range(app.config.get('JOBS_EMBEDDED_WORKERS', 0)):
+            threading.Thread(
+                target=work, args=(app, stop, worker_name(index)),
+                name=f'jobs-{index}', daemon=True
+            ).start()
+        _embedded_started = True
+
+
+#=============================
+#========= Introspection
+#=============================
+
+def stats():
+    """Queue depth per kind and status, plus how far behind the workers are."""
+    now = datetime.utcnow()
+    kinds = {}
+    totals = {'queued': 0, 'running': 0, 'done': 0, 'failed': 0}
+    for kind, status, count in db.session.query(
+        Job.kind, Job.status, db.func.count(Job.id)
+    ).group_by(Job.kind, Job.status):
+        kinds.setdefault(kind, {})[status] = count
+        totals[status] = totals.get(status, 0) + count
+
+    due = db.session.query(db.func.count(Job.id), db.func.min(Job.run_at)).filter(
+        Job.status == 'queued', Job.run_at <= now
+    ).one()
+    expired = db.session.query(db.func.count(Job.id)).filter(
+        Job.status == 'running', Job.locked_until < now
+    ).scalar()
+    finished_last_hour = db.session.query(db.func.count(Job.id)).filter(
+        Job.status == 'done', Job.finished_at >= now - timedelta(hours=1)
+    ).scalar()
+
+    return {
+        **totals,
+        'due': due[0],
+        # Age of the oldest job that could run now; 0 when workers keep up
+        'lag_seconds': round((now - due[1]).total_seconds(), 1) if due[1] else 0,
+        'expired_leases': expired,
+        'done_last_hour': finished_last_hour,
+        'kinds': kinds,
+    }
+
+
+def serialize(job):
+    return {
+        'id': job.id,
+        'kind': job.kind,
+        'status': job.status,
+        'payload': json.loads(job.payload),
+        'progress': json.loads(job.progress) if job.progress else None,
+        'attempts': job.attempts,
+        'max_attempts': job.max_attempts,
+        'run_at': job.run_at.isoformat() if job.run_at else None,
+        'created_at': job.created_at.isoformat() if job.created_at else None,
+        'started_at': job.started_at.isoformat() if job.started_at else None,
+        'finished_at': job.finished_at.isoformat() if job.finished_at else None,
+        'last_error': job.last_error,
+    }
+
+
+def retry(job):
+    """Put a failed job back in the queue with a fresh set of attempts. Caller commits."""
+    job.status = 'queued'
+    job.attempts = 0
+    job.run_at = datetime.utcnow()
+    job.finished_at = None
+    job.locked_until = None
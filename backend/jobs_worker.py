@@ -0,0 +1,39 @@
+# backend/jobs_worker.py
+#
+# Dedicated background job worker (see jobs.py):
+#
+#     python jobs_worker.py [--threads N]
+#
+# Set JOBS_EMBEDDED_WORKERS=0 for the web server when running this. Stops on
+# SIGTERM / Ctrl-C after the jobs in progress finish.
+import argparse
+import signal
+import threading
+from app import create_app
+import jobs
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run background jobs.')
+    parser.add_argument('--threads', type=int, default=2, help='jobs run in parallel (default 2)')
+    args = parser.parse_args()
+
+    app = create_app()
+    stop = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *_: stop.set())
+    signal.signal(signal.SIGINT, lambda *_: stop.set())
+
+    threads = [
+        threading.Thread(target=jobs.work, args=(app, stop, jobs.worker_name(index)), name=f'jobs-{index}')
+        for index in range(args.threads)
+    ]
+    for thread in threads:
+        thread.start()
+    print(f"▶ job worker running with {args.threads} threads")
+    for thread in threads:
+        thread.join()
+    print("✅ job worker stopped")
+
+
+if __name__ == '__main__':
+    main()
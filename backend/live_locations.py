@@ -0,0 +1,131 @@
+# backend/live_locations.py
+#
+# Latest worker positions, served from memory.
+#
+# Dashboards poll every worker's position every few seconds, so each process
+# keeps a mirror of the locations table (one row per worker) together with the
+# worker's name, city and status. Reads are dict lookups with no DB query.
+#
+# The locations table is the shared store: writes in this process update the
+# mirror directly (put), and every process pulls rows written elsewhere by
+# locations.updated_at at most every LOCATION_CACHE_SYNC_SECONDS. Worker
+# details (city, name, active flag) are written through by the worker routes
+# in this process (remember), and each sync also picks up workers created
+# elsewhere by id. Other processes' edits are reloaded in full every
+# WORKER_CACHE_REFRESH_SECONDS, which bounds how long a worker moved or
+# deactivated there can still show up under their old city.
+import threading
+import time
+from datetime import datetime, timedelta
+import pytz
+from flask import current_app
+from models import db, Employee, Location
+
+IST = pytz.timezone('Asia/Kolkata')
+SYNC_OVERLAP = timedelta(seconds=5)  # re-read window for rows committed late
+
+_lock = threading.Lock()
+_positions = {}  # worker_id -> position dict (see _position)
+_workers = {}  # worker_id -> {'name', 'city_id', 'is_active'}
+_last_sync = None
+_next_sync = 0.0
+_next_refresh = 0.0
+
+
+def _position(latitude, longitude, timestamp):
+    # Converted to IST once per write instead of on every poll
+    return {
+        'latitude': latitude,
+        'longitude': longitude,
+        'timestamp': timestamp,  # naive UTC
+        'timestamp_ist': pytz.utc.localize(timestamp).astimezone(IST),
+    }
+
+
+def _store(worker_id, latitude, longitude, timestamp):
+    current = _positions.get(worker_id)
+    if timestamp is None or (current and current['timestamp'] > timestamp):
+        return
+    _positions[worker_id] = _position(latitude, longitude, timestamp)
+
+
+def _details(name, city_id, is_active):
+    return {'name': name, 'city_id': city_id, 'is_active': is_active}
+
+
+def _sync():
+    global _workers, _last_sync, _next_sync, _next_refresh
+    now = datetime.utcnow()
+    config = current_app.config
+
+    if time.monotonic() >= _next_refresh:
+        # Built aside and swapped in, so readers never see a half-filled dict
+        _workers = {
+            worker_id: _details(name, city_id, is_active)
+            for worker_id, name, city_id, is_active in db.session.query(
+                Employee.id, Employee.name, Employee.city_id, Employee.is_active
+            ).filter(Employee.role == 'worker')
+        }
+        _next_refresh = time.monotonic() + config.get('WORKER_CACHE_REFRESH_SECONDS', 30)
+    else:
+        # Workers created since, by any process: a range scan on the primary key
+        for worker_id, name, city_id, is_active in db.session.query(
+            Employee.id, Employee.name, Employee.city_id, Employee.is_active
+        ).filter(Employee.role == 'worker', Employee.id > max(_workers, default=0)):
+            _workers[worker_id] = _details(name, city_id, is_active)
+
+    rows = db.session.query(
+        Location.worker_id, Location.latitude, Location.longitude, Location.timestamp,
+        Employee.name, Employee.city_id, Employee.is_active
+    ).join(Employee, Employee.id == Location.worker_id).filter(Employee.role == 'worker')
+    if _last_sync is not None:
+        rows = rows.filter(Location.updated_at >= _last_sync - SYNC_OVERLAP)
+
+    for worker_id, latitude, longitude, timestamp, name, city_id, is_active in rows:
+        _store(worker_id, latitude, longitude, timestamp)
+        _workers[worker_id] = _details(name, city_id, is_active)
+
+    _last_sync = now
+    _next_sync = time.monotonic() + config.get('LOCATION_CACHE_SYNC_SECONDS', 1.0)
+
+
+def _maybe_sync():
+    if time.monotonic() >= _next_sync:
+        with _lock:
+            if time.monotonic() >= _next_sync:
+                _sync()
+
+
+def put(worker_id, latitude, longitude, timestamp):
+    """Write-through after this process committed a new position."""
+    with _lock:
+        _store(worker_id, latitude, longitude, timestamp)
+
+
+def remember(worker):
+    """Write-through after this process committed a new or changed worker."""
+    with _lock:
+        _workers[worker.id] = _details(worker.name, worker.city_id, worker.is_active)
+
+
+def get(worker_id):
+    """(worker details, latest position) for a worker; either may be None."""
+    _maybe_sync()
+    worker = _workers.get(worker_id)
+    if worker is None:
+        # Not seen by this process yet, e.g. created a moment ago elsewhere
+        employee = db.session.get(Employee, worker_id)
+        if employee is not None and employee.role == 'worker':
+            remember(employee)
+            worker = _workers.get(worker_id)
+    return worker, _positions.get(worker_id)
+
+
+def for_city(city_id):
+    """Every active worker in a city with their latest position (None if unknown)."""
+    _maybe_sync()
+    return [
+        (worker_id, worker, _positions.get(worker_id))
+        for worker_id, worker in list(_workers.items())
+        if worker['city_id'] == city_id and worker['is_active']
+    ]
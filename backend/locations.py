@@ -0,0 +1,203 @@
+# backend/locations.py
+#
+# Worker GPS ingestion.
+#
+# Every point is appended to location_history; the locations table keeps one
+# "latest position" row per worker for the live views. A batch is written with
+# one multi-row INSERT into the history and one upsert of the latest row, in a
+# single transaction. Points already stored (same worker and recorded_at, e.g.
+# a batch re-sent after a dropped response) are skipped, and an older batch
+# arriving late never moves the latest position backwards.
+#
+# The same transaction folds the newly stored points into per-minute and
+# per-hour location_rollups, so zoomed-out maps read a few rows per hour
+# instead of the raw track.
+from datetime import datetime, timedelta, timezone
+from sqlalchemy.dialects import postgresql, sqlite
+from models import db, Location, LocationHistory, LocationRollup
+from geo import parse_lat_lon, simplify_track
+
+MAX_BATCH_POINTS = 1000
+# Device clocks drift; points further ahead than this are rejected
+MAX_CLOCK_SKEW = timedelta(minutes=5)
+
+ROLLUP_RESOLUTIONS = {
+    'minute': lambda t: t.replace(second=0, microsecond=0),
+    'hour': lambda t: t.replace(minute=0, second=0, microsecond=0),
+}
+
+
+def _insert(model):
+    dialect = db.engine.dialect.name
+    if dialect == 'postgresql':
+        return postgresql.insert(model)
+    if dialect == 'sqlite':
+        return sqlite.insert(model)
+    raise NotImplementedError(f'Location upserts are not implemented for {dialect}')
+
+
+def parse_timestamp(value, default=None):
+    """ISO 8601 string or Unix time (seconds or milliseconds) -> naive UTC datetime."""
+    if value is None or value == '':
+        return default
+    if isinstance(value, str):
+        try:
+            value = float(value)  # Unix time passed in a query string
+        except ValueError:
+            pass
+    try:
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            if value > 1e11:  # milliseconds
+                value = value / 1000
+            return datetime.fromtimestamp(value, tz=timezone.utc).replace(tzinfo=None)
+        parsed = datetime.fromisoformat(str(value).replace('Z', '+00:00'))
+    except (TypeError, ValueError, OverflowError, OSError):
+        return None
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+
+def parse_points(raw_points):
+    """Validate client points; returns (rows, rejected_count)."""
+    now = datetime.utcnow()
+    rows, rejected = {}, 0
+    for point in raw_points:
+        if not isinstance(point, dict):
+            rejected += 1
+            continue
+        lat, lon = parse_lat_lon(point)
+        recorded_at = parse_timestamp(point.get('timestamp'), default=now)
+        if lat is None or recorded_at is None or recorded_at > now + MAX_CLOCK_SKEW:
+            rejected += 1
+            continue
+        accuracy = point.get('accuracy')
+        # Keyed by time: duplicates inside one batch collapse to the last one
+        rows[recorded_at] = {
+            'latitude': lat,
+            'longitude': lon,
+            'accuracy': float(accuracy) if isinstance(accuracy, (int, float)) else None,
+            'recorded_at': recorded_at,
+        }
+    return list(rows.values()), rejected
+
+
+def record_points(worker_id, rows):
+    """Append points to the history and advance the latest position. Caller commits.
+
+    Returns the newest of the points (None for an empty batch).
+    """
+    if not rows:
+        return None
+    received_at = datetime.utcnow()
+    history = [dict(row, worker_id=worker_id, received_at=received_at) for row in rows]
+    inserted = db.session.execute(
+        _insert(LocationHistory)
+        .on_conflict_do_nothing(index_elements=['worker_id', 'recorded_at'])
+        .returning(LocationHistory.latitude, LocationHistory.longitude, LocationHistory.recorded_at),
+        history
+    ).all()
+    # Only points actually stored count, so a re-sent batch isn't summed twice
+    add_to_rollups(worker_id, inserted)
+
+    newest = max(rows, key=lambda row: row['recorded_at'])
+    upsert = _insert(Location).values(
+        worker_id=worker_id,
+        latitude=newest['latitude'],
+        longitude=newest['longitude'],
+        timestamp=newest['recorded_at'],
+        updated_at=received_at,
+    )
+    db.session.execute(upsert.on_conflict_do_update(
+        index_elements=['worker_id'],
+        set_={
+            'latitude': upsert.excluded.latitude,
+            'longitude': upsert.excluded.longitude,
+            'timestamp': upsert.excluded.timestamp,
+            'updated_at': upsert.excluded.updated_at,
+        },
+        where=db.or_(Location.timestamp.is_(None), Location.timestamp <= upsert.excluded.timestamp),
+    ))
+    return newest
+
+
+def add_to_rollups(worker_id, points):
+    """Fold (latitude, longitude, recorded_at) points into the rollup buckets."""
+    buckets = {}
+    for latitude, longitude, recorded_at in points:
+        for resolution, truncate in ROLLUP_RESOLUTIONS.items():
+            key = (resolution, truncate(recorded_at))
+            bucket = buckets.get(key)
+            if bucket is None:
+                buckets[key] = [1, latitude, longitude, recorded_at, recorded_at]
+            else:
+                bucket[0] += 1
+                bucket[1] += latitude
+                bucket[2] += longitude
+                bucket[3] = min(bucket[3], recorded_at)
+                bucket[4] = max(bucket[4], recorded_at)
+    if not buckets:
+        return
+
+    upsert = _insert(LocationRollup)
+    excluded = upsert.excluded
+    db.session.execute(
+        upsert.on_conflict_do_update(
+            index_elements=['worker_id', 'resolution', 'bucket_start'],
+            set_={
+                'points': LocationRollup.points + excluded.points,
+                'sum_latitude': LocationRollup.sum_latitude + excluded.sum_latitude,
+                'sum_longitude': LocationRollup.sum_longitude + excluded.sum_longitude,
+                'first_at': db.case((excluded.first_at < LocationRollup.first_at, excluded.first_at),
+                                    else_=LocationRollup.first_at),
+                'last_at': db.case((excluded.last_at > LocationRollup.last_at, excluded.last_at),
+                                   else_=LocationRollup.last_at),
+            }
+        ),
+        [
+            {
+                'worker_id': worker_id,
+                'resolution': resolution,
+                'bucket_start': bucket_start,
+                'points': points,
+                'sum_latitude': sum_latitude,
+                'sum_longitude': sum_longitude,
+                'first_at': first_at,
+                'last_at': last_at,
+            }
+            for (resolution, bucket_start), (points, sum_latitude, sum_longitude, first_at, last_at)
+            in buckets.items()
+        ]
+    )
+
+
+def track(worker_id, start, end, tolerance):
+    """A worker's raw track in [start, end), simplified to ``tolerance`` metres.
+
+    Returns (points, original_count); points are (latitude, longitude, recorded_at).
+    """
+    rows = db.session.query(
+        LocationHistory.latitude, LocationHistory.longitude, LocationHistory.recorded_at
+    ).filter(
+        LocationHistory.worker_id == worker_id,
+        LocationHistory.recorded_at >= start,
+        LocationHistory.recorded_at < end
+    ).order_by(LocationHistory.recorded_at).all()
+    return simplify_track(rows, tolerance), len(rows)
+
+
+def rollups(worker_id, start, end, resolution):
+    """Rollup buckets overlapping [start, end) as (centroid latitude, centroid longitude, bucket_start, points)."""
+    rows = db.session.query(
+        LocationRollup.sum_latitude, LocationRollup.sum_longitude, LocationRollup.points,
+        LocationRollup.bucket_start
+    ).filter(
+        LocationRollup.worker_id == worker_id,
+        LocationRollup.resolution == resolution,
+        LocationRollup.bucket_start >= ROLLUP_RESOLUTIONS[resolution](start),
+        LocationRollup.bucket_start < end
+    ).order_by(LocationRollup.bucket_start)
+    return [
+        (sum_lat / points, sum_lon / points, bucket_start, points)
+        for sum_lat, sum_lon, points, bucket_start in rows
+    ]
@@ -22,12 +22,15 @@ class City(db.Model):
 
 class Employee(db.Model): 
     __tablename__ = 'employees'
+    __table_args__ = (
+        db.Index('ix_employees_role_city_active', 'role', 'city_id', 'is_active'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100), nullable=False)
     username = db.Column(db.String(80), unique=True, nullable=False)
     phone = db.Column(db.String(15), nullable=False)
-    email = db.Column(db.String(120))
+    email = db.Column(db.String(120), index=True)
     address = db.Column(db.Text, nullable=False)
     password = db.Column(db.String(200), nullable=False)
     role = db.Column(db.String(20), default='worker')
@@ -44,12 +47,20 @@ class Employee(db.Model):
 
 class Hotel(db.Model):
     __tablename__ = 'hotels'
+    __table_args__ = (
+        db.Index('ix_hotels_city_active', 'city_id', 'is_active'),
+        # "Near me": prefix range scans within a city's active hotels
+        db.Index('ix_hotels_city_active_geohash', 'city_id', 'is_active', 'geohash'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100), nullable=False)
     phone = db.Column(db.String(15), nullable=False)
     address = db.Column(db.String(200), nullable=False)
     location = db.Column(db.String(100), nullable=False)
+    latitude = db.Column(db.Float)
+    longitude = db.Column(db.Float)
+    geohash = db.Column(db.String(12))  # geo.geohash_encode(latitude, longitude)
     is_active = db.Column(db.Boolean, default=True)
     city_id = db.Column(db.Integer, db.ForeignKey('cities.id'), nullable=False)
 
@@ -59,22 +70,52 @@ class Hotel(db.Model):
 
 
 class Certificate(db.Model):
+    """Metadata of a hotel certificate; the file is in CERTIFICATE_FOLDER (see certificates.py)."""
     __tablename__ = 'certificates'
 
     id = db.Column(db.Integer, primary_key=True)
-    certificate = db.Column(db.LargeBinary, nullable=False)
-    hotel_id = db.Column(db.Integer, db.ForeignKey('hotels.id'), nullable=False)
+    filename = db.Column(db.String(255))  # as uploaded, offered on download
+    content_hash = db.Column(db.String(64), nullable=False, index=True)  # sha256, names the file
+    size = db.Column(db.BigInteger, nullable=False)
+    mime_type = db.Column(db.String(100), nullable=False)
+    uploaded_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    hotel_id = db.Column(db.Integer, db.ForeignKey('hotels.id'), nullable=False, index=True)
     hotel = db.relationship('Hotel', backref='certificates')
 
 
 class Media(db.Model):
     __tablename__ = 'media'
+    # Listings filter on uploader / hotel / type and page on (uploaded_at, id).
+    __table_args__ = (
+        db.Index('ix_media_uploaded_at_id', 'uploaded_at', 'id'),
+        db.Index('ix_media_uploaded_by_uploaded_at', 'uploaded_by', 'uploaded_at', 'id'),
+        db.Index('ix_media_hotel_uploaded_at', 'hotel_id', 'uploaded_at', 'id'),
+        db.Index('ix_media_type_uploaded_at', 'media_type', 'uploaded_at', 'id'),
+        db.Index('ix_media_verified_uploaded_at', 'location_verified', 'uploaded_at', 'id'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
-    filename = db.Column(db.String(255), nullable=False)
+    filename = db.Column(db.String(255), nullable=False, index=True)  # path inside UPLOAD_FOLDER
+    original_filename = db.Column(db.String(255), nullable=True)
+    content_hash = db.Column(db.String(64), nullable=True, index=True)  # sha256 of the stored file
     media_type = db.Column(db.String(20), nullable=False)
+    # Photos are re-encoded in the background (see photo_processing.py)
+    original_file = db.Column(db.String(255), nullable=True, index=True)  # the upload as sent, if kept
+    taken_at = db.Column(db.DateTime, nullable=True)  # EXIF capture time, camera local time
+    processed_at = db.Column(db.DateTime, nullable=True)
+    # Video metadata, filled in by the background poster job
+    poster_filename = db.Column(db.String(255), nullable=True)
+    duration = db.Column(db.Float, nullable=True)  # seconds
+    width = db.Column(db.Integer, nullable=True)
+    height = db.Column(db.Integer, nullable=True)
+    video_codec = db.Column(db.String(32), nullable=True)
     description = db.Column(db.Text, nullable=True)
-    location = db.Column(db.String(200), nullable=True)
+    location = db.Column(db.String(200), nullable=True)  # raw value sent by the client
+    latitude = db.Column(db.Float, nullable=True)
+    longitude = db.Column(db.Float, nullable=True)
+    # Geofence against the hotel's position (see geofence.py); None = nothing to compare
+    distance_m = db.Column(db.Float, nullable=True)
+    location_verified = db.Column(db.Boolean, nullable=True)
     uploaded_at = db.Column(db.DateTime, default=ist_now)
 
     uploaded_by = db.Column(db.Integer, db.ForeignKey('employees.id'), nullable=False)
@@ -84,16 +125,151 @@ class Media(db.Model):
     hotel = db.relationship('Hotel', backref='hotel_media', lazy=True)
 
 
+class UploadSession(db.Model):
+    """A resumable upload in progress; becomes a Media row on finalize."""
+    __tablename__ = 'upload_sessions'
+
+    id = db.Column(db.String(32), primary_key=True)
+    worker_id = db.Column(db.Integer, db.ForeignKey('employees.id'), nullable=False)
+    hotel_id = db.Column(db.Integer, db.ForeignKey('hotels.id'), nullable=False)
+    filename = db.Column(db.String(255), nullable=False)
+    total_size = db.Column(db.BigInteger, nullable=False)
+    received = db.Column(db.BigInteger, nullable=False, default=0)
+    description = db.Column(db.Text, nullable=True)
+    location = db.Column(db.String(200), nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+
+
 class Location(db.Model):
+    """Latest known position, one row per worker (history is in LocationHistory)."""
     __tablename__ = 'locations'
+    __table_args__ = (
+        db.Index('ix_locations_worker_timestamp', 'worker_id', 'timestamp'),
+        db.Index('ux_locations_worker', 'worker_id', unique=True),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     worker_id = db.Column(db.Integer, db.ForeignKey('employees.id'), nullable=False)
     latitude = db.Column(db.Float, nullable=False)
     longitude = db.Column(db.Float, nullable=False)
     timestamp = db.Column(db.DateTime, default=datetime.utcnow)
+    # Server time of the last write; live_locations pulls changes by this
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
 
     worker = db.relationship('Employee', backref='locations')
 
 
+class LocationHistory(db.Model):
+    """Every GPS point a worker reported, appended in batches."""
+    __tablename__ = 'location_history'
+    __table_args__ = (
+        # One point per worker and instant, so a re-sent batch inserts nothing twice
+        db.Index('ux_location_history_worker_recorded', 'worker_id', 'recorded_at', unique=True),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    worker_id = db.Column(db.Integer, db.ForeignKey('employees.id'), nullable=False)
+    latitude = db.Column(db.Float, nullable=False)
+    longitude = db.Column(db.Float, nullable=False)
+    accuracy = db.Column(db.Float)  # metres, as reported by the device
+    recorded_at = db.Column(db.DateTime, nullable=False)  # UTC, when the device took the fix
+    received_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+
+class LocationRollup(db.Model):
+    """Per-minute / per-hour summary of a worker's LocationHistory, kept up to date at ingest."""
+    __tablename__ = 'location_rollups'
+    __table_args__ = (
+        db.Index('ux_location_rollups_bucket', 'worker_id', 'resolution', 'bucket_start', unique=True),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    worker_id = db.Column(db.Integer, db.ForeignKey('employees.id'), nullable=False)
+    resolution = db.Column(db.String(8), nullable=False)  # 'minute' or 'hour'
+    bucket_start = db.Column(db.DateTime, nullable=False)  # UTC
+    points = db.Column(db.Integer, nullable=False)
+    sum_latitude = db.Column(db.Float, nullable=False)  # centroid = sum / points
+    sum_longitude = db.Column(db.Float, nullable=False)
+    first_at = db.Column(db.DateTime, nullable=False)
+    last_at = db.Column(db.DateTime, nullable=False)
+
+
+class RevokedToken(db.Model):
+    """Logged-out JWTs, shared by every worker process until they expire."""
+    __tablename__ = 'revoked_tokens'
+
+    id = db.Column(db.Integer, primary_key=True)
+    jti = db.Column(db.String(36), nullable=False, unique=True)
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)  # UTC, from the token's exp
+    revoked_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False, index=True)
+
+
+class TokenVersion(db.Model):
+    """Per-employee token version; tokens carrying an older "ver" claim are rejected.
+
+    Bumped when an employee is deactivated, moved to another city, has their
+    password reset or is deleted (no FK, so the row outlives the employee).
+    """
+    __tablename__ = 'token_versions'
+
+    employee_id = db.Column(db.Integer, primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False, index=True)
+
+
+class Event(db.Model):
+    """Live activity (locations, uploads) fanned out to SSE subscribers by events.py.
+
+    The id doubles as the SSE event id clients resume from with Last-Event-ID.
+    """
+    __tablename__ = 'events'
+
+    id = db.Column(db.Integer, primary_key=True)
+    type = db.Column(db.String(32), nullable=False)
+    city_id = db.Column(db.Integer, index=True)
+    payload = db.Column(db.Text, nullable=False)  # JSON
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False, index=True)
+
+
+class Job(db.Model):
+    """A unit of background work, run by jobs.py workers (see jobs.py for the life cycle)."""
+    __tablename__ = 'jobs'
+    __table_args__ = (
+        # Claiming: the next due queued job, and running jobs whose lease ran out
+        db.Index('ix_jobs_status_run_at', 'status', 'run_at', 'id'),
+        db.Index('ix_jobs_status_locked_until', 'status', 'locked_until'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(64), nullable=False)
+    payload = db.Column(db.Text, nullable=False)  # JSON
+    status = db.Column(db.String(16), nullable=False, default='queued')  # queued, running, done, failed
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    max_attempts = db.Column(db.Integer, nullable=False, default=5)
+    run_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)  # not before (UTC)
+    locked_until = db.Column(db.DateTime)  # lease of the worker running it
+    locked_by = db.Column(db.String(64))
+    last_error = db.Column(db.Text)
+    progress = db.Column(db.Text)  # JSON, reported by long handlers (see jobs.progress)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    started_at = db.Column(db.DateTime)
+    finished_at = db.Column(db.DateTime, index=True)
+
+
+class ReconcileRun(db.Model):
+    """One pass of the uploads/Media reconciliation sweep (see reconcile.py)."""
+    __tablename__ = 'reconcile_runs'
+
+    id = db.Column(db.Integer, primary_key=True)
+    mode = db.Column(db.String(8), nullable=False, default='report')  # 'report' or 'remove'
+    status = db.Column(db.String(16), nullable=False, default='running')  # running, done, cancelled
+    phase = db.Column(db.String(8), nullable=False, default='files')  # 'files', then 'rows'
+    cursor = db.Column(db.String(255))  # last file path / Media id handled in this phase
+    counts = db.Column(db.Text, nullable=False, default='{}')  # JSON
+    findings = db.Column(db.Text, nullable=False, default='[]')  # JSON, first RECONCILE_MAX_FINDINGS
+    started_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    finished_at = db.Column(db.DateTime)
+
+
 print("✅ models.py loaded successfully")
@@ -0,0 +1,76 @@
+# backend/passwords.py
+#
+# Password hashing with configurable parameters.
+#
+# PASSWORD_HASH_METHOD / PASSWORD_SALT_LENGTH are passed to werkzeug. Stored
+# hashes made with other parameters still verify, and login re-hashes them
+# with the current ones (see needs_rehash).
+#
+# Hashing is deliberately slow. With PASSWORD_HASH_WORKERS > 0 it runs on a
+# small thread pool: hashlib's pbkdf2/scrypt release the GIL, so the pool caps
+# how many cores a login burst can take while other requests keep being
+# served. At most PASSWORD_HASH_QUEUE callers may wait for the pool; beyond
+# that hashing raises HasherBusy instead of piling up blocked workers.
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from flask import current_app
+from werkzeug.security import generate_password_hash, check_password_hash
+
+
+class HasherBusy(Exception):
+    """Raised when the hashing pool is saturated."""
+
+
+_init_lock = threading.Lock()
+_executor = None
+_slots = None
+_method_prefix = {}  # configured method -> method string werkzeug stores
+
+
+def _config():
+    config = current_app.config
+    return (
+        config.get('PASSWORD_HASH_METHOD', 'scrypt'),
+        config.get('PASSWORD_SALT_LENGTH', 16),
+    )
+
+
+def _run(fn, *args):
+    global _executor, _slots
+    workers = current_app.config.get('PASSWORD_HASH_WORKERS', 0)
+    if not workers:
+        return fn(*args)
+
+    if _executor is None:
+        with _init_lock:
+            if _executor is None:
+                _slots = threading.BoundedSemaphore(
+                    workers + current_app.config.get('PASSWORD_HASH_QUEUE', 32)
+                )
+                _executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='passwords')
+
+    if not _slots.acquire(timeout=current_app.config.get('PASSWORD_HASH_TIMEOUT', 5)):
+        raise HasherBusy()
+    try:
+        return _executor.submit(fn, *args).result()
+    finally:
+        _slots.release()
+
+
+def hash_password(password):
+    method, salt_length = _config()
+    return _run(generate_password_hash, password, method, salt_length)
+
+
+def verify_password(pwhash, password):
+    return _run(check_password_hash, pwhash, password)
+
+
+def needs_rehash(pwhash):
+    """True if pwhash was not made with the configured method and parameters."""
+    method, _ = _config()
+    if method not in _method_prefix:
+        # werkzeug fills in default parameters ("scrypt" -> "scrypt:32768:8:1"),
+        # so learn the stored form from one throwaway hash.
+        _method_prefix[method] = generate_password_hash('', method).split('$', 1)[0]
+    return pwhash.split('$', 1)[0] != _method_prefix[method]
@@ -0,0 +1,46 @@
+# backend/permissions.py
+from functools import wraps
+from flask import g, jsonify
+from flask_jwt_extended import jwt_required, get_jwt, get_jwt_identity
+from models import db, Employee
+import token_blacklist
+
+
+def token_claims(user):
+    """Claims issued in every access/refresh token for an employee."""
+    return {
+        'role': user.role,
+        'email': user.email,
+        'city_id': user.city_id,
+        'ver': token_blacklist.current_version(user.id)
+    }
+
+
+def role_required(*roles, error='Unauthorized', locations=None):
+    """jwt_required() plus a role check, answered from the token alone.
+
+    On success g.user_id, g.role and g.city_id are set from the claims, so
+    the view needs no Employee lookup just to scope its queries. Tokens
+    issued before city_id was a claim fall back to one lookup. ``locations``
+    is passed to jwt_required (e.g. to also accept ?jwt= for EventSource).
+    """
+    def decorator(fn):
+        @wraps(fn)
+        @jwt_required(locations=locations)
+        def wrapper(*args, **kwargs):
+            claims = get_jwt()
+            if claims.get('role') not in roles:
+                return jsonify({'error': error}), 403
+
+            g.user_id = int(get_jwt_identity())
+            g.role = claims['role']
+            if 'city_id' in claims:
+                g.city_id = claims['city_id']
+            else:
+                user = db.session.get(Employee, g.user_id)
+                if user is None:
+                    return jsonify({'error': 'User not found'}), 404
+                g.city_id = user.city_id
+            return fn(*args, **kwargs)
+        return wrapper
+    return decorator
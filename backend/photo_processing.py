@@ -0,0 +1,190 @@
+# backend/photo_processing.py
+#
+# Post-upload processing of photo originals, off the request path.
+#
+# Phones send 5-12 MB JPEGs carrying full EXIF (GPS, device serials, capture
+# time) and an orientation flag instead of upright pixels. Each upload queues a
+# 'photo.process' job (see jobs.py) in its own transaction, which:
+#   1. reads the EXIF capture time and GPS position into the Media row (the
+#      GPS fills in the upload's coordinates only when the client sent none,
+#      and the geofence is checked again);
+#   2. applies the orientation, drops every other metadata block (the ICC
+#      colour profile is kept) and re-encodes at PHOTO_QUALITY, downscaled to
+#      fit PHOTO_MAX_DIMENSION;
+#   3. stores the result in the content store and points the row at it. The
+#      upload is kept as Media.original_file when PHOTO_KEEP_ORIGINALS is set,
+#      otherwise it is released.
+# media.processed_at marks rows that are done. Without Pillow nothing runs and
+# originals are served as uploaded.
+import os
+import tempfile
+from datetime import datetime
+from flask import current_app
+from sqlalchemy.orm.exc import StaleDataError
+from models import db, Media, Hotel
+import storage
+import geofence
+import derivatives
+import jobs
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # pragma: no cover - Pillow not installed
+    Image = None
+
+EXIF_IFD = 0x8769
+EXIF_GPS_IFD = 0x8825
+EXIF_DATETIME_ORIGINAL = 0x9003
+EXIF_DATETIME = 0x0132
+
+# Re-encoded in their own format; anything else is left alone
+FORMATS = ('JPEG', 'PNG')
+# Image.info entries that are dropped on re-encode (besides EXIF)
+METADATA_KEYS = ('exif', 'xmp', 'XML:com.adobe.xmp', 'comment', 'photoshop')
+
+
+def _dms_to_degrees(dms, ref):
+    degrees, minutes, seconds = (float(part) for part in dms)
+    value = degrees + minutes / 60 + seconds / 3600
+    return -value if ref in ('S', 'W') else value
+
+
+def exif_gps(exif):
+    """(latitude, longitude) from an Image.Exif GPS block, or (None, None)."""
+    try:
+        gps = exif.get_ifd(EXIF_GPS_IFD)
+        if not gps or 2 not in gps or 4 not in gps:
+            return None, None
+        lat = _dms_to_degrees(gps[2], gps.get(1, 'N'))
+        lon = _dms_to_degrees(gps[4], gps.get(3, 'E'))
+    except Exception:
+        return None, None
+    # 0,0 is what some phones write when they had no fix
+    if not (-90 <= lat <= 90 and -180 <= lon <= 180) or (lat == 0 and lon == 0):
+        return None, None
+    return lat, lon
+
+
+def exif_taken_at(exif):
+    """Capture time from EXIF as a naive datetime in the camera's local time, or None."""
+    value = exif.get_ifd(EXIF_IFD).get(EXIF_DATETIME_ORIGINAL) or exif.get(EXIF_DATETIME)
+    try:
+        return datetime.strptime(str(value).strip('\x00 '), '%Y:%m:%d %H:%M:%S')
+    except (TypeError, ValueError):
+        return None
+
+
+def reencode(source, ext, tmp_dir, max_dimension, quality):
+    """Read metadata and write a stripped, downscaled copy of one photo.
+
+    Returns (metadata dict, path of the new temp file or None). No file is
+    written when the photo has nothing to strip, already fits and the
+    re-encoded copy would not be smaller.
+    """
+    with Image.open(source) as img:
+        fmt = img.format
+        exif = img.getexif()
+        latitude, longitude = exif_gps(exif)
+        meta = {'taken_at': exif_taken_at(exif), 'latitude': latitude, 'longitude': longitude}
+        if fmt not in FORMATS:
+            return meta, None
+
+        has_metadata = (
+            len(exif) > 0
+            or any(key in img.info for key in METADATA_KEYS)
+            or bool(getattr(img, 'text', None))  # PNG text chunks
+        )
+        oversized = max(img.size) > max_dimension
+
+        icc_profile = img.info.get('icc_profile')
+        img = ImageOps.exif_transpose(img)
+        if oversized:
+            img.thumbnail((max_dimension, max_dimension), Image.Resampling.LANCZOS)
+
+        os.makedirs(tmp_dir, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=tmp_dir)
+        try:
+            with os.fdopen(fd, 'wb') as out:
+                if fmt == 'JPEG':
+                    if img.mode not in ('RGB', 'L'):
+                        img = img.convert('RGB')
+                    img.save(out, 'JPEG', quality=quality, optimize=True, progressive=True,
+                             icc_profile=icc_profile)
+                else:
+                    img.save(out, 'PNG', optimize=True, icc_profile=icc_profile)
+        except Exception:
+            os.remove(tmp_path)
+            raise
+
+    if not has_metadata and not oversized and os.path.getsize(tmp_path) >= os.path.getsize(source):
+        os.remove(tmp_path)
+        return meta, None
+    return meta, tmp_path
+
+
+def process(media_id):
+    """Process one photo now; needs an app context. Returns True if the row was updated."""
+    media = db.session.get(Media, media_id)
+    if Image is None or media is None or media.media_type != 'image' or media.processed_at is not None:
+        return False
+
+    config = current_app.config
+    original = media.filename
+    ext = original.rsplit('.', 1)[-1].lower()
+    source = storage.absolute_path(original)
+    if not os.path.isfile(source):
+        return False
+
+    try:
+        meta, tmp_path = reencode(
+            source, ext, storage.absolute_path('.tmp'),
+            config.get('PHOTO_MAX_DIMENSION', 2560),
+            config.get('PHOTO_QUALITY', 82)
+        )
+    except Exception as e:
+        print(f"Warning: Could not process photo for media {media_id}: {e}")
+        meta, tmp_path = {}, None
+
+    stored = None
+    if tmp_path:
+        stored, digest = storage.store_file(tmp_path, ext)
+        if stored != original:
+            media.filename, media.content_hash = stored, digest
+            if config.get('PHOTO_KEEP_ORIGINALS'):
+                media.original_file = original
+
+    media.taken_at = meta.get('taken_at')
+    if media.latitude is None and meta.get('latitude') is not None:
+        media.latitude, media.longitude = meta['latitude'], meta['longitude']
+        geofence.check(media, db.session.get(Hotel, media.hotel_id))
+    media.processed_at = datetime.utcnow()
+    if media.filename != original:
+        storage.release_later([original])  # kept if it became original_file
+
+    try:
+        db.session.commit()
+    except StaleDataError:
+        # Deleted while we were encoding
+        db.session.rollback()
+        if stored and stored != original:
+            storage.release_later([stored])
+            db.session.commit()
+        return False
+    return True
+
+
+@jobs.handler('photo.process')
+def _process_job(payload):
+    process(payload['media_id'])
+    media = db.session.get(Media, payload['media_id'])
+    if media is not None:
+        # Previews are cut from the processed file
+        derivatives.generate_all(current_app.config['UPLOAD_FOLDER'], media.filename)
+
+
+def enqueue(media):
+    """Queue a new photo in the current transaction; returns False for other media."""
+    if media.media_type != 'image':
+        return False
+    jobs.enqueue('photo.process', {'media_id': media.id})
+    return True
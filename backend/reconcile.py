@@ -0,0 +1,215 @@
+# backend/reconcile.py
+#
+# Reconciliation of UPLOAD_FOLDER against the media table, in both directions.
+#
+# Files without a row are found by walking the folder in path order and
+# looking each batch of names up with an indexed IN (...) query:
+#   - stored files referenced by no Media.filename / original_file
+#   - derived thumbs / previews / posters whose content hash no row has
+#   - temp files left behind by an interrupted save (.tmp)
+#   - partial chunked uploads whose session is gone (.partial)
+# Rows without a file are found by walking the media table by id:
+#   - rows whose stored file is missing
+#   - rows whose hotel or uploader no longer exists
+#
+# A run is a chain of 'reconcile.sweep' jobs (see jobs.py). Each job handles
+# RECONCILE_BATCH_SIZE files or rows, saves its cursor on the ReconcileRun
+# and queues the next one RECONCILE_PAUSE_SECONDS later. That bounds the I/O
+# the sweep adds to a live server, and lets a restart pick up where it
+# stopped. In 'report' mode nothing is changed. In 'remove' mode orphan
+# files are deleted, and so are dangling rows. Files modified within
+# RECONCILE_GRACE_SECONDS are always skipped: an upload may have stored its
+# file without having committed its row yet.
+import os
+import json
+import time
+from datetime import datetime
+from flask import current_app
+from models import db, Media, Hotel, Employee, UploadSession, ReconcileRun
+import storage
+import jobs
+
+# A batch whose rows are mostly missing their files looks like an unmounted
+# volume, not lost files: such rows are reported but never removed
+MISSING_FILES_SAFETY_RATIO = 0.5
+
+
+def _walk_after(root, rel, cursor):
+    """(relpath, DirEntry) of files under root/rel in path order, strictly after cursor."""
+    try:
+        with os.scandir(os.path.join(root, rel) if rel else root) as it:
+            entries = list(it)
+    except FileNotFoundError:
+        return
+    # Sorting directories as "name/" keeps the walk in plain string order of full paths
+    entries.sort(key=lambda e: e.name + '/' if e.is_dir(follow_symlinks=False) else e.name)
+    for entry in entries:
+        path = f"{rel}/{entry.name}" if rel else entry.name
+        if entry.is_dir(follow_symlinks=False):
+            if cursor and path + '/' <= cursor and not cursor.startswith(path + '/'):
+                continue  # entirely before the cursor
+            yield from _walk_after(root, path, cursor)
+        elif entry.is_file(follow_symlinks=False) and (cursor is None or path > cursor):
+            yield path, entry
+
+
+def _classify(relpath):
+    """('stored' | 'derived' | 'temp' | 'partial', lookup key) for a path under UPLOAD_FOLDER."""
+    if relpath.startswith('.tmp/'):
+        return 'temp', None
+    if relpath.startswith('.partial/'):
+        return 'partial', relpath.rsplit('/', 1)[-1].split('.', 1)[0]  # upload id
+    if relpath.startswith('derived/'):
+        return 'derived', relpath.rsplit('/', 1)[-1].rsplit('.', 1)[0]  # sha256 of the source
+    return 'stored', relpath
+
+
+def _referenced(batch):
+    """Keys of the batch that some row still points at, one indexed query per kind."""
+    keys = {'stored': set(), 'derived': set(), 'partial': set()}
+    for kind, key in batch:
+        if kind in keys:
+            keys[kind].add(key)
+
+    found = set()
+    if keys['stored']:
+        found.update(('stored', name) for name in storage.referenced(keys['stored']))
+    if keys['derived']:
+        found.update(('derived', digest) for (digest,) in db.session.query(Media.content_hash).filter(
+            Media.content_hash.in_(list(keys['derived']))))
+    if keys['partial']:
+        found.update(('partial', upload_id) for (upload_id,) in db.session.query(UploadSession.id).filter(
+            UploadSession.id.in_(list(keys['partial']))))
+    return found
+
+
+def _sweep_files(run, counts, findings, batch_size, remove):
+    grace_cutoff = time.time() - current_app.config.get('RECONCILE_GRACE_SECONDS', 3600)
+    root = storage.upload_folder()
+
+    batch = []
+    for relpath, entry in _walk_after(root, None, run.cursor):
+        if relpath.split('/', 1)[0].startswith('.') and not relpath.startswith(('.tmp/', '.partial/')):
+            continue
+        batch.append((relpath, entry))
+        if len(batch) >= batch_size:
+            break
+    if not batch:
+        return True
+
+    kinds = [_classify(relpath) for relpath, _ in batch]
+    referenced = _referenced(kinds) if any(kind != 'temp' for kind, _ in kinds) else set()
+    for (relpath, entry), (kind, key) in zip(batch, kinds):
+        counts['files_scanned'] = counts.get('files_scanned', 0) + 1
+        if kind != 'temp' and (kind, key) in referenced:
+            continue
+        try:
+            if entry.stat(follow_symlinks=False).st_mtime > grace_cutoff:
+                continue
+        except FileNotFoundError:
+            continue
+        if kind == 'stored' and storage.reference_count(relpath):
+            continue  # referenced since the batch lookup
+
+        finding = f'orphan_{kind}'
+        counts[finding] = counts.get(finding, 0) + 1
+        action = 'reported'
+        if remove:
+            try:
+                os.remove(os.path.join(root, relpath))
+                action = 'removed'
+                counts['removed_files'] = counts.get('removed_files', 0) + 1
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                action = f'error: {e}'
+        findings.append({'type': finding, 'path': relpath, 'action': action})
+
+    run.cursor = batch[-1][0]
+    return False
+
+
+def _sweep_rows(run, counts, findings, batch_size, remove):
+    last_id = int(run.cursor or 0)
+    rows = db.session.query(
+        Media.id, Media.filename, Media.original_file, Hotel.id, Employee.id
+    ).outerjoin(Hotel, Hotel.id == Media.hotel_id).outerjoin(
+        Employee, Employee.id == Media.uploaded_by
+    ).filter(Media.id > last_id).order_by(Media.id).limit(batch_size).all()
+    if not rows:
+        return True
+
+    missing, dangling = [], []
+    for media_id, filename, original_file, hotel_id, employee_id in rows:
+        counts['rows_scanned'] = counts.get('rows_scanned', 0) + 1
+        if hotel_id is None or employee_id is None:
+            dangling.append((media_id, filename, original_file))
+        elif not os.path.isfile(storage.absolute_path(filename)):
+            missing.append((media_id, filename, original_file))
+
+    remove_missing = remove and len(missing) <= MISSING_FILES_SAFETY_RATIO * len(rows)
+    doomed = (dangling if remove else []) + (missing if remove_missing else [])
+    for finding, found, removed in (('dangling_row', dangling, remove), ('missing_file', missing, remove_missing)):
+        counts[finding] = counts.get(finding, 0) + len(found)
+        findings.extend({'type': finding, 'media_id': media_id, 'action': 'removed' if removed else 'reported'}
+                        for media_id, _, _ in found)
+
+    if doomed:
+        # Their files (if any) go once no other row uses them
+        storage.release_later([f for _, filename, original in doomed for f in (filename, original) if f])
+        Media.query.filter(Media.id.in_([media_id for media_id, _, _ in doomed])).delete(synchronize_session=False)
+        counts['removed_rows'] = counts.get('removed_rows', 0) + len(doomed)
+
+    run.cursor = str(rows[-1][0])
+    return False
+
+
+@jobs.handler('reconcile.sweep')
+def _sweep_job(payload):
+    run = db.session.get(ReconcileRun, payload['run_id'])
+    if run is None or run.status != 'running':
+        return
+    config = current_app.config
+    batch_size = config.get('RECONCILE_BATCH_SIZE', 500)
+    max_findings = config.get('RECONCILE_MAX_FINDINGS', 200)
+    counts, findings = json.loads(run.counts), json.loads(run.findings)
+    remove = run.mode == 'remove'
+    if not counts:
+        run.started_at = datetime.utcnow()  # a scheduled run was queued long before
+
+    if run.phase == 'files':
+        if _sweep_files(run, counts, findings, batch_size, remove):
+            run.phase, run.cursor = 'rows', None
+    elif _sweep_rows(run, counts, findings, batch_size, remove):
+        run.status, run.finished_at = 'done', datetime.utcnow()
+
+    run.counts = json.dumps(counts)
+    run.findings = json.dumps(findings[:max_findings])
+    if run.status == 'running':
+        jobs.enqueue('reconcile.sweep', {'run_id': run.id}, delay=config.get('RECONCILE_PAUSE_SECONDS', 1.0))
+    elif config.get('RECONCILE_INTERVAL_SECONDS'):
+        start(run.mode, delay=config['RECONCILE_INTERVAL_SECONDS'])
+    db.session.commit()
+
+
+def start(mode='report', delay=0):
+    """Create a run and queue its first batch. Caller commits."""
+    run = ReconcileRun(mode=mode, status='running', phase='files', counts='{}', findings='[]')
+    db.session.add(run)
+    db.session.flush()
+    jobs.enqueue('reconcile.sweep', {'run_id': run.id}, delay=delay)
+    return run
+
+
+def serialize(run):
+    return {
+        'id': run.id,
+        'mode': run.mode,
+        'status': run.status,
+        'phase': run.phase,
+        'cursor': run.cursor,
+        'counts': json.loads(run.counts),
+        'findings': json.loads(run.findings),
+        'started_at': run.started_at.isoformat() if run.started_at else None,
+        'finished_at': run.finished_at.isoformat() if run.finished_at else None,
+    }
@@ -3,4 +3,6 @@ from .admin_routes import admin_bp
 from .hotel_routes import hotel_bp
 from .worker_routes import worker_bp
 from .superadmin_routes import superadmin_bp  # ✅ CORRECT
-from .media_routes import media_bp
\ No newline at end of file
+from .media_routes import media_bp
+from .events_routes import events_bp
+from .jobs_routes import jobs_bp
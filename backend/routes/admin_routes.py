@@ -1,7 +1,15 @@
-from flask import Blueprint, request, jsonify
-from werkzeug.security import generate_password_hash
-from models import Employee, db, Location, City
+from flask import Blueprint, request, jsonify, g
+from passwords import hash_password
+from models import Employee, db, City
 from flask_jwt_extended import jwt_required, get_jwt_identity, get_jwt
+from sqlalchemy.orm import joinedload
+from streaming import stream_query
+from permissions import role_required
+import token_blacklist
+import live_locations
+import locations
+import cascade
+from datetime import datetime, timedelta
 
 admin_bp = Blueprint('admin', __name__)
 
@@ -9,13 +17,9 @@ admin_bp = Blueprint('admin', __name__)
 # ✅ Create Worker (Only Admins)
 # -------------------------------
 @admin_bp.route('/admin/create-worker', methods=['POST'])
-@jwt_required()
+@role_required('admin', error='Only admins can create workers')
 def create_worker():
-    admin_id = get_jwt_identity()
-    claims = get_jwt()
-
-    if claims['role'] != 'admin':
-        return jsonify({'error': 'Only admins can create workers'}), 403
+    admin_id = g.user_id
 
     data = request.get_json()
     required_fields = ['name', 'username', 'phone', 'address', 'city_id', 'password', 'confirm_password']
@@ -32,12 +36,8 @@ def create_worker():
     if data.get('email') and Employee.query.filter_by(email=data['email']).first():
         return jsonify({'error': 'Email already used'}), 400
 
-    admin = Employee.query.filter_by(id=admin_id, role='admin').first()
-    if not admin:
-        return jsonify({'error': 'Admin not found'}), 400
-
-    if admin.city_id != data['city_id']:
-        return jsonify({'error': f"You can only assign workers to your own area (city id: {admin.city_id})"}), 403
+    if g.city_id != data['city_id']:
+        return jsonify({'error': f"You can only assign workers to your own area (city id: {g.city_id})"}), 403
 
     city = City.query.get(data['city_id'])
     if not city:
@@ -51,13 +51,14 @@ def create_worker():
             email=data.get('email'),
             address=data['address'],
             city_id=data['city_id'],
-            password=generate_password_hash(data['password']),
+            password=hash_password(data['password']),
             created_by=admin_id,
             role='worker',
             is_active=True
         )
         db.session.add(new_worker)
         db.session.commit()
+        live_locations.remember(new_worker)
         return jsonify({
             'message': 'Worker created successfully',
             'worker': {
@@ -75,22 +76,15 @@ def create_worker():
 # ✅ List Workers (Admin & Superadmin)
 # -------------------------------
 @admin_bp.route('/admin/workers', methods=['GET'])
-@jwt_required()
+@role_required('admin', 'superadmin')
 def list_workers():
-    claims = get_jwt()
-    user_id = get_jwt_identity()
-
-    if claims['role'] not in ['admin', 'superadmin']:
-        return jsonify({'error': 'Unauthorized'}), 403
-
     name_filter = request.args.get('name')
     city_id_filter = request.args.get('city_id', type=int)  # Updated to use city ID
 
     query = Employee.query.filter_by(role='worker')
 
-    if claims['role'] == 'admin':
-        admin = Employee.query.get_or_404(user_id)
-        query = query.filter(Employee.city_id == admin.city_id)  # filter by city ID instead of city name
+    if g.role == 'admin':
+        query = query.filter(Employee.city_id == g.city_id)  # filter by city ID instead of city name
 
     if name_filter:
         query = query.filter(Employee.name.ilike(f'%{name_filter}%'))
@@ -98,12 +92,9 @@ def list_workers():
     if city_id_filter:
         query = query.filter(Employee.city_id == city_id_filter)
 
-    workers = query.all()
-
-    result = []
-    for w in workers:
+    def serialize(w):
         city_name = w.city.name if w.city else None  # Make sure relationship is set up in model
-        result.append({
+        return {
             'id': w.id,
             'name': w.name,
             'username': w.username,
@@ -115,9 +106,9 @@ def list_workers():
             'is_active': w.is_active,
             'created_at': w.created_at.strftime('%Y-%m-%d %H:%M:%S') if w.created_at else None,
             'created_by': w.created_by
-        })
+        }
 
-    return jsonify(result)
+    return stream_query(query.options(joinedload(Employee.city)).order_by(Employee.id), serialize)
 
 
 
@@ -125,23 +116,15 @@ def list_workers():
 # ✅ Update or Delete Worker
 # -------------------------------
 @admin_bp.route('/admin/worker/<int:id>', methods=['PUT', 'DELETE'])
-@jwt_required()
+@role_required('admin', 'superadmin')
 def update_delete_worker(id):
-    claims = get_jwt()
-    user_id = get_jwt_identity()
-
-    if claims['role'] not in ['admin', 'superadmin']:
-        return jsonify({'error': 'Unauthorized'}), 403
-
     worker = Employee.query.get_or_404(id)
 
     if worker.role != 'worker':
         return jsonify({'error': 'Not a worker'}), 400
 
-    if claims['role'] == 'admin':
-        admin = Employee.query.get_or_404(user_id)
-        if worker.city != admin.city:
-            return jsonify({'error': 'You can only manage workers in your own city'}), 403
+    if g.role == 'admin' and worker.city_id != g.city_id:
+        return jsonify({'error': 'You can only manage workers in your own city'}), 403
 
     if request.method == 'PUT':
         data = request.get_json()
@@ -164,15 +147,19 @@ def update_delete_worker(id):
                 return jsonify({'error': 'Please confirm the new password'}), 400
             if new_password != confirm_password:
                 return jsonify({'error': 'Passwords do not match'}), 400
-            worker.password = generate_password_hash(new_password)
+            worker.password = hash_password(new_password)
+            token_blacklist.revoke_all_for(worker.id)
 
         db.session.commit()
+        live_locations.remember(worker)
         return jsonify({'message': 'Worker updated successfully'}), 200
 
     elif request.method == 'DELETE':
-        db.session.delete(worker)
+        token_blacklist.revoke_all_for(worker.id)
+        job = cascade.start(worker, g.user_id)  # uploads and locations go in the background
         db.session.commit()
-        return jsonify({'message': 'Worker deleted successfully'}), 200
+        live_locations.remember(worker)  # off the live map right away
+        return jsonify(cascade.accepted(job, 'Worker deletion started')), 202
 
 
 
@@ -180,26 +167,21 @@ def update_delete_worker(id):
 # ✅ Toggle Worker Status (Active / Inactive)
 # -------------------------------
 @admin_bp.route('/admin/worker/<int:id>/toggle-status', methods=['PUT'])
-@jwt_required()
+@role_required('admin', 'superadmin')
 def toggle_worker_status(id):
-    claims = get_jwt()
-    user_id = get_jwt_identity()
-
-    if claims['role'] not in ['admin', 'superadmin']:
-        return jsonify({'error': 'Unauthorized'}), 403
-
     worker = Employee.query.get_or_404(id)
 
     if worker.role != 'worker':
         return jsonify({'error': 'Not a worker'}), 400
 
-    if claims['role'] == 'admin':
-        admin = Employee.query.get_or_404(user_id)
-        if worker.city_id != admin.city_id:  # ✅ Updated check
-            return jsonify({'error': 'You can only manage workers in your own city'}), 403
+    if g.role == 'admin' and worker.city_id != g.city_id:  # ✅ Updated check
+        return jsonify({'error': 'You can only manage workers in your own city'}), 403
 
     worker.is_active = not worker.is_active
+    if not worker.is_active:
+        token_blacklist.revoke_all_for(worker.id)
     db.session.commit()
+    live_locations.remember(worker)
     return jsonify({'message': f"Worker {'activated' if worker.is_active else 'deactivated'} successfully."})
 
 
@@ -207,21 +189,11 @@ def toggle_worker_status(id):
 
 
 
-# location worker
-
-from datetime import timezone
-import pytz  # Make sure this is imported at the top
+# location worker (served from live_locations, no DB query)
 
 @admin_bp.route('/admin/worker-location', methods=['GET'])
-@jwt_required()
+@role_required('admin', 'superadmin')
 def get_worker_location():
-    claims = get_jwt()
-    role = claims.get('role')
-    user_id = get_jwt_identity()
-
-    if role not in ['admin', 'superadmin']:
-        return jsonify({'error': 'Unauthorized'}), 403
-
     worker_id = request.args.get('worker_id')
     if not worker_id:
         return jsonify({'error': 'worker_id is required'}), 400
@@ -231,39 +203,107 @@ def get_worker_location():
     except ValueError:
         return jsonify({'error': 'worker_id must be an integer'}), 400
 
-    worker = Employee.query.get(worker_id_int)
-    if not worker or worker.role != 'worker':
+    worker, position = live_locations.get(worker_id_int)
+    if not worker:
         return jsonify({'error': 'Invalid worker'}), 404
 
     # ✅ Restrict admin to same city only
-    if role == 'admin':
-        admin = Employee.query.get(user_id)
-        if worker.city_id != admin.city_id:
-            return jsonify({'error': 'You can only view location of workers in your own city'}), 403
-
-    latest_location = (
-        Location.query
-        .filter_by(worker_id=worker_id_int)
-        .order_by(Location.timestamp.desc())
-        .first()
-    )
-
-    if not latest_location:
+    if g.role == 'admin' and worker['city_id'] != g.city_id:
+        return jsonify({'error': 'You can only view location of workers in your own city'}), 403
+
+    if not position:
         return jsonify({'error': 'No location found'}), 404
 
-    # Convert to IST
-    utc_time = latest_location.timestamp
-    if utc_time.tzinfo is None:
-        utc_time = utc_time.replace(tzinfo=timezone.utc)
+    return jsonify({
+        'latitude': position['latitude'],
+        'longitude': position['longitude'],
+        'timestamp': position['timestamp_ist'].strftime("%a, %d %b %Y %H:%M:%S IST")
+    }), 200
+
+
+# Every active worker's latest position in a city, for the live map.
+# Admins get their own city; superadmins pass ?city_id=.
+@admin_bp.route('/admin/worker-locations', methods=['GET'])
+@role_required('admin', 'superadmin')
+def get_city_worker_locations():
+    if g.role == 'admin':
+        city_id = g.city_id
+    else:
+        city_id = request.args.get('city_id', type=int)
+        if city_id is None:
+            return jsonify({'error': 'city_id is required'}), 400
+
+    workers = []
+    for worker_id, worker, position in live_locations.for_city(city_id):
+        workers.append({
+            'worker_id': worker_id,
+            'name': worker['name'],
+            'latitude': position['latitude'] if position else None,
+            'longitude': position['longitude'] if position else None,
+            'timestamp': position['timestamp_ist'].strftime("%a, %d %b %Y %H:%M:%S IST") if position else None
+        })
+
+    return jsonify({'city_id': city_id, 'workers': workers}), 200
 
-    ist_timezone = pytz.timezone("Asia/Kolkata")
-    ist_time = utc_time.astimezone(ist_timezone)
-    formatted_ist = ist_time.strftime("%a, %d %b %Y %H:%M:%S IST")
+
+# A worker's route for a time range, small enough to draw on a map.
+#   ?worker_id=&start=&end=   ISO 8601 or Unix time, UTC; default: the last 24h
+#   &resolution=raw|minute|hour
+#   &tolerance=<metres>       raw only: Douglas-Peucker tolerance, 0 keeps every point
+TRACK_MAX_RANGE = timedelta(days=7)
+TRACK_DEFAULT_TOLERANCE = 10.0  # metres
+
+@admin_bp.route('/admin/worker-track', methods=['GET'])
+@role_required('admin', 'superadmin')
+def get_worker_track():
+    worker_id = request.args.get('worker_id', type=int)
+    if worker_id is None:
+        return jsonify({'error': 'worker_id is required'}), 400
+
+    worker, _ = live_locations.get(worker_id)
+    if not worker:
+        return jsonify({'error': 'Invalid worker'}), 404
+    if g.role == 'admin' and worker['city_id'] != g.city_id:
+        return jsonify({'error': 'You can only view location of workers in your own city'}), 403
+
+    end = locations.parse_timestamp(request.args.get('end'), default=datetime.utcnow())
+    start = locations.parse_timestamp(request.args.get('start'), default=end - timedelta(days=1)) if end else None
+    if not start or not end or start >= end:
+        return jsonify({'error': 'Invalid start/end'}), 400
+    if end - start > TRACK_MAX_RANGE:
+        return jsonify({'error': f'Range is limited to {TRACK_MAX_RANGE.days} days'}), 400
+
+    resolution = request.args.get('resolution', 'raw')
+    if resolution == 'raw':
+        tolerance = request.args.get('tolerance', TRACK_DEFAULT_TOLERANCE, type=float)
+        if tolerance is None or tolerance < 0:
+            return jsonify({'error': 'tolerance must be a non-negative number of metres'}), 400
+        points, original_count = locations.track(worker_id, start, end, tolerance)
+        result = {
+            'tolerance': tolerance,
+            'original_count': original_count,
+            # [latitude, longitude, timestamp]
+            'points': [[lat, lon, recorded_at.isoformat() + 'Z'] for lat, lon, recorded_at in points]
+        }
+    elif resolution in locations.ROLLUP_RESOLUTIONS:
+        buckets = locations.rollups(worker_id, start, end, resolution)
+        result = {
+            # [centroid latitude, centroid longitude, bucket start, points in bucket]
+            'points': [
+                [lat, lon, bucket_start.isoformat() + 'Z', count]
+                for lat, lon, bucket_start, count in buckets
+            ]
+        }
+    else:
+        return jsonify({'error': 'resolution must be raw, minute or hour'}), 400
 
     return jsonify({
-        'latitude': latest_location.latitude,
-        'longitude': latest_location.longitude,
-        'timestamp': formatted_ist
+        'worker_id': worker_id,
+        'name': worker['name'],
+        'start': start.isoformat() + 'Z',
+        'end': end.isoformat() + 'Z',
+        'resolution': resolution,
+        **result
     }), 200
 
 
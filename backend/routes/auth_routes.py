@@ -2,11 +2,14 @@
 # backend/routes/auth_routes.py
 
 from flask import Blueprint, request, jsonify
-from werkzeug.security import check_password_hash, generate_password_hash
+from passwords import hash_password, verify_password, needs_rehash
 from flask_jwt_extended import create_access_token, jwt_required, get_jwt_identity, get_jwt
-from flask_jwt_extended import  create_refresh_token
-from token_blacklist import blacklist
+from flask_jwt_extended import  create_refresh_token, decode_token
+from flask_jwt_extended.exceptions import JWTExtendedException
+from jwt.exceptions import PyJWTError
+import token_blacklist
 from models import db, Employee,City
+from permissions import token_claims
 from datetime import timedelta
 
 auth_bp = Blueprint('auth', __name__)
@@ -52,7 +55,7 @@ def register_superadmin():
         address=data['address'],
         role='superadmin',
         is_active=True,
-        password=generate_password_hash(data['password']),
+        password=hash_password(data['password']),
         created_by=None,
         city_id=city_id
     )
@@ -83,27 +86,20 @@ def login():
 
     user = Employee.query.filter_by(email=email).first()
 
-    if not user or not check_password_hash(user.password, password):
+    if not user or not verify_password(user.password, password):
         return jsonify({'error': 'Invalid email or password'}), 401
 
     if not user.is_active:
         return jsonify({'error': 'Account is inactive'}), 403
 
-    access_token = create_access_token(
-        identity=str(user.id),
-        additional_claims={
-            'role': user.role,
-            'email': user.email
-        }
-    )
+    # Upgrade hashes made with older parameters while we have the plain password
+    if needs_rehash(user.password):
+        user.password = hash_password(password)
+        db.session.commit()
 
-    refresh_token = create_refresh_token(
-        identity=str(user.id),
-        additional_claims={
-            'role': user.role,
-            'email': user.email
-        }
-    )
+    claims = token_claims(user)
+    access_token = create_access_token(identity=str(user.id), additional_claims=claims)
+    refresh_token = create_refresh_token(identity=str(user.id), additional_claims=claims)
     user_data = {
     'id': user.id,
     'username': user.username,
@@ -124,6 +120,23 @@ def login():
     }), 200
 
 
+#===========================
+#=========Refresh
+#=======================
+
+@auth_bp.route('/refresh', methods=['POST'])
+@jwt_required(refresh=True)
+def refresh():
+    user = db.session.get(Employee, int(get_jwt_identity()))
+
+    if not user or not user.is_active:
+        return jsonify({'error': 'Account is inactive'}), 403
+
+    access_token = create_access_token(identity=str(user.id), additional_claims=token_claims(user))
+
+    return jsonify({'access_token': access_token}), 200
+
+
 #===========================
 #=========Logout
 #=======================
@@ -137,8 +150,18 @@ def logout():
     role = get_jwt().get('role', 'Unknown')         
     email = get_jwt().get('email', 'Unknown')
 
-    # Add the token to the blacklist
-    blacklist.add(jti)
+    # Revoke the token for every worker process until it expires
+    token_blacklist.revoke(jti, get_jwt()['exp'])
+
+    # The refresh token would otherwise keep minting access tokens after logout
+    refresh_token = (request.get_json(silent=True) or {}).get('refresh_token')
+    if refresh_token:
+        try:
+            refresh_claims = decode_token(refresh_token)
+        except (PyJWTError, JWTExtendedException):
+            refresh_claims = None
+        if refresh_claims and refresh_claims.get('type') == 'refresh' and refresh_claims.get('sub') == get_jwt_identity():
+            token_blacklist.revoke(refresh_claims['jti'], refresh_claims['exp'])
 
     return jsonify({
         'message': f"{role.title()} '{email}' has been logged out successfully.",
@@ -0,0 +1,40 @@
+# routes/events_routes.py
+from flask import Blueprint, Response, request, jsonify, g
+from permissions import role_required
+import events
+
+events_bp = Blueprint('events', __name__)
+
+
+#=============================
+#========= Live activity stream (Server-Sent Events)
+#=============================
+# event: location -> {worker_id, latitude, longitude, timestamp}
+# event: media    -> {id, media_type, hotel_id, worker_id, file_url, ...}
+# Admins see their own city, superadmins every city (or ?city_id=).
+# EventSource can't set headers, so the token may also be passed as ?jwt=.
+
+@events_bp.route('/events', methods=['GET'])
+@role_required('admin', 'superadmin', locations=['headers', 'query_string'])
+def live_events():
+    if g.role == 'admin':
+        city_id = g.city_id
+        if not city_id:
+            return jsonify({'error': 'Admin is not assigned to a city'}), 400
+    else:
+        city_id = request.args.get('city_id', type=int)
+
+    last_event_id = request.headers.get('Last-Event-ID', request.args.get('last_event_id'))
+    try:
+        last_event_id = int(last_event_id) if last_event_id else None
+    except ValueError:
+        return jsonify({'error': 'Invalid Last-Event-ID'}), 400
+
+    return Response(
+        events.stream(last_event_id, city_id),
+        mimetype='text/event-stream',
+        headers={
+            'Cache-Control': 'no-cache',
+            'X-Accel-Buffering': 'no'  # nginx: don't buffer the stream
+        }
+    )
@@ -1,12 +1,53 @@
-from flask import Blueprint, request, jsonify
-from flask_jwt_extended import jwt_required, get_jwt_identity, get_jwt
-from models import db, Hotel, Employee, City
+from flask import Blueprint, request, jsonify, g
+from permissions import role_required
+from sqlalchemy.orm import joinedload
+from models import db, Hotel, City, Certificate
+from streaming import stream_query
+from geo import parse_lat_lon, geohash_encode, geohash_cover, haversine_m
+import live_locations
+import geofence
+import cascade
+import certificates
 
 hotel_bp = Blueprint('hotel', __name__)
 
+
+def _set_coordinates(hotel, data):
+    """Geocode from explicit latitude/longitude, else from a "lat,lon" location.
+
+    A free-text location ("MG Road") leaves the stored position alone.
+    Returns an error message for invalid explicit coordinates.
+    """
+    if 'latitude' in data or 'longitude' in data:
+        lat, lon = parse_lat_lon({'latitude': data.get('latitude'), 'longitude': data.get('longitude')})
+        if lat is None:
+            return 'Invalid latitude/longitude'
+    else:
+        lat, lon = parse_lat_lon(hotel.location)
+        if lat is None:
+            return None
+
+    hotel.latitude, hotel.longitude = lat, lon
+    hotel.geohash = geohash_encode(lat, lon) if lat is not None else None
+    return None
+
+
+def _serialize_hotel(h):
+    return {
+        'id': h.id,
+        'name': h.name,
+        'phone': h.phone,
+        'address': h.address,
+        'location': h.location,
+        'latitude': h.latitude,
+        'longitude': h.longitude,
+        'city': h.city.name if h.city else None,
+        'is_active': h.is_active
+    }
+
 # Create a new hotel (admin only, within assigned city)
 @hotel_bp.route('/admin/create_hotel', methods=['POST'])
-@jwt_required()
+@role_required('admin', error='Only admins can create hotels')
 def create_hotel():
     data = request.get_json()
     name = data.get('name')
@@ -14,21 +55,16 @@ def create_hotel():
     address = data.get('address')
     location = data.get('location')
 
-    claims = get_jwt()
-    creator_id = get_jwt_identity()
-
-    if claims.get('role') != 'admin':
-        return jsonify({'error': 'Only admins can create hotels'}), 403
+    creator_id = g.user_id
 
-    creator = Employee.query.get_or_404(creator_id)
-    if not creator.city_id:
+    if not g.city_id:
         return jsonify({'error': 'Admin is not assigned to a city'}), 400
 
     # Prevent duplicates (same name+location in same city)
     duplicate = Hotel.query.filter_by(
         name=name,
         location=location,
-        city_id=creator.city_id
+        city_id=g.city_id
     ).first()
     if duplicate:
         return jsonify({'error': 'Hotel already exists in your city with same name and location'}), 409
@@ -38,9 +74,12 @@ def create_hotel():
         phone=phone,
         address=address,
         location=location,
-        city_id=creator.city_id,   # 🟢 Admin's city
+        city_id=g.city_id,   # 🟢 Admin's city
         created_by=creator_id
     )
+    error = _set_coordinates(new_hotel, data)
+    if error:
+        return jsonify({'error': error}), 400
 
     db.session.add(new_hotel)
     db.session.commit()
@@ -53,17 +92,14 @@ def create_hotel():
 
 # Get list of hotels created by this admin
 @hotel_bp.route('/hotel', methods=['GET'])
-@jwt_required()
+@role_required('admin', 'superadmin')
 def list_hotels():
-    claims = get_jwt()
-    role = claims.get('role')
-    user_id = get_jwt_identity()
+    role = g.role
 
     if role == 'admin':
-        admin = Employee.query.get_or_404(user_id)
-        if not admin.city_id:
+        if not g.city_id:
             return jsonify({'error': 'Admin is not assigned to a city'}), 400
-        hotels = Hotel.query.filter_by(city_id=admin.city_id).all()
+        hotels = Hotel.query.filter_by(city_id=g.city_id)
         
     # elif role == 'worker':
     #     worker =  Employee.query.get_or_404(user_id)
@@ -71,53 +107,103 @@ def list_hotels():
     #         return jsonify({'error': 'Admin is not assigned to a city'}) , 400  
     #     hotels = Hotel.query.filter_by(city_id=worker.city_id).all()
 
-    elif role == 'superadmin':
-        hotels = Hotel.query.all()
-
     else:
-        return jsonify({'error': 'Unauthorized'}), 403
+        hotels = Hotel.query
 
-    result = [{
-        'id': h.id,
-        'name': h.name,
-        'phone': h.phone,
-        'address': h.address,
-        'location': h.location,
-        'city': h.city.name if h.city else None,
-    
-        'is_active': h.is_active
-    } for h in hotels]
-
-    return jsonify(result), 200
+    return stream_query(hotels.options(joinedload(Hotel.city)).order_by(Hotel.id), _serialize_hotel)
 
 #==========================List of hotels for worker=====================================
 @hotel_bp.route('/worker/hotels', methods=['GET'])
-@jwt_required()
+@role_required('worker')
 def list_hotels_for_worker():
-    claims = get_jwt()
-    role = claims.get('role')
-    user_id = get_jwt_identity()
+    if not g.city_id:
+        return jsonify({'error': 'Worker is not assigned to a city'}), 400
 
-    if role != 'worker':
-        return jsonify({'error': 'Unauthorized'}), 403
+    hotels = Hotel.query.options(joinedload(Hotel.city)).filter_by(
+        city_id=g.city_id, is_active=True
+    ).order_by(Hotel.id)
+
+    return stream_query(hotels, _serialize_hotel)
+
+
+#==========================Hotels near the worker=====================================
+# GET /worker/hotels/nearby?limit=20[&radius=<m>][&latitude=&longitude=]
+# Position defaults to the worker's latest reported location. Without radius
+# the search widens from NEARBY_START_RADIUS until `limit` hotels are found.
+NEARBY_DEFAULT_LIMIT = 20
+NEARBY_MAX_LIMIT = 100
+NEARBY_START_RADIUS = 2000  # metres
+NEARBY_MAX_RADIUS = 50000
+
+
+def _hotels_within(city_id, lat, lon, radius):
+    """Ids of active hotels within radius metres, as (distance, hotel_id), nearest first."""
+    ranges = [
+        db.and_(Hotel.geohash >= prefix, Hotel.geohash < prefix + '{')  # '{' sorts after 'z'
+        for prefix in geohash_cover(lat, lon, radius)
+    ]
+    # Only coordinates for the candidates; full rows are loaded for the hits returned
+    candidates = db.session.query(Hotel.id, Hotel.latitude, Hotel.longitude).filter(
+        Hotel.city_id == city_id,
+        Hotel.is_active == True,
+        db.or_(*ranges)
+    )
 
-    worker = Employee.query.get_or_404(user_id)
-    if not worker.city_id:
-        return jsonify({'error': 'Worker is not assigned to a city'}), 400
+    found = []
+    for hotel_id, hotel_lat, hotel_lon in candidates:
+        distance = haversine_m(lat, lon, hotel_lat, hotel_lon)
+        if distance <= radius:
+            found.append((distance, hotel_id))
+    found.sort()
+    return found
 
-    hotels = Hotel.query.filter_by(city_id=worker.city_id, is_active=True).all()
 
-    result = [{
-        'id': h.id,
-        'name': h.name,
-        'phone': h.phone,
-        'address': h.address,
-        'location': h.location,
-        'city': h.city.name if h.city else None,
-        'is_active': h.is_active
-    } for h in hotels]
+@hotel_bp.route('/worker/hotels/nearby', methods=['GET'])
+@role_required('worker')
+def nearby_hotels_for_worker():
+    if not g.city_id:
+        return jsonify({'error': 'Worker is not assigned to a city'}), 400
 
-    return jsonify(result), 200
+    limit = min(request.args.get('limit', NEARBY_DEFAULT_LIMIT, type=int) or NEARBY_DEFAULT_LIMIT, NEARBY_MAX_LIMIT)
+
+    if 'latitude' in request.args or 'longitude' in request.args:
+        lat, lon = parse_lat_lon({'latitude': request.args.get('latitude'), 'longitude': request.args.get('longitude')})
+        if lat is None:
+            return jsonify({'error': 'Invalid latitude/longitude'}), 400
+    else:
+        _, position = live_locations.get(g.user_id)
+        if not position:
+            return jsonify({'error': 'No current location; send latitude and longitude'}), 400
+        lat, lon = position['latitude'], position['longitude']
+
+    radius = request.args.get('radius', type=float)
+    if radius is not None:
+        if not 0 < radius <= NEARBY_MAX_RADIUS:
+            return jsonify({'error': f'radius must be between 0 and {NEARBY_MAX_RADIUS} metres'}), 400
+        found = _hotels_within(g.city_id, lat, lon, radius)
+    else:
+        radius = NEARBY_START_RADIUS
+        found = _hotels_within(g.city_id, lat, lon, radius)
+        while len(found) < limit and radius < NEARBY_MAX_RADIUS:
+            radius = min(radius * 4, NEARBY_MAX_RADIUS)
+            found = _hotels_within(g.city_id, lat, lon, radius)
+
+    found = found[:limit]
+    hotels = {
+        hotel.id: hotel
+        for hotel in Hotel.query.options(joinedload(Hotel.city)).filter(
+            Hotel.id.in_([hotel_id for _, hotel_id in found])
+        )
+    }
+    return jsonify({
+        'latitude': lat,
+        'longitude': lon,
+        'radius': radius,
+        'hotels': [
+            {**_serialize_hotel(hotels[hotel_id]), 'distance_m': round(distance)}
+            for distance, hotel_id in found
+        ]
+    }), 200
 
 
 #===============================================================
@@ -125,21 +211,15 @@ def list_hotels_for_worker():
 #==============================================================
 # Update a hotel (admin can update only their city hotels they created)
 @hotel_bp.route('/hotel/<int:id>', methods=['PUT'])
-@jwt_required()
+@role_required('admin', 'superadmin')
 def update_hotel(id):
-    claims = get_jwt()
-    role = claims.get('role')
-    user_id = get_jwt_identity()
+    role = g.role
 
     hotel = Hotel.query.get_or_404(id)
 
     # Admin restriction: can only update hotel in their city
-    if role == 'admin':
-        admin = Employee.query.get_or_404(user_id)
-        if hotel.city_id != admin.city_id:
-            return jsonify({'error': 'You can update only hotels in your city'}), 403
-    elif role != 'superadmin':
-        return jsonify({'error': 'Unauthorized'}), 403
+    if role == 'admin' and hotel.city_id != g.city_id:
+        return jsonify({'error': 'You can update only hotels in your city'}), 403
 
     data = request.get_json()
 
@@ -147,7 +227,17 @@ def update_hotel(id):
     hotel.name = data.get('name', hotel.name)
     hotel.phone = data.get('phone', hotel.phone)
     hotel.address = data.get('address', hotel.address)
+    previous_location = hotel.location
     hotel.location = data.get('location', hotel.location)
+    # The edit form sends the unchanged location with every save
+    if 'latitude' in data or 'longitude' in data or hotel.location != previous_location:
+        previous = (hotel.latitude, hotel.longitude)
+        error = _set_coordinates(hotel, data)
+        if error:
+            return jsonify({'error': error}), 400
+        if (hotel.latitude, hotel.longitude) != previous:
+            # Uploads are judged against the hotel's current position
+            geofence.recheck_hotel(hotel)
 
     # Superadmin can update city
     if role == 'superadmin' and 'city_id' in data:
@@ -164,25 +254,19 @@ def update_hotel(id):
 #==========================  delete hotels   ====================
 #==============================================================
 
-# Delete a hotel (admin can delete only their own hotels)
+# Delete a hotel (admin can delete only their own hotels). The hotel is
+# deactivated now; it and its media go in the background (see cascade.py).
 @hotel_bp.route('/hotel/<int:id>', methods=['DELETE'])
-@jwt_required()
+@role_required('admin')
 def delete_hotel(id):
-    claims = get_jwt()
-    role = claims.get('role')
-    admin_id = get_jwt_identity()
-
-    if role != 'admin':
-        return jsonify({'error': 'Unauthorized'}), 403
-
     hotel = Hotel.query.get_or_404(id)
 
-    if hotel.created_by != admin_id:
+    if hotel.created_by != g.user_id:
         return jsonify({'error': 'You can delete only your own hotels'}), 403
 
-    db.session.delete(hotel)
+    job = cascade.start(hotel, g.user_id)
     db.session.commit()
-    return jsonify({'message': 'Hotel deleted successfully'}), 200
+    return jsonify(cascade.accepted(job, 'Hotel deletion started')), 202
 
 
 #===============================================================
@@ -190,21 +274,12 @@ def delete_hotel(id):
 #==============================================================
 
 @hotel_bp.route('/hotel/<int:id>/toggle-status', methods=['PUT'])
-@jwt_required()
+@role_required('admin', 'superadmin')
 def toggle_hotel_status(id):
-    claims = get_jwt()
-    role = claims.get('role')
-    user_id = get_jwt_identity()
-
-    if role not in ['admin', 'superadmin']:
-        return jsonify({'error': 'Unauthorized'}), 403
-
     hotel = Hotel.query.get_or_404(id)
 
-    if role == 'admin':
-        admin = Employee.query.get_or_404(user_id)
-        if hotel.city_id != admin.city_id:
-            return jsonify({'error': 'You can only toggle hotels in your city'}), 403
+    if g.role == 'admin' and hotel.city_id != g.city_id:
+        return jsonify({'error': 'You can only toggle hotels in your city'}), 403
 
     # Toggle active/inactive
     hotel.is_active = not hotel.is_active
@@ -214,3 +289,75 @@ def toggle_hotel_status(id):
         'message': f'Hotel status changed to {"Active" if hotel.is_active else "Inactive"}',
         'status': hotel.is_active
     }), 200
+
+
+#===============================================================
+#==========================  Hotel certificates   ====================
+#==============================================================
+# Files are streamed to CERTIFICATE_FOLDER; rows hold metadata only (see certificates.py)
+
+def _certificate_hotel_error(hotel):
+    if g.role == 'admin' and hotel.city_id != g.city_id:
+        return jsonify({'error': 'You can only manage certificates of hotels in your city'}), 403
+    return None
+
+
+@hotel_bp.route('/hotel/<int:id>/certificates', methods=['POST'])
+@role_required('admin', 'superadmin')
+def upload_certificate(id):
+    hotel = Hotel.query.get_or_404(id)
+    error = _certificate_hotel_error(hotel)
+    if error:
+        return error
+
+    file = request.files.get('file')
+    if not file:
+        return jsonify({'error': 'No file provided'}), 400
+    mime_type = certificates.sniff_mime(file.stream.read(certificates.SNIFF_BYTES))
+    if mime_type is None:
+        return jsonify({'error': 'Certificates must be PDF, JPEG, PNG or WebP files'}), 400
+    file.stream.seek(0)
+
+    content_hash, size = certificates.save(file.stream, mime_type)
+    certificate = Certificate(
+        hotel_id=hotel.id, filename=file.filename, content_hash=content_hash,
+        size=size, mime_type=mime_type
+    )
+    db.session.add(certificate)
+    db.session.commit()
+    return jsonify(certificates.serialize(certificate)), 201
+
+
+@hotel_bp.route('/hotel/<int:id>/certificates', methods=['GET'])
+@role_required('admin', 'superadmin')
+def list_certificates(id):
+    hotel = Hotel.query.get_or_404(id)
+    error = _certificate_hotel_error(hotel)
+    if error:
+        return error
+    rows = Certificate.query.filter_by(hotel_id=hotel.id).order_by(Certificate.id)
+    return jsonify([certificates.serialize(c) for c in rows]), 200
+
+
+# Supports Range / If-None-Match, so large PDFs can be fetched in parts
+@hotel_bp.route('/certificates/<int:certificate_id>', methods=['GET'])
+@role_required('admin', 'superadmin')
+def download_certificate(certificate_id):
+    certificate = Certificate.query.get_or_404(certificate_id)
+    error = _certificate_hotel_error(db.session.get(Hotel, certificate.hotel_id))
+    if error:
+        return error
+    return certificates.send(certificate)
+
+
+@hotel_bp.route('/certificates/<int:certificate_id>', methods=['DELETE'])
+@role_required('admin', 'superadmin')
+def delete_certificate(certificate_id):
+    certificate = Certificate.query.get_or_404(certificate_id)
+    error = _certificate_hotel_error(db.session.get(Hotel, certificate.hotel_id))
+    if error:
+        return error
+    certificates.release_later([(certificate.content_hash, certificate.mime_type)])
+    db.session.delete(certificate)
+    db.session.commit()
+    return jsonify({'message': 'Certificate deleted successfully'}), 200
@@ -0,0 +1,110 @@
+# routes/jobs_routes.py
+from datetime import datetime
+import json
+from flask import Blueprint, request, jsonify, g
+from permissions import role_required
+from models import db, Job, ReconcileRun
+import jobs
+import reconcile
+
+jobs_bp = Blueprint('jobs', __name__)
+
+
+#=============================
+#========= Job status (whoever started it)
+#=============================
+# GET /jobs/<id> -> status and progress of a job, e.g. a cascade delete (see cascade.py)
+
+@jobs_bp.route('/jobs/<int:job_id>', methods=['GET'])
+@role_required('admin', 'superadmin')
+def job_status(job_id):
+    job = Job.query.get_or_404(job_id)
+    if g.role != 'superadmin' and json.loads(job.payload).get('requested_by') != g.user_id:
+        return jsonify({'error': 'Job not found'}), 404
+    return jsonify(jobs.serialize(job)), 200
+
+
+#=============================
+#========= Background job queue (superadmin)
+#=============================
+# GET  /superadmin/jobs/stats               -> depth per kind/status, lag, expired leases
+# GET  /superadmin/jobs?status=&kind=&limit= -> recent jobs, newest first
+# POST /superadmin/jobs/<id>/retry          -> requeue a failed job
+
+@jobs_bp.route('/superadmin/jobs/stats', methods=['GET'])
+@role_required('superadmin')
+def job_stats():
+    return jsonify(jobs.stats()), 200
+
+
+@jobs_bp.route('/superadmin/jobs', methods=['GET'])
+@role_required('superadmin')
+def list_jobs():
+    limit = min(request.args.get('limit', 50, type=int) or 50, 500)
+    query = Job.query
+    status = request.args.get('status')
+    kind = request.args.get('kind')
+    if status:
+        query = query.filter(Job.status == status)
+    if kind:
+        query = query.filter(Job.kind == kind)
+    return jsonify([jobs.serialize(job) for job in query.order_by(Job.id.desc()).limit(limit)]), 200
+
+
+@jobs_bp.route('/superadmin/jobs/<int:job_id>/retry', methods=['POST'])
+@role_required('superadmin')
+def retry_job(job_id):
+    job = Job.query.get_or_404(job_id)
+    if job.status != 'failed':
+        return jsonify({'error': 'Only failed jobs can be retried'}), 409
+    jobs.retry(job)
+    db.session.commit()
+    return jsonify(jobs.serialize(job)), 200
+
+
+#=============================
+#========= Uploads reconciliation (superadmin)
+#=============================
+# POST /superadmin/reconcile {mode: report|remove} -> start a sweep (see reconcile.py)
+# GET  /superadmin/reconcile?limit=                -> recent runs, newest first
+# GET  /superadmin/reconcile/<id>                  -> progress, counts and findings
+# POST /superadmin/reconcile/<id>/cancel           -> stop a running sweep after its current batch
+
+@jobs_bp.route('/superadmin/reconcile', methods=['POST'])
+@role_required('superadmin')
+def start_reconcile():
+    data = request.get_json(silent=True) or {}
+    mode = data.get('mode', 'report')
+    if mode not in ('report', 'remove'):
+        return jsonify({'error': "mode must be 'report' or 'remove'"}), 400
+    if ReconcileRun.query.filter_by(status='running').first():
+        return jsonify({'error': 'A reconciliation is already running'}), 409
+    run = reconcile.start(mode)
+    db.session.commit()
+    return jsonify(reconcile.serialize(run)), 202
+
+
+@jobs_bp.route('/superadmin/reconcile', methods=['GET'])
+@role_required('superadmin')
+def list_reconcile_runs():
+    limit = min(request.args.get('limit', 20, type=int) or 20, 200)
+    runs = ReconcileRun.query.order_by(ReconcileRun.id.desc()).limit(limit)
+    return jsonify([reconcile.serialize(run) for run in runs]), 200
+
+
+@jobs_bp.route('/superadmin/reconcile/<int:run_id>', methods=['GET'])
+@role_required('superadmin')
+def get_reconcile_run(run_id):
+    return jsonify(reconcile.serialize(ReconcileRun.query.get_or_404(run_id))), 200
+
+
+@jobs_bp.route('/superadmin/reconcile/<int:run_id>/cancel', methods=['POST'])
+@role_required('superadmin')
+def cancel_reconcile_run(run_id):
+    run = ReconcileRun.query.get_or_404(run_id)
+    if run.status != 'running':
+        return jsonify({'error': 'Only running reconciliations can be cancelled'}), 409
+    run.status = 'cancelled'
+    run.finished_at = datetime.utcnow()
+    db.session.commit()
+    return jsonify(reconcile.serialize(run)), 200
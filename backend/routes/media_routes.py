@@ -1,20 +1,202 @@
-from flask import Blueprint, request, jsonify, send_from_directory
+from flask import Blueprint, request, jsonify, g
 from flask_jwt_extended import jwt_required, get_jwt, get_jwt_identity
 from models import Media, Employee, Hotel, City, db
-import os
+from streaming import stream_query, wants_ndjson
+import storage
+import derivatives
+from permissions import role_required
+import base64
+from datetime import datetime
 from collections import defaultdict
+from sqlalchemy import and_, or_, func
 from sqlalchemy.orm import joinedload
 
 
 media_bp = Blueprint("media", __name__)
 
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+
+# ---------------------
+# Keyset pagination helpers
+# ---------------------
+# Listings are ordered newest first on (uploaded_at, id). The cursor is the
+# (uploaded_at, id) pair of the last row of the previous page, so each page is
+# a range scan instead of an OFFSET over the whole table.
+
+def _encode_cursor(media):
+    raw = f"{media.uploaded_at.isoformat()}|{media.id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def _decode_cursor(cursor):
+    padded = cursor + '=' * (-len(cursor) % 4)
+    uploaded_at, media_id = base64.urlsafe_b64decode(padded.encode()).decode().split('|')
+    return datetime.fromisoformat(uploaded_at), int(media_id)
+
+
+def _page_args():
+    """Read limit/cursor/include_total from the query string.
+
+    Raises ValueError on malformed input.
+    """
+    limit = request.args.get('limit', DEFAULT_PAGE_SIZE, type=int)
+    if limit is None or limit < 1:
+        raise ValueError('limit must be a positive integer')
+    limit = min(limit, MAX_PAGE_SIZE)
+
+    cursor = request.args.get('cursor')
+    after = None
+    if cursor:
+        try:
+            after = _decode_cursor(cursor)
+        except Exception:
+            raise ValueError('Invalid cursor')
+
+    include_total = request.args.get('include_total', '').lower() in ('1', 'true', 'yes')
+    return limit, after, include_total
+
+
+def _format_location(media):
+    """"lat,lon" string from the parsed coordinate columns, or None."""
+    if media.latitude is None or media.longitude is None:
+        return None
+    return f"{media.latitude},{media.longitude}"
+
+
+def _filter_verified(query):
+    """Optional ?verified=true|false|unknown geofence filter (indexed column)."""
+    verified = request.args.get('verified', '').lower()
+    if verified in ('true', '1', 'yes'):
+        return query.filter(Media.location_verified == True)
+    if verified in ('false', '0', 'no'):
+        return query.filter(Media.location_verified == False)
+    if verified == 'unknown':
+        return query.filter(Media.location_verified.is_(None))
+    return query
+
+
+def _geofence_fields(media):
+    return {
+        'distance_m': round(media.distance_m) if media.distance_m is not None else None,
+        'location_verified': media.location_verified
+    }
+
+
+def _media_load_options():
+    """Eager loads shared by every media listing.
+
+    Each serializer reads the uploader, the hotel and both of their cities, so
+    all of them are fetched in the page query itself instead of one lazy
+    SELECT per row.
+    """
+    return (
+        joinedload(Media.employee).joinedload(Employee.city),
+        joinedload(Media.hotel).joinedload(Hotel.city)
+    )
+
+
+def _paginate_media(query, serialize):
+    """Apply keyset pagination to a filtered Media query and build the response.
+
+    The eager loads are applied after the optional count so the count stays a
+    plain ``SELECT count(*)`` over the filtered rows. Clients that send
+    ``Accept: application/x-ndjson`` get the rows after the cursor streamed
+    instead of a single page: all of them, or the first ``limit`` when it is
+    given. Rows are never held together there, so MAX_PAGE_SIZE doesn't apply.
+    ``include_total`` comes back in the X-Total-Count header.
+    """
+    try:
+        limit, after, include_total = _page_args()
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    total = None
+    if include_total:
+        # Count on the filtered query only: no eager loads, no ordering.
+        total = query.order_by(None).with_entities(func.count(Media.id)).scalar()
+
+    if after:
+        uploaded_at, media_id = after
+        query = query.filter(or_(
+            Media.uploaded_at < uploaded_at,
+            and_(Media.uploaded_at == uploaded_at, Media.id < media_id)
+        ))
+
+    if wants_ndjson():
+        query = query.options(*_media_load_options()).order_by(Media.uploaded_at.desc(), Media.id.desc())
+        if 'limit' in request.args:
+            query = query.limit(request.args.get('limit', type=int))
+        response = stream_query(query, serialize)
+        if include_total:
+            response.headers['X-Total-Count'] = str(total)
+        return response
+
+    rows = (
+        query.options(*_media_load_options())
+        .order_by(Media.uploaded_at.desc(), Media.id.desc())
+        .limit(limit + 1)
+        .all()
+    )
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    body = {
+        'items': [serialize(m) for m in rows],
+        'next_cursor': _encode_cursor(rows[-1]) if has_more else None
+    }
+    if include_total:
+        body['total'] = total
+
+    return jsonify(body)
+
 # ---------------------
 # Serve Uploaded Files
 # ---------------------
-@media_bp.route('/uploads/<filename>', methods=['GET'])
+@media_bp.route('/uploads/<path:filename>', methods=['GET'])
 def serve_uploaded_file(filename):
-    upload_folder = os.path.join(os.getcwd(), 'uploads')
-    return send_from_directory(upload_folder, filename)
+    # Kept photo originals go through GET /api/media/<id>/original only
+    if storage.is_kept_original(filename):
+        return jsonify({'error': 'Not found'}), 404
+    return storage.send_upload(filename)
+
+
+# ---------------------
+# Kept photo original (PHOTO_KEEP_ORIGINALS), with its EXIF intact
+# ---------------------
+@media_bp.route('/media/<int:media_id>/original', methods=['GET'])
+@role_required('admin', 'superadmin')
+def serve_original(media_id):
+    media = Media.query.options(joinedload(Media.hotel)).get_or_404(media_id)
+    if g.role == 'admin' and media.hotel.city_id != g.city_id:
+        return jsonify({'error': 'You can only view media from your own city'}), 403
+    if not media.original_file:
+        return jsonify({'error': 'No original kept for this media'}), 404
+    return storage.send_upload(media.original_file, private=True)
+
+
+# ---------------------
+# Serve image thumbnails / previews
+# ---------------------
+@media_bp.route('/media/derived/<size>/<path:filename>', methods=['GET'])
+def serve_derivative(filename, size):
+    if size not in derivatives.SIZES:
+        return jsonify({'error': 'Unknown size'}), 404
+    # Only uploads get derivatives: never derivatives of derivatives, temp or
+    # partial files, or anything else that happens to be on disk
+    if filename.startswith('derived/') or any(part.startswith('.') for part in filename.split('/')):
+        return jsonify({'error': 'Not found'}), 404
+    if not db.session.query(Media.id).filter(Media.filename == filename).first():
+        return jsonify({'error': 'Not found'}), 404
+
+    # Cached on disk after the first request (or the background job)
+    derived = derivatives.generate(storage.upload_folder(), filename, size)
+    if derived is None:
+        # No Pillow, or not an image: fall back to the original file. Not
+        # immutable, the derivative may exist on the next request
+        return storage.send_upload(filename, immutable=False)
+    return storage.send_upload(derived)
 
 
 
@@ -36,7 +218,9 @@ def worker_dropdown_options():
     hotel_ids = db.session.query(Media.hotel_id).filter(Media.uploaded_by == user_id).distinct()
     
     # Filter only active hotels
-    hotels = Hotel.query.filter(Hotel.id.in_(hotel_ids), Hotel.is_active == True).all()
+    hotels = Hotel.query.options(joinedload(Hotel.city)).filter(
+        Hotel.id.in_(hotel_ids), Hotel.is_active == True
+    ).all()
 
     return jsonify({
         'hotels': [{'id': h.id, 'name': h.name, 'city': h.city.name if h.city else None} for h in hotels]
@@ -44,8 +228,6 @@ def worker_dropdown_options():
 
 ##Route
 
-import json  # Make sure this is at the top
-
 @media_bp.route('/media/worker/view', methods=['GET'])
 @jwt_required()
 def worker_view_media():
@@ -72,22 +254,8 @@ def worker_view_media():
     if media_type:
         query = query.filter(Media.media_type == media_type)
 
-    media_list = query.order_by(Media.uploaded_at.desc()).all()
-
-    result = []
-    for m in media_list:
-        latlon = None
-        if m.location:
-            try:
-                loc = json.loads(m.location)
-                lat = loc.get("latitude")
-                lon = loc.get("longitude")
-                if lat and lon:
-                    latlon = f"{lat},{lon}"
-            except Exception as e:
-                latlon = None  # or log error if needed
-
-        result.append({
+    def serialize(m):
+        return {
             "id": m.id,
             "hotel": {
                 "id": m.hotel.id,
@@ -96,12 +264,13 @@ def worker_view_media():
             },
             "media_type": m.media_type,
             "file_url": f"/api/uploads/{m.filename}",
+            **derivatives.derivative_urls(m),
             "description": m.description,
-            "location": latlon,
+            "location": _format_location(m),
             "uploaded_at": m.uploaded_at.strftime('%Y-%m-%d %H:%M:%S')
-        })
+        }
 
-    return jsonify(result)
+    return _paginate_media(query, serialize)
 
 
 
@@ -114,18 +283,10 @@ def worker_view_media():
 #===== admin_dropdown
 #==========================
 @media_bp.route('/media/admin/options', methods=['GET'])
-@jwt_required()
+@role_required('admin')
 def admin_dropdown_options():
-    claims = get_jwt()
-    user_id = get_jwt_identity()
-
-    if claims['role'] != 'admin':
-        return jsonify({'error': 'Unauthorized'}), 403
-
-    admin = Employee.query.get_or_404(user_id)
-
-    hotels = Hotel.query.filter_by(city_id=admin.city_id, is_active=True).all()
-    workers = Employee.query.filter_by(city_id=admin.city_id, role='worker', is_active=True).all()
+    hotels = Hotel.query.filter_by(city_id=g.city_id, is_active=True).all()
+    workers = Employee.query.filter_by(city_id=g.city_id, role='worker', is_active=True).all()
 
     return jsonify({
         'hotels': [{'id': h.id, 'name': h.name} for h in hotels],
@@ -135,28 +296,18 @@ def admin_dropdown_options():
 
 #Route
 
-import json
-
 @media_bp.route('/media/admin/view', methods=['GET'])
-@jwt_required()
+@role_required('admin')
 def admin_view_media():
-    claims = get_jwt()
-    user_id = get_jwt_identity()
-
-    if claims['role'] != 'admin':
-        return jsonify({'error': 'Unauthorized'}), 403
-
-    admin = Employee.query.get_or_404(user_id)
-
     # Active workers and hotels only in the same city
     allowed_worker_ids = db.session.query(Employee.id).filter(
-        Employee.city_id == admin.city_id,
+        Employee.city_id == g.city_id,
         Employee.role == 'worker',
         Employee.is_active == True
     ).subquery()
 
     allowed_hotel_ids = db.session.query(Hotel.id).filter(
-        Hotel.city_id == admin.city_id,
+        Hotel.city_id == g.city_id,
         Hotel.is_active == True
     ).subquery()
 
@@ -176,30 +327,19 @@ def admin_view_media():
         query = query.filter(Media.hotel_id == int(hotel_id))
     if media_type:
         query = query.filter(Media.media_type == media_type)
+    query = _filter_verified(query)
 
-    media_list = query.order_by(Media.uploaded_at.desc()).all()
-
-    result = []
-    for m in media_list:
-        latlon = None
-        if m.location:
-            try:
-                loc = json.loads(m.location)
-                lat = loc.get("latitude")
-                lon = loc.get("longitude")
-                if lat and lon:
-                    latlon = f"{lat},{lon}"
-            except Exception:
-                latlon = None
-
-        result.append({
+    def serialize(m):
+        return {
             'id': m.id,
             'filename': m.filename,
             'media_type': m.media_type,
             'description': m.description,
-            'location': latlon,
+            'location': _format_location(m),
+            **_geofence_fields(m),
             'uploaded_at': m.uploaded_at.strftime('%Y-%m-%d %H:%M:%S'),
             'file_url': f"/api/uploads/{m.filename}",
+            **derivatives.derivative_urls(m),
             'worker': {
                 'id': m.employee.id if m.employee else None,
                 'name': m.employee.name if m.employee else 'Unknown',
@@ -217,9 +357,9 @@ def admin_view_media():
                     'name': m.hotel.city.name
                 } if m.hotel and m.hotel.city else 'Unknown'
             }
-        })
+        }
 
-    return jsonify(result)
+    return _paginate_media(query, serialize)
 
 
 #======================#======================#======================#======================#======================#======================#======================
@@ -230,19 +370,6 @@ def admin_view_media():
 #            superadmin_dropdown
 #==========================
 
-def _parse_location(location_str):
-    try:
-        data = eval(location_str) if isinstance(location_str, str) else location_str
-        lat = data.get("latitude") or data.get("lat")
-        lon = data.get("longitude") or data.get("lon")
-        return f"{lat},{lon}" if lat and lon else None
-    except:
-        return None
-
-
-
-
-
 # --- Flask Backend Route ---
 
 @media_bp.route("/media/superadmin/options", methods=["GET"])
@@ -290,10 +417,7 @@ def superadmin_view_media():
     if claims['role'] != 'superadmin':
         return jsonify({'error': 'Unauthorized'}), 403
 
-    query = Media.query.options(
-        joinedload(Media.employee).joinedload(Employee.city),
-        joinedload(Media.hotel).joinedload(Hotel.city)
-    )
+    query = Media.query
 
     area = request.args.get('area_id')
     hotel_id = request.args.get('hotel_id')
@@ -311,18 +435,19 @@ def superadmin_view_media():
 
     if media_type:
         query = query.filter(Media.media_type == media_type)
+    query = _filter_verified(query)
 
-    media_list = query.order_by(Media.uploaded_at.desc()).all()
-
-    return jsonify([
-        {
+    def serialize(m):
+        return {
             'id': m.id,
             'filename': m.filename,
             'media_type': m.media_type,
             'description': m.description,
-            'location': _parse_location(m.location),
+            'location': _format_location(m),
+            **_geofence_fields(m),
             'uploaded_at': m.uploaded_at.strftime('%Y-%m-%d %H:%M:%S'),
             'file_url': f"/api/uploads/{m.filename}",
+            **derivatives.derivative_urls(m),
             'uploaded_by_name': m.employee.name if m.employee else 'Unknown',
             'worker': {
                 'id': m.employee.id if m.employee else None,
@@ -342,8 +467,8 @@ def superadmin_view_media():
                 } if m.hotel and m.hotel.city else 'Unknown'
             }
         }
-        for m in media_list
-    ])
+
+    return _paginate_media(query, serialize)
 
 
 
@@ -367,17 +492,15 @@ def delete_worker_media(media_id):
     if not media:
         return jsonify({'error': 'Media not found'}), 404
 
-    print(" Media uploaded_by:", media.uploaded_by)
-
     # ✅ Typecast to int to avoid mismatch
     if int(media.uploaded_by) != int(user_id):
-        print(" Uploaded_by mismatch – Forbidden")
         return jsonify({'error': 'You can only delete your own uploads'}), 403
 
+    # Physical files are deleted by a background job once nothing references them
+    storage.release_later(storage.media_files(media))
     db.session.delete(media)
     db.session.commit()
 
-    print(" Media deleted")
     return jsonify({'message': 'Media deleted successfully'}), 200
 
 
@@ -386,20 +509,13 @@ def delete_worker_media(media_id):
 
 ##Admin
 @media_bp.route('/media/admin/delete/<int:media_id>', methods=['DELETE'])
-@jwt_required()
+@role_required('admin')
 def admin_delete_media(media_id):
-    claims = get_jwt()
-    user_id = get_jwt_identity()
-
-    if claims['role'] != 'admin':
-        return jsonify({'error': 'Unauthorized'}), 403
-
-    admin = Employee.query.get_or_404(user_id)
     media = Media.query.get_or_404(media_id)
 
     # ✅ Fix: convert query result to list of ids
-    allowed_worker_ids = [row[0] for row in db.session.query(Employee.id).filter(Employee.created_by == admin.id).all()]
-    allowed_hotel_ids = [row[0] for row in db.session.query(Hotel.id).filter(Hotel.created_by == admin.id).all()]
+    allowed_worker_ids = [row[0] for row in db.session.query(Employee.id).filter(Employee.created_by == g.user_id).all()]
+    allowed_hotel_ids = [row[0] for row in db.session.query(Hotel.id).filter(Hotel.created_by == g.user_id).all()]
 
     if not (
         media.uploaded_by in allowed_worker_ids or
@@ -407,13 +523,8 @@ def admin_delete_media(media_id):
     ):
         return jsonify({'error': 'Forbidden: Not your media'}), 403
 
-    # Delete physical file if it exists
-    try:
-        file_path = os.path.join('uploads', media.filename)
-        if os.path.exists(file_path):
-            os.remove(file_path)
-    except Exception as e:
-        print(f"Warning: Could not delete file {file_path}: {e}")
+    # Physical files are deleted by a background job once nothing references them
+    storage.release_later(storage.media_files(media))
     db.session.delete(media)
     db.session.commit()
     return jsonify({'message': 'Media deleted successfully'})
@@ -428,14 +539,8 @@ def superadmin_delete_media(media_id):
 
     media = Media.query.get_or_404(media_id)
 
-    # Optional: delete physical file
-    try:
-        file_path = os.path.join('uploads', media.filename)
-        if os.path.exists(file_path):
-            os.remove(file_path)
-    except Exception as e:
-        print(f"Warning: Could not delete file {file_path}: {e}")
-
+    # Physical files are deleted by a background job once nothing references them
+    storage.release_later(storage.media_files(media))
     db.session.delete(media)
     db.session.commit()
     return jsonify({'message': 'Media deleted by superadmin'})
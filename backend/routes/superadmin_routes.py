@@ -1,10 +1,13 @@
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity, get_jwt
-from werkzeug.security import generate_password_hash
+from passwords import hash_password
 from sqlalchemy import or_
-from models import db, Employee, Location, City
-from datetime import datetime, timezone, timedelta
-import pytz 
+from sqlalchemy.orm import joinedload
+from models import db, Employee, City
+from streaming import stream_query
+import token_blacklist
+import live_locations
+import cascade
 
 superadmin_bp = Blueprint('superadmin', __name__)
 
@@ -97,7 +100,7 @@ def create_admin():
         return jsonify({'error': 'Email already exists'}), 409
 
     # ✅ Hash password
-    hashed_password = generate_password_hash(data['password'])
+    hashed_password = hash_password(data['password'])
 
     # ✅ Create new admin
     new_admin = Employee(
@@ -181,20 +184,25 @@ def update_or_delete_admin(id):
             city = City.query.get(city_id)
             if not city:
                 return jsonify({'error': 'City not found'}), 404
-            admin.city = city
+            if city.id != admin.city_id:
+                # Tokens carry the city; only a real move invalidates them
+                admin.city = city
+                token_blacklist.revoke_all_for(admin.id)
 
         # ✅ Optional: Update password if provided
         new_password = data.get('password')
         if new_password:
-            admin.password = generate_password_hash(new_password)
+            admin.password = hash_password(new_password)
+            token_blacklist.revoke_all_for(admin.id)
 
         db.session.commit()
         return jsonify({'message': 'Admin updated successfully'}), 200
 
     elif request.method == 'DELETE':
-        db.session.delete(admin)
+        token_blacklist.revoke_all_for(admin.id)
+        job = cascade.start(admin, int(get_jwt_identity()))  # its hotels and workers are kept
         db.session.commit()
-        return jsonify({'message': 'Admin deleted successfully'}), 200
+        return jsonify(cascade.accepted(job, 'Admin deletion started')), 202
 
 # --------------------------
 # toggle_admin_status by super admin 
@@ -214,6 +222,8 @@ def toggle_admin_status(id):
         return jsonify({'error': 'Target user is not an admin'}), 400
 
     admin.is_active = not admin.is_active
+    if not admin.is_active:
+        token_blacklist.revoke_all_for(admin.id)
     db.session.commit()
 
     return jsonify({'message': f"Admin {'activated' if admin.is_active else 'deactivated'} successfully."})
@@ -284,10 +294,12 @@ def get_all_workers():
     if claims['role'] != 'superadmin':
         return jsonify({'error': 'Unauthorized'}), 403
 
-    workers = Employee.query.filter_by(role='worker').all()
+    workers = Employee.query.options(joinedload(Employee.city)).filter_by(
+        role='worker'
+    ).order_by(Employee.id)
 
-    return jsonify([
-        {
+    def serialize(w):
+        return {
             'id': w.id,
             'name': w.name,
             'email': w.email,
@@ -295,8 +307,9 @@ def get_all_workers():
             'city': w.city.name if w.city else None,
             'address': w.address,
             'is_active': w.is_active
-        } for w in workers
-    ]), 200
+        }
+
+    return stream_query(workers, serialize)
 
 
 
@@ -331,20 +344,27 @@ def update_or_delete_worker(id):
             city = City.query.get(city_id)
             if not city:
                 return jsonify({'error': 'City not found'}), 404
-            worker.city = city
+            if city.id != worker.city_id:
+                # Tokens carry the city; only a real move invalidates them
+                worker.city = city
+                token_blacklist.revoke_all_for(worker.id)
 
         # ✅ Update password if provided
         new_password = data.get('password')
         if new_password:
-            worker.password = generate_password_hash(new_password)
+            worker.password = hash_password(new_password)
+            token_blacklist.revoke_all_for(worker.id)
 
         db.session.commit()
+        live_locations.remember(worker)
         return jsonify({'message': 'Worker updated successfully'}), 200
 
     elif request.method == 'DELETE':
-        db.session.delete(worker)
+        token_blacklist.revoke_all_for(worker.id)
+        job = cascade.start(worker, int(get_jwt_identity()))  # uploads and locations go in the background
         db.session.commit()
-        return jsonify({'message': 'Worker deleted successfully'}), 200
+        live_locations.remember(worker)  # off the live map right away
+        return jsonify(cascade.accepted(job, 'Worker deletion started')), 202
 
 # -------------------------------------------
 # ✅ Worker toggle for active & Inactive by super admin
@@ -364,7 +384,10 @@ def toggle_worker_status(id):
         return jsonify({'error': 'Target user is not a worker'}), 400
 
     worker.is_active = not worker.is_active
+    if not worker.is_active:
+        token_blacklist.revoke_all_for(worker.id)
     db.session.commit()
+    live_locations.remember(worker)
 
     return jsonify({'message': f"Worker {'activated' if worker.is_active else 'deactivated'} successfully."})
 
@@ -391,35 +414,18 @@ def get_specific_worker_location():
     except ValueError:
         return jsonify({'error': 'worker_id must be an integer'}), 400
 
-    worker = Employee.query.get(worker_id_int)
-    if not worker or worker.role != 'worker':
+    worker, position = live_locations.get(worker_id_int)
+    if not worker:
         return jsonify({'error': 'Invalid worker'}), 404
 
-    latest_location = (
-        Location.query
-        .filter_by(worker_id=worker_id_int)
-        .order_by(Location.timestamp.desc())
-        .first()
-    )
-
-    if not latest_location:
+    if not position:
         return jsonify({'error': 'No location found'}), 404
 
-    # Force timestamp to UTC if naive
-    utc_time = latest_location.timestamp
-    if utc_time.tzinfo is None:
-        utc_time = utc_time.replace(tzinfo=timezone.utc)
-
-    # Convert to IST using pytz
-    ist_timezone = pytz.timezone("Asia/Kolkata")
-    ist_time = utc_time.astimezone(ist_timezone)
-    formatted_ist = ist_time.strftime("%a, %d %b %Y %H:%M:%S IST")
-
     return jsonify({
-        'name': worker.name,
-        'latitude': latest_location.latitude,
-        'longitude': latest_location.longitude,
-        'timestamp': formatted_ist
+        'name': worker['name'],
+        'latitude': position['latitude'],
+        'longitude': position['longitude'],
+        'timestamp': position['timestamp_ist'].strftime("%a, %d %b %Y %H:%M:%S IST")
     }), 200
 
 
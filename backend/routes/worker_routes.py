@@ -1,35 +1,103 @@
 # routes/worker_routes.py
 
 import os
-from datetime import datetime
-from flask import Blueprint, request, jsonify
+import uuid
+from datetime import datetime, timedelta
+from flask import Blueprint, request, jsonify, g
 from werkzeug.utils import secure_filename
-from flask_jwt_extended import jwt_required, get_jwt_identity, get_jwt
-from models import Media, Hotel, Location, Employee, db
+from permissions import role_required
+from models import Media, Hotel, Location, UploadSession, db
+from geo import parse_lat_lon
+import storage
+import derivatives
+import photo_processing
+import geofence
+import locations
+import live_locations
+import events
 from pytz import timezone
 ist = timezone('Asia/Kolkata')
 worker_bp = Blueprint("worker", __name__)
 
-# Upload configuration
-UPLOAD_FOLDER = 'uploads/'
+# Upload configuration (files are stored through storage.py)
 ALLOWED_EXTENSIONS = {'jpg', 'jpeg', 'png', 'mp4', 'mov', 'avi', 'webm'}
 
+# Resumable uploads: chunks are written under <UPLOAD_FOLDER>/.partial until finalize
+UPLOAD_CHUNK_SIZE = 5 * 1024 * 1024
+UPLOAD_SESSION_TTL = timedelta(hours=24)
+COPY_BUFFER_SIZE = 64 * 1024
+
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
+
+def _check_upload_target(city_id, hotel_id):
+    """Return an error response if a worker in city_id may not upload to this hotel."""
+    if not hotel_id:
+        return jsonify({'error': 'Hotel ID is required'}), 400
+
+    hotel = Hotel.query.get(hotel_id)
+
+    if not hotel:
+        return jsonify({'error': 'Hotel not found'}), 404
+
+    if not hotel.is_active:
+        return jsonify({'error': 'Cannot upload to inactive hotel'}), 403
+
+    if hotel.city_id != city_id:
+        return jsonify({'error': 'You can only upload media to hotels in your city'}), 403
+
+    return None
+
+
+def _file_ext(filename):
+    return filename.rsplit('.', 1)[1].lower()
+
+
+def _new_media(stored_path, digest, filename, description, location, worker_id, hotel_id):
+    ext = _file_ext(filename)
+    media_type = 'video' if ext in ['mp4', 'mov', 'avi', 'webm'] else 'image'
+    latitude, longitude = parse_lat_lon(location)
+
+    media = Media(
+        filename=stored_path,
+        original_filename=filename,
+        content_hash=digest,
+        media_type=media_type,
+        description=description,
+        location=location,
+        latitude=latitude,
+        longitude=longitude,
+        uploaded_by=worker_id,
+        hotel_id=hotel_id,
+        uploaded_at=datetime.now()  # Use IST if needed
+    )
+    geofence.check(media, db.session.get(Hotel, int(hotel_id)))
+    return media
+
+def _publish_media(media):
+    """Announce a new upload to the live stream; flushes to get the id."""
+    db.session.flush()
+    events.publish('media', g.city_id, {
+        'id': media.id,
+        'media_type': media.media_type,
+        'hotel_id': media.hotel_id,
+        'worker_id': media.uploaded_by,
+        'file_url': f"/api/uploads/{media.filename}",
+        **derivatives.derivative_urls(media),
+        'location_verified': media.location_verified,
+        'uploaded_at': media.uploaded_at.isoformat()
+    })
+
 #-=====================
 #==Upload media by worker 
 #=========================
 
 
 @worker_bp.route('/worker/upload_media', methods=['POST'])
-@jwt_required()
+@role_required('worker', error='Unauthorized: Only workers can upload media')
 def upload_media():
-    claims = get_jwt()
-    if claims['role'] != 'worker':
-        return jsonify({'error': 'Unauthorized: Only workers can upload media'}), 403
-
-    worker_id = get_jwt_identity()
+    worker_id = g.user_id
 
     if 'file' not in request.files:
         return jsonify({'error': 'No file part in the request'}), 400
@@ -45,49 +113,225 @@ def upload_media():
     description = request.form.get('description', '').strip()
     location = request.form.get('location', '').strip()
 
-    if not hotel_id:
-        return jsonify({'error': 'Hotel ID is required'}), 400
+    error = _check_upload_target(g.city_id, hotel_id)
+    if error:
+        return error
 
-    hotel = Hotel.query.get(hotel_id)
-    worker = Employee.query.get(worker_id)
+    filename = secure_filename(file.filename)
 
-    if not hotel:
-        return jsonify({'error': 'Hotel not found'}), 404
+    try:
+        stored_path, digest = storage.save_stream(file.stream, _file_ext(filename))
+    except Exception as e:
+        return jsonify({'error': f'Failed to save file: {str(e)}'}), 500
 
-    if not hotel.is_active:
-        return jsonify({'error': 'Cannot upload to inactive hotel'}), 403
+    new_media = _new_media(stored_path, digest, filename, description, location, worker_id, hotel_id)
 
-    if hotel.city_id != worker.city_id:
-        return jsonify({'error': 'You can only upload media to hotels in your city'}), 403
+    db.session.add(new_media)
+    _publish_media(new_media)
+    if not photo_processing.enqueue(new_media):
+        derivatives.enqueue(new_media)
+    db.session.commit()
 
-    filename = secure_filename(file.filename)
-    timestamp = datetime.now().strftime('%Y%m%d%H%M%S')
-    saved_filename = f"{timestamp}_{filename}"
-    file_path = os.path.join(UPLOAD_FOLDER, saved_filename)
+    return jsonify({'message': 'Media uploaded successfully'}), 201
+
+
+#-=====================
+#==Resumable (chunked) upload by worker
+#=========================
+# POST   /worker/uploads                        -> start, returns upload_id
+# PUT    /worker/uploads/<id>/chunks/<n>?offset  -> raw chunk bytes
+# GET    /worker/uploads/<id>                   -> bytes received so far
+# POST   /worker/uploads/<id>/finalize          -> stores the file, creates the Media row
+# DELETE /worker/uploads/<id>                   -> abort
+
+def _partial_folder():
+    return os.path.join(storage.upload_folder(), '.partial')
+
+
+def _partial_path(upload_id):
+    return os.path.join(_partial_folder(), f"{upload_id}.part")
 
+
+def _remove_partial(upload_id):
     try:
-        os.makedirs(UPLOAD_FOLDER, exist_ok=True)
-        file.save(file_path)
-    except Exception as e:
-        return jsonify({'error': f'Failed to save file: {str(e)}'}), 500
+        os.remove(_partial_path(upload_id))
+    except FileNotFoundError:
+        pass
+
+
+def purge_stale_uploads():
+    """Drop upload sessions (and their partial files) idle for longer than UPLOAD_SESSION_TTL."""
+    cutoff = datetime.utcnow() - UPLOAD_SESSION_TTL
+    stale = UploadSession.query.filter(UploadSession.updated_at < cutoff).all()
+    for upload in stale:
+        _remove_partial(upload.id)
+        db.session.delete(upload)
+    if stale:
+        db.session.commit()
+    return len(stale)
+
+
+def _get_own_upload(upload_id):
+    upload = UploadSession.query.get(upload_id)
+    if not upload or upload.worker_id != g.user_id:
+        return None
+    return upload
+
+
+def _upload_status(upload):
+    return {
+        'upload_id': upload.id,
+        'filename': upload.filename,
+        'total_size': upload.total_size,
+        'received': upload.received,
+        'chunk_size': UPLOAD_CHUNK_SIZE
+    }
+
+
+@worker_bp.route('/worker/uploads', methods=['POST'])
+@role_required('worker', error='Unauthorized: Only workers can upload media')
+def start_upload():
+    worker_id = g.user_id
+    data = request.get_json(silent=True) or {}
+
+    filename = secure_filename(data.get('filename') or '')
+    if not filename or not allowed_file(filename):
+        return jsonify({'error': 'Invalid file type. Allowed types are: jpg, png, mp4, mov, avi, webm'}), 400
 
-    ext = filename.rsplit('.', 1)[1].lower()
-    media_type = 'video' if ext in ['mp4', 'mov', 'avi', 'webm'] else 'image'
+    total_size = data.get('size')
+    if not isinstance(total_size, int) or total_size <= 0:
+        return jsonify({'error': 'size must be a positive integer'}), 400
 
-    new_media = Media(
-        filename=saved_filename,
-        media_type=media_type,
-        description=description,
-        location=location,
-        uploaded_by=worker_id,
+    hotel_id = data.get('hotel_id')
+    error = _check_upload_target(g.city_id, hotel_id)
+    if error:
+        return error
+
+    purge_stale_uploads()
+
+    upload = UploadSession(
+        id=uuid.uuid4().hex,
+        worker_id=worker_id,
         hotel_id=hotel_id,
-        uploaded_at=datetime.now()  # Use IST if needed
+        filename=filename,
+        total_size=total_size,
+        received=0,
+        description=(data.get('description') or '').strip(),
+        location=(data.get('location') or '').strip()
     )
 
+    try:
+        os.makedirs(_partial_folder(), exist_ok=True)
+        open(_partial_path(upload.id), 'wb').close()
+    except Exception as e:
+        return jsonify({'error': f'Failed to start upload: {str(e)}'}), 500
+
+    db.session.add(upload)
+    db.session.commit()
+
+    return jsonify(_upload_status(upload)), 201
+
+
+@worker_bp.route('/worker/uploads/<upload_id>', methods=['GET'])
+@role_required('worker')
+def upload_status(upload_id):
+    upload = _get_own_upload(upload_id)
+    if not upload:
+        return jsonify({'error': 'Upload not found'}), 404
+
+    return jsonify(_upload_status(upload)), 200
+
+
+@worker_bp.route('/worker/uploads/<upload_id>/chunks/<int:index>', methods=['PUT'])
+@role_required('worker')
+def upload_chunk(upload_id, index):
+    upload = _get_own_upload(upload_id)
+    if not upload:
+        return jsonify({'error': 'Upload not found'}), 404
+
+    offset = request.args.get('offset', index * UPLOAD_CHUNK_SIZE, type=int)
+    length = request.content_length
+
+    if length is None:
+        return jsonify({'error': 'Content-Length is required'}), 411
+    if offset is None or offset < 0 or length > UPLOAD_CHUNK_SIZE:
+        return jsonify({'error': 'Invalid chunk offset or size'}), 400
+    if offset + length > upload.total_size:
+        return jsonify({'error': 'Chunk exceeds declared file size'}), 400
+    # Chunks may be re-sent, but not skipped: the file must stay contiguous.
+    if offset > upload.received:
+        return jsonify({'error': 'Missing earlier chunks', **_upload_status(upload)}), 409
+
+    written = 0
+    try:
+        with open(_partial_path(upload.id), 'r+b') as f:
+            f.seek(offset)
+            while written < length:
+                block = request.stream.read(min(COPY_BUFFER_SIZE, length - written))
+                if not block:
+                    break
+                f.write(block)
+                written += len(block)
+    except FileNotFoundError:
+        return jsonify({'error': 'Upload expired'}), 410
+    except Exception as e:
+        return jsonify({'error': f'Failed to save chunk: {str(e)}'}), 500
+
+    upload.received = max(upload.received, offset + written)
+    upload.updated_at = datetime.utcnow()
+    db.session.commit()
+
+    if written < length:
+        return jsonify({'error': 'Incomplete chunk', **_upload_status(upload)}), 400
+
+    return jsonify(_upload_status(upload)), 200
+
+
+@worker_bp.route('/worker/uploads/<upload_id>/finalize', methods=['POST'])
+@role_required('worker')
+def finalize_upload(upload_id):
+    upload = _get_own_upload(upload_id)
+    if not upload:
+        return jsonify({'error': 'Upload not found'}), 404
+
+    if upload.received != upload.total_size:
+        return jsonify({'error': 'Upload is incomplete', **_upload_status(upload)}), 409
+
+    # Re-check: the hotel may have been deactivated since the upload started.
+    error = _check_upload_target(g.city_id, upload.hotel_id)
+    if error:
+        return error
+
+    try:
+        stored_path, digest = storage.store_file(_partial_path(upload.id), _file_ext(upload.filename))
+    except Exception as e:
+        return jsonify({'error': f'Failed to save file: {str(e)}'}), 500
+
+    new_media = _new_media(stored_path, digest, upload.filename, upload.description,
+                           upload.location, upload.worker_id, upload.hotel_id)
+
     db.session.add(new_media)
+    db.session.delete(upload)
+    _publish_media(new_media)
+    if not photo_processing.enqueue(new_media):
+        derivatives.enqueue(new_media)
     db.session.commit()
 
-    return jsonify({'message': 'Media uploaded successfully'}), 201
+    return jsonify({'message': 'Media uploaded successfully', 'media_id': new_media.id}), 201
+
+
+@worker_bp.route('/worker/uploads/<upload_id>', methods=['DELETE'])
+@role_required('worker')
+def abort_upload(upload_id):
+    upload = _get_own_upload(upload_id)
+    if not upload:
+        return jsonify({'error': 'Upload not found'}), 404
+
+    _remove_partial(upload.id)
+    db.session.delete(upload)
+    db.session.commit()
+
+    return jsonify({'message': 'Upload cancelled'}), 200
 
 
 
@@ -100,36 +344,62 @@ import pytz  # make sure pytz is installed
 
 IST = pytz.timezone('Asia/Kolkata')
 
+
+def _publish_location(point):
+    events.publish('location', g.city_id, {
+        'worker_id': g.user_id,
+        'latitude': point['latitude'],
+        'longitude': point['longitude'],
+        'timestamp': point['recorded_at'].isoformat() + 'Z'
+    })
+
+
 @worker_bp.route('/location', methods=['POST'])
-@jwt_required()
+@role_required('worker')
 def update_location():
-    claims = get_jwt()
-    user_id = get_jwt_identity()
+    data = request.get_json(silent=True) or {}
+    rows, _ = locations.parse_points([{
+        'latitude': data.get('latitude'),
+        'longitude': data.get('longitude')
+    }])
+
+    if not rows:
+        return jsonify({'error': 'Missing coordinates'}), 400
 
-    if claims['role'] != 'worker':
-        return jsonify({'error': 'Unauthorized'}), 403
+    newest = locations.record_points(g.user_id, rows)
+    _publish_location(newest)
+    db.session.commit()
+    live_locations.put(g.user_id, newest['latitude'], newest['longitude'], newest['recorded_at'])
 
-    data = request.get_json()
-    lat = data.get('latitude')
-    lon = data.get('longitude')
+    return jsonify({'message': 'Location updated'}), 200
 
-    if not lat or not lon:
-        return jsonify({'error': 'Missing coordinates'}), 400
 
-    # Update if exists, else create new
-    location = Location.query.filter_by(worker_id=user_id).first()
+# Batch of buffered points: {"points": [{"latitude", "longitude", "timestamp", "accuracy"}, ...]}
+# timestamp is ISO 8601 or Unix time (s or ms); missing means now.
+@worker_bp.route('/location/batch', methods=['POST'])
+@role_required('worker')
+def upload_location_batch():
+    data = request.get_json(silent=True) or {}
+    points = data.get('points')
 
-    if location:
-        location.latitude = lat
-        location.longitude = lon
-        location.timestamp = datetime.utcnow()
-    else:
-        location = Location(worker_id=user_id, latitude=lat, longitude=lon)
+    if not isinstance(points, list) or not points:
+        return jsonify({'error': 'points must be a non-empty list'}), 400
+    if len(points) > locations.MAX_BATCH_POINTS:
+        return jsonify({'error': f'At most {locations.MAX_BATCH_POINTS} points per batch'}), 413
 
-    db.session.add(location)
+    rows, rejected = locations.parse_points(points)
+    newest = locations.record_points(g.user_id, rows)
+    if newest:
+        _publish_location(newest)
     db.session.commit()
+    if newest:
+        live_locations.put(g.user_id, newest['latitude'], newest['longitude'], newest['recorded_at'])
 
-    return jsonify({'message': 'Location updated'}), 200
+    return jsonify({
+        'message': 'Locations recorded',
+        'accepted': len(rows),
+        'rejected': rejected
+    }), 200
 
 
 #=========================#=========================
@@ -137,15 +407,9 @@ def update_location():
 #=========================#=========================
 
 @worker_bp.route('/location', methods=['GET'])
-@jwt_required()
+@role_required('worker')
 def get_own_location():
-    claims = get_jwt()
-    user_id = get_jwt_identity()
-
-    if claims['role'] != 'worker':
-        return jsonify({'error': 'Unauthorized'}), 403
-
-    latest_location = Location.query.filter_by(worker_id=user_id).order_by(Location.timestamp.desc()).first()
+    latest_location = Location.query.filter_by(worker_id=g.user_id).first()
 
     if not latest_location:
         return jsonify({'error': 'No location found'}), 404
@@ -0,0 +1,216 @@
+# backend/storage.py
+#
+# Content-addressed storage for uploaded files.
+#
+# Files are stored under UPLOAD_FOLDER as ab/cd/<sha256>.<ext>, where ab and cd
+# are the first two byte pairs of the digest. Identical uploads map to the same
+# path and are stored once; Media.filename (and Media.original_file for kept
+# photo originals) holds that relative path, so the number of Media rows
+# pointing at a path is its reference count.
+import os
+import hashlib
+import mimetypes
+import tempfile
+import time
+from flask import Response, abort, current_app, send_file
+from werkzeug.security import safe_join
+from models import db, Media
+import jobs
+
+COPY_BUFFER_SIZE = 64 * 1024
+
+# Stored names never change content (content-addressed, or timestamped for
+# legacy files), so browsers and proxies may cache them for good.
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+
+
+def upload_folder():
+    return current_app.config['UPLOAD_FOLDER']
+
+
+def absolute_path(relpath):
+    return os.path.join(upload_folder(), relpath)
+
+
+def content_path(digest, ext):
+    """Relative, sharded path for a sha256 hex digest."""
+    return f"{digest[:2]}/{digest[2:4]}/{digest}.{ext.lower()}"
+
+
+def _commit_temp_file(tmp_path, digest, ext, root=None):
+    relpath = content_path(digest, ext)
+    final_path = os.path.join(root or upload_folder(), relpath)
+    if os.path.exists(final_path):
+        # Already stored: keep the existing copy. Touched so the reconciliation
+        # sweep (reconcile.py) treats it as new until the caller's row commits.
+        os.remove(tmp_path)
+        os.utime(final_path)
+    else:
+        os.makedirs(os.path.dirname(final_path), exist_ok=True)
+        os.replace(tmp_path, final_path)
+    return relpath
+
+
+def save_stream(stream, ext, root=None):
+    """Write a file-like object to the store, hashing it on the way.
+
+    root is another folder with the same layout (default UPLOAD_FOLDER).
+    Returns (relative path, sha256 hex digest).
+    """
+    root = root or upload_folder()
+    tmp_dir = os.path.join(root, '.tmp')
+    os.makedirs(tmp_dir, exist_ok=True)
+
+    sha = hashlib.sha256()
+    fd, tmp_path = tempfile.mkstemp(dir=tmp_dir)
+    try:
+        with os.fdopen(fd, 'wb') as out:
+            while True:
+                block = stream.read(COPY_BUFFER_SIZE)
+                if not block:
+                    break
+                sha.update(block)
+                out.write(block)
+        digest = sha.hexdigest()
+        return _commit_temp_file(tmp_path, digest, ext, root), digest
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def store_file(path, ext):
+    """Move an already written file (e.g. a finished chunked upload) into the store.
+
+    Returns (relative path, sha256 hex digest).
+    """
+    sha = hashlib.sha256()
+    with open(path, 'rb') as f:
+        while True:
+            block = f.read(COPY_BUFFER_SIZE)
+            if not block:
+                break
+            sha.update(block)
+    digest = sha.hexdigest()
+    return _commit_temp_file(path, digest, ext), digest
+
+
+def reference_count(relpath):
+    return Media.query.filter(
+        db.or_(Media.filename == relpath, Media.original_file == relpath)
+    ).count()
+
+
+def is_kept_original(relpath):
+    """True if relpath is only referenced as a kept photo original.
+
+    Those still carry the full EXIF (GPS, device serials) that processing
+    strips, so they are never served under the public /api/uploads path.
+    """
+    if not db.session.query(Media.id).filter(Media.original_file == relpath).first():
+        return False
+    # The same bytes may also be another row's served file
+    return not db.session.query(Media.id).filter(Media.filename == relpath).first()
+
+
+def media_files(media):
+    """Stored files a Media row references, to release after deleting it."""
+    return [relpath for relpath in (media.filename, media.original_file) if relpath]
+
+
+def referenced(relpaths):
+    """The subset of relpaths some Media row still references, in two indexed lookups."""
+    relpaths = list(relpaths)
+    found = set()
+    for column in (Media.filename, Media.original_file):
+        found.update(name for (name,) in db.session.query(column).filter(column.in_(relpaths)))
+    return found
+
+
+def _unlink(relpath):
+    try:
+        os.remove(absolute_path(relpath))
+    except FileNotFoundError:
+        pass
+    except Exception as e:
+        print(f"Warning: Could not delete file {relpath}: {e}")
+        return False
+    return True
+
+
+def _recently_touched(relpath, grace):
+    try:
+        return os.stat(absolute_path(relpath)).st_mtime > time.time() - grace
+    except FileNotFoundError:
+        return False
+
+
+@jobs.handler('storage.release')
+def _release_job(payload):
+    grace = current_app.config.get('STORAGE_RELEASE_GRACE_SECONDS', 300)
+    # One lookup for the whole list: a cascade delete queues a chunk's worth of files per job
+    in_use = referenced(payload['relpaths'])
+    unused = [relpath for relpath in payload['relpaths'] if relpath not in in_use]
+    # An upload that deduplicated onto one of these files touched it and may
+    # not have committed its row yet (see _commit_temp_file): look again later
+    recent = [relpath for relpath in unused if _recently_touched(relpath, grace)]
+    failed = [relpath for relpath in unused if relpath not in recent and not _unlink(relpath)]
+    if recent:
+        release_later(recent, delay=grace)
+        db.session.commit()
+    if failed:
+        raise OSError(f"Could not delete {', '.join(failed)}")
+
+
+def release_later(relpaths, delay=0):
+    """Queue the removal of files no Media row references any more.
+
+    Joins the current transaction, so it runs after the deleting commit.
+    Files touched within STORAGE_RELEASE_GRACE_SECONDS are tried again later.
+    """
+    if relpaths:
+        jobs.enqueue('storage.release', {'relpaths': list(relpaths)}, delay=delay)
+
+
+def send_upload(relpath, private=False, immutable=True):
+    """The single serving path for anything under UPLOAD_FOLDER.
+
+    Supports conditional GETs (ETag / Last-Modified) and byte ranges through
+    send_file, and sends long-lived immutable cache headers, which shared
+    caches may keep too unless ``private``. Responses whose URL may later
+    serve other bytes pass ``immutable=False``: clients then revalidate them
+    on every use. With UPLOADS_SENDFILE_MODE set to
+    "x-accel-redirect" (nginx) or "x-sendfile" (Apache/lighttpd) the body is
+    left to the front proxy.
+    """
+    # Temp and partial uploads live in dot-directories and are never served.
+    if any(part.startswith('.') for part in relpath.split('/')):
+        abort(404)
+    path = safe_join(upload_folder(), relpath)
+    if path is None or not os.path.isfile(path):
+        abort(404)
+
+    mode = current_app.config.get('UPLOADS_SENDFILE_MODE')
+    if mode == 'x-accel-redirect':
+        prefix = current_app.config.get('UPLOADS_ACCEL_PREFIX', '/protected-uploads/')
+        response = Response(
+            mimetype=mimetypes.guess_type(path)[0] or 'application/octet-stream'
+        )
+        response.headers['X-Accel-Redirect'] = prefix.rstrip('/') + '/' + relpath
+    else:
+        # In x-sendfile mode USE_X_SENDFILE makes send_file emit the header instead of the body.
+        response = send_file(path, conditional=True, etag=True,
+                             max_age=IMMUTABLE_MAX_AGE if immutable else 0)
+
+    if private:
+        response.cache_control.public = False  # send_file marks it public
+        response.cache_control.private = True
+    else:
+        response.cache_control.public = True
+    if immutable:
+        response.cache_control.max_age = IMMUTABLE_MAX_AGE
+        response.cache_control.immutable = True
+    else:
+        response.cache_control.no_cache = True
+        response.cache_control.max_age = 0
+    return response
@@ -0,0 +1,52 @@
+# backend/streaming.py
+from flask import Response, current_app, request, stream_with_context
+from models import db
+
+NDJSON_MIMETYPE = 'application/x-ndjson'
+STREAM_BATCH_SIZE = 500
+
+
+def wants_ndjson():
+    """True when the client asked for newline-delimited JSON."""
+    return request.accept_mimetypes.best_match(['application/json', NDJSON_MIMETYPE]) == NDJSON_MIMETYPE
+
+
+def stream_query(query, serialize, status=200, batch_size=STREAM_BATCH_SIZE):
+    """Stream a query as a JSON array (or NDJSON) without building it in memory.
+
+    Rows are pulled from the database ``batch_size`` at a time with
+    ``yield_per`` and each batch is encoded and flushed before the next one is
+    fetched, so peak memory is bounded by the batch size rather than by the
+    number of rows. Only many-to-one eager loads may be used on ``query``.
+    """
+    ndjson = wants_ndjson()
+
+    def generate():
+        dumps = current_app.json.dumps
+        # The view's session was closed when its app context ended; run on the
+        # streaming context's session so teardown returns the connection.
+        rows = query.with_session(db.session()).yield_per(batch_size)
+        first = True
+
+        if not ndjson:
+            yield '['
+        chunk = []
+        for row in rows:
+            if ndjson:
+                chunk.append(dumps(serialize(row)) + '\n')
+            else:
+                chunk.append(('' if first else ',') + dumps(serialize(row)))
+                first = False
+            if len(chunk) >= batch_size:
+                yield ''.join(chunk)
+                chunk = []
+        if chunk:
+            yield ''.join(chunk)
+        if not ndjson:
+            yield ']'
+
+    return Response(
+        stream_with_context(generate()),
+        status=status,
+        mimetype=NDJSON_MIMETYPE if ndjson else 'application/json'
+    )
@@ -0,0 +1,86 @@
+# backend/tests/conftest.py
+#
+# A fresh SQLite database file per test, with the same engine setup (WAL,
+# busy_timeout, pool) as production. Run from the repository root:
+#
+#     python -m pytest -q backend/tests
+import os
+import sys
+import tempfile
+import pytest
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+# Config reads the environment when it is imported
+_TMP_DIR = tempfile.mkdtemp(prefix='hotel-tests-')
+os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(_TMP_DIR, 'test.db')}"
+os.environ['UPLOAD_FOLDER'] = os.path.join(_TMP_DIR, 'uploads')
+os.environ['CERTIFICATE_FOLDER'] = os.path.join(_TMP_DIR, 'certificates')
+os.environ['JOBS_EMBEDDED_WORKERS'] = '0'
+
+from flask_jwt_extended import create_access_token
+from app import create_app
+from models import db, City, Employee, Hotel
+from permissions import token_claims
+import token_blacklist
+import live_locations
+
+
+@pytest.fixture
+def app():
+    app = create_app()
+    app.config['TESTING'] = True
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        # The in-memory mirrors are per process; start each test from empty ones
+        token_blacklist._revoked.clear()
+        token_blacklist._versions.clear()
+        token_blacklist._last_sync = None
+        token_blacklist._next_sync = 0.0
+        live_locations._positions.clear()
+        live_locations._workers = {}
+        live_locations._last_sync = None
+        live_locations._next_sync = 0.0
+        live_locations._next_refresh = 0.0
+        yield app
+        db.session.remove()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+def make_employee(role, city, name=None, **fields):
+    name = name or f"{role}-{Employee.query.count() + 1}"
+    employee = Employee(
+        name=name, username=name, email=f"{name}@example.com", phone='0000000000',
+        address='-', password='-', role=role, city_id=city.id, is_active=True, **fields
+    )
+    db.session.add(employee)
+    db.session.commit()
+    return employee
+
+
+def make_hotel(city, creator, name=None):
+    hotel = Hotel(
+        name=name or f"hotel-{Hotel.query.count() + 1}", phone='0000000000', address='-',
+        location='-', city_id=city.id, created_by=creator.id, is_active=True
+    )
+    db.session.add(hotel)
+    db.session.commit()
+    return hotel
+
+
+def make_city(name):
+    city = City(name=name)
+    db.session.add(city)
+    db.session.commit()
+    return city
+
+
+def auth_header(employee):
+    token = create_access_token(identity=str(employee.id), additional_claims=token_claims(employee))
+    return {'Authorization': f"Bearer {token}"}
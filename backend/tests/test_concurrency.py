@@ -0,0 +1,82 @@
+# backend/tests/test_concurrency.py
+#
+# Workers posting locations while admins read the worker list, all at once
+# against one SQLite file. With the pragmas from Config.SQLITE_PRAGMAS (WAL,
+# busy_timeout) readers never block the writer and writers queue for the lock
+# instead of failing with "database is locked".
+#
+# Clients pause between requests, as phones and browsers do. SQLite's busy
+# handler keeps no queue: when writers hold the lock back to back, an unlucky
+# writer can wait past busy_timeout, whatever the journal mode.
+import threading
+import time
+from sqlalchemy import text
+from models import db, LocationHistory
+from conftest import make_city, make_employee, auth_header
+
+WRITERS = 8
+READERS = 8
+BATCHES = 25
+POINTS_PER_BATCH = 5
+WRITE_INTERVAL = 0.2  # seconds between one writer's batches
+READ_INTERVAL = 0.05  # seconds between one reader's requests
+
+
+def test_concurrent_writers_and_readers(app):
+    city = make_city('Pune')
+    admin = make_employee('admin', city, 'admin')
+    workers = [make_employee('worker', city, f"worker-{i}", created_by=admin.id) for i in range(WRITERS)]
+    writer_headers = [auth_header(worker) for worker in workers]
+    reader_header = auth_header(admin)
+    assert db.session.execute(text('PRAGMA journal_mode')).scalar().lower() == 'wal'
+    # The test's own session must not hold a transaction open while the threads run
+    db.session.remove()
+
+    failures = []
+    start = threading.Barrier(WRITERS + READERS)
+    writers_done = threading.Event()
+
+    def write(headers):
+        client = app.test_client()
+        base_ms = int(time.time() * 1000) - 60 * 60 * 1000
+        start.wait()
+        for batch in range(BATCHES):
+            points = [{
+                'latitude': 18.52 + batch / 1000,
+                'longitude': 73.85 + point / 1000,
+                # Distinct per worker, so every point is stored
+                'timestamp': base_ms + (batch * POINTS_PER_BATCH + point) * 1000,
+            } for point in range(POINTS_PER_BATCH)]
+            try:
+                response = client.post('/api/location/batch', headers=headers, json={'points': points})
+                if response.status_code != 200:
+                    failures.append(('write', response.status_code, response.get_json()))
+            except Exception as exc:
+                failures.append(('write', type(exc).__name__, str(exc)))
+            time.sleep(WRITE_INTERVAL)
+
+    def read():
+        client = app.test_client()
+        start.wait()
+        while not writers_done.is_set():
+            try:
+                # Closing the streamed body ends its request context in this thread
+                with client.get('/api/admin/workers', headers=reader_header) as response:
+                    if response.status_code != 200:
+                        failures.append(('read', response.status_code, response.get_json()))
+            except Exception as exc:
+                failures.append(('read', type(exc).__name__, str(exc)))
+            time.sleep(READ_INTERVAL)
+
+    writer_threads = [threading.Thread(target=write, args=(headers,)) for headers in writer_headers]
+    reader_threads = [threading.Thread(target=read) for _ in range(READERS)]
+    for thread in writer_threads + reader_threads:
+        thread.start()
+    for thread in writer_threads:
+        thread.join()
+    writers_done.set()
+    for thread in reader_threads:
+        thread.join()
+
+    assert failures == []
+    assert LocationHistory.query.count() == WRITERS * BATCHES * POINTS_PER_BATCH
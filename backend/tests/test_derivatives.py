@@ -0,0 +1,57 @@
+# backend/tests/test_derivatives.py
+#
+# A generated thumbnail never changes, so it is cached for a year. When none
+# can be made the original is sent in its place, and clients must revalidate
+# it: the same URL serves the thumbnail once it exists.
+import io
+import os
+import pytest
+import storage
+from PIL import Image
+from models import db, Media
+from conftest import make_city, make_employee, make_hotel
+
+PHOTO = 'aa/bb/' + 'a' * 64 + '.jpg'
+BROKEN = 'cc/dd/' + 'c' * 64 + '.jpg'
+
+
+def write_upload(relpath, data):
+    path = storage.absolute_path(relpath)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as f:
+        f.write(data)
+
+
+def cache_directives(response):
+    return {d.strip() for d in response.headers['Cache-Control'].split(',')}
+
+
+@pytest.fixture
+def uploads(app):
+    city = make_city('Pune')
+    admin = make_employee('admin', city, 'admin')
+    hotel = make_hotel(city, admin)
+    jpeg = io.BytesIO()
+    Image.new('RGB', (64, 48), 'red').save(jpeg, 'JPEG')
+    write_upload(PHOTO, jpeg.getvalue())
+    write_upload(BROKEN, b'\xff\xd8\xff not really a jpeg')
+    for filename in (PHOTO, BROKEN):
+        db.session.add(Media(filename=filename, media_type='image', uploaded_by=admin.id, hotel_id=hotel.id))
+    db.session.commit()
+
+
+def test_generated_derivative_is_immutable(client, uploads):
+    with client.get(f"/api/media/derived/thumb/{PHOTO}") as response:
+        assert response.status_code == 200
+        assert 'immutable' in cache_directives(response)
+
+
+def test_fallback_to_the_original_is_revalidated(client, uploads):
+    with client.get(f"/api/media/derived/thumb/{BROKEN}") as response:
+        assert response.status_code == 200
+        directives = cache_directives(response)
+        assert 'no-cache' in directives and 'immutable' not in directives
+        etag = response.headers['ETag']
+
+    with client.get(f"/api/media/derived/thumb/{BROKEN}", headers={'If-None-Match': etag}) as response:
+        assert response.status_code == 304
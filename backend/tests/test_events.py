@@ -0,0 +1,53 @@
+# backend/tests/test_events.py
+#
+# The events hub hands ids to subscribers in increasing order even when a
+# lower id commits after a higher one (PostgreSQL): it waits at the first
+# missing id until it shows up or EVENTS_GAP_SECONDS have passed.
+import events
+from models import db, Event
+
+
+def add_event(event_id):
+    db.session.add(Event(id=event_id, type='location', city_id=1, payload='{}'))
+    db.session.commit()
+
+
+def buffered_ids(hub):
+    return [event[0] for event in hub.buffer]
+
+
+def test_waits_for_a_lower_id_that_commits_late(app):
+    app.config['EVENTS_GAP_SECONDS'] = 60
+    hub = events._Hub(app)  # not started: polled by hand
+    add_event(1)
+    add_event(3)
+
+    assert hub._poll() == 1
+    assert hub.last_id == 1
+
+    add_event(2)
+    assert hub._poll() == 2
+    assert hub.last_id == 3
+    assert buffered_ids(hub) == [1, 2, 3]
+    assert hub.holes == {}
+
+
+def test_gives_up_on_a_hole_after_the_gap_timeout(app, monkeypatch):
+    clock = [0.0]
+    monkeypatch.setattr(events.time, 'monotonic', lambda: clock[0])
+    app.config['EVENTS_GAP_SECONDS'] = 10
+    hub = events._Hub(app)
+    add_event(1)
+    add_event(4)
+    assert hub._poll() == 1
+
+    # 2 commits late, 3 was rolled back: what is left of the hole keeps its age
+    clock[0] = 6
+    add_event(2)
+    assert hub._poll() == 1
+    assert hub.last_id == 2
+
+    clock[0] = 11
+    assert hub._poll() == 1
+    assert hub.last_id == 4
+    assert buffered_ids(hub) == [1, 2, 4]
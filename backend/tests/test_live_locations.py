@@ -0,0 +1,44 @@
+# backend/tests/test_live_locations.py
+#
+# The in-memory worker roster (live_locations.py) must know a new worker
+# right away, not only after the next full refresh.
+import live_locations
+from models import Employee
+from conftest import make_city, make_employee, auth_header
+
+
+def test_worker_created_in_this_process_is_known_at_once(client):
+    city = make_city('Pune')
+    admin = make_employee('admin', city, 'admin')
+    live_locations.get(admin.id)  # roster loaded, next full refresh 30 s away
+
+    response = client.post('/api/admin/create-worker', headers=auth_header(admin), json={
+        'name': 'New Worker', 'username': 'new-worker', 'phone': '0000000000', 'address': '-',
+        'city_id': city.id, 'password': 'pw', 'confirm_password': 'pw',
+    })
+    assert response.status_code == 201
+    worker_id = Employee.query.filter_by(username='new-worker').one().id
+
+    response = client.get(f"/api/admin/worker-location?worker_id={worker_id}", headers=auth_header(admin))
+    assert response.status_code == 404
+    assert response.get_json() == {'error': 'No location found'}
+
+
+def test_worker_created_elsewhere_is_looked_up_on_a_miss(app):
+    city = make_city('Pune')
+    live_locations.get(0)
+    # Written by another process: nothing told this one about it
+    worker = make_employee('worker', city, 'elsewhere')
+
+    details, position = live_locations.get(worker.id)
+    assert details == {'name': 'elsewhere', 'city_id': city.id, 'is_active': True}
+    assert position is None
+
+
+def test_worker_created_elsewhere_shows_up_in_the_city_snapshot(app):
+    city = make_city('Pune')
+    live_locations.for_city(city.id)
+    worker = make_employee('worker', city, 'elsewhere')
+
+    live_locations._next_sync = 0.0  # LOCATION_CACHE_SYNC_SECONDS later
+    assert [worker_id for worker_id, _, _ in live_locations.for_city(city.id)] == [worker.id]
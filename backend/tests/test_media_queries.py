@@ -0,0 +1,84 @@
+# backend/tests/test_media_queries.py
+#
+# Every media listing loads uploader, hotel and both cities in the page query
+# (routes/media_routes.py:_media_load_options). The number of SQL statements
+# per request must not grow with the number of rows on the page.
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+import pytest
+from sqlalchemy import event
+from models import db, Media
+from conftest import make_city, make_employee, make_hotel, auth_header
+
+
+@contextmanager
+def count_statements():
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(db.engine, 'before_cursor_execute', before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', before_cursor_execute)
+
+
+@pytest.fixture
+def world(app):
+    city = make_city('Pune')
+    admin = make_employee('admin', city, 'admin')
+    return {
+        'city': city,
+        'superadmin': make_employee('superadmin', city, 'root'),
+        'admin': admin,
+        'viewer': make_employee('worker', city, 'viewer', created_by=admin.id),
+    }
+
+
+def add_media(world, count, worker=None):
+    """count uploads, each pair with its own uploader (unless given) and hotel.
+
+    Distinct parents matter: lazy loads of a parent already in the session
+    are served from the identity map and would not show up as statements.
+    """
+    start = datetime.utcnow() - timedelta(days=1)
+    offset = Media.query.count()
+    rows = []
+    for i in range(count):
+        if i % 2 == 0:
+            uploader = worker or make_employee('worker', world['city'], created_by=world['admin'].id)
+            hotel = make_hotel(world['city'], world['admin'])
+        rows.append({
+            'filename': f"ab/cd/{offset + i:064d}.jpg", 'media_type': 'image', 'uploaded_by': uploader.id,
+            'hotel_id': hotel.id, 'uploaded_at': start + timedelta(seconds=offset + i)
+        })
+    db.session.execute(db.insert(Media), rows)
+    db.session.commit()
+
+
+VIEWS = [
+    ('worker', '/api/media/worker/view'),
+    ('admin', '/api/media/admin/view'),
+    ('superadmin', '/api/media/superadmin/view'),
+]
+
+
+@pytest.mark.parametrize('role, url', VIEWS)
+def test_statement_count_does_not_grow_with_rows(client, world, role, url):
+    viewer = world['viewer'] if role == 'worker' else world[role]
+    only = world['viewer'] if role == 'worker' else None
+    headers = auth_header(viewer)
+    client.get(url, headers=headers)  # first request syncs the token revocation mirror
+
+    counts = []
+    for total in (4, 150):
+        add_media(world, total - Media.query.count(), only)
+        with count_statements() as statements:
+            response = client.get(f"{url}?limit=200", headers=headers)
+        assert response.status_code == 200, response.get_json()
+        assert len(response.get_json()['items']) == total
+        counts.append(len(statements))
+
+    assert counts[0] == counts[1], counts
@@ -0,0 +1,35 @@
+# backend/tests/test_media_streaming.py
+#
+# Media listings requested with Accept: application/x-ndjson stream the rows
+# after the cursor. limit and include_total still apply there.
+import json
+from conftest import auth_header
+from test_media_queries import world, add_media  # noqa: F401 (world is a fixture)
+
+NDJSON = {'Accept': 'application/x-ndjson'}
+
+
+def ndjson_ids(response):
+    assert response.mimetype == 'application/x-ndjson'
+    return [json.loads(line)['id'] for line in response.get_data(as_text=True).splitlines()]
+
+
+def test_streams_every_row_without_a_limit(client, world):
+    add_media(world, 6)
+    response = client.get('/api/media/superadmin/view', headers={**NDJSON, **auth_header(world['superadmin'])})
+    assert len(ndjson_ids(response)) == 6
+    assert 'X-Total-Count' not in response.headers
+
+
+def test_limit_and_total_apply_to_the_stream(client, world):
+    add_media(world, 6)
+    headers = {**NDJSON, **auth_header(world['superadmin'])}
+
+    response = client.get('/api/media/superadmin/view?limit=4&include_total=1', headers=headers)
+    ids = ndjson_ids(response)
+    assert len(ids) == 4
+    assert ids == sorted(ids, reverse=True)
+    assert response.headers['X-Total-Count'] == '6'
+
+    response = client.get('/api/media/superadmin/view?limit=0', headers=headers)
+    assert response.status_code == 400
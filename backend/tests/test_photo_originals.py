@@ -0,0 +1,62 @@
+# backend/tests/test_photo_originals.py
+#
+# Kept photo originals (PHOTO_KEEP_ORIGINALS) still carry their EXIF, GPS
+# included. They are never served under the public /api/uploads path, only to
+# admins of the hotel's city and superadmins.
+import os
+import pytest
+import storage
+from models import db, Media
+from conftest import make_city, make_employee, make_hotel, auth_header
+
+PROCESSED = 'aa/bb/' + 'a' * 64 + '.jpg'
+ORIGINAL = 'cc/dd/' + 'c' * 64 + '.jpg'
+
+
+def write_upload(relpath):
+    path = storage.absolute_path(relpath)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as f:
+        f.write(b'\xff\xd8\xff' + relpath.encode())
+
+
+@pytest.fixture
+def media(app):
+    city = make_city('Pune')
+    admin = make_employee('admin', city, 'admin')
+    worker = make_employee('worker', city, 'worker', created_by=admin.id)
+    media = Media(filename=PROCESSED, original_file=ORIGINAL, media_type='image',
+                  uploaded_by=worker.id, hotel_id=make_hotel(city, admin).id)
+    db.session.add(media)
+    db.session.commit()
+    write_upload(PROCESSED)
+    write_upload(ORIGINAL)
+    return media
+
+
+def test_kept_original_is_not_public(client, media):
+    assert client.get(f"/api/uploads/{PROCESSED}").status_code == 200
+    assert client.get(f"/api/uploads/{ORIGINAL}").status_code == 404
+
+
+def test_same_bytes_served_by_another_row_stay_public(client, media):
+    db.session.add(Media(filename=ORIGINAL, media_type='image',
+                         uploaded_by=media.uploaded_by, hotel_id=media.hotel_id))
+    db.session.commit()
+    assert client.get(f"/api/uploads/{ORIGINAL}").status_code == 200
+
+
+def test_original_route_checks_role_and_city(client, media):
+    url = f"/api/media/{media.id}/original"
+    admin = make_employee('admin', media.hotel.city, 'same-city-admin')
+    other_admin = make_employee('admin', make_city('Mumbai'), 'other-admin')
+
+    response = client.get(url, headers=auth_header(admin))
+    assert response.status_code == 200
+    directives = {d.strip() for d in response.headers['Cache-Control'].split(',')}
+    assert 'private' in directives and 'public' not in directives
+    response.close()
+
+    assert client.get(url).status_code == 401
+    assert client.get(url, headers=auth_header(other_admin)).status_code == 403
+    assert client.get(url, headers=auth_header(media.employee)).status_code == 403
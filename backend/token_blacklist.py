@@ -1,2 +1,102 @@
 # backend/token_blacklist.py
-blacklist = set()
+#
+# Revoked JWTs, shared by all worker processes.
+#
+# Two tables are the source of truth: revoked_tokens (single logged-out tokens,
+# by jti) and token_versions (every token of an employee issued before their
+# version was bumped). Each process keeps a local mirror of both that the
+# per-request check reads, so a lookup is a dict access with no DB round-trip.
+# The mirror pulls rows changed since its last sync at most every
+# TOKEN_REVOCATION_SYNC_SECONDS, which bounds how long a revocation in another
+# process can go unnoticed here. Revoked jtis are dropped from both the mirror
+# and the table once the token would have expired anyway.
+import threading
+import time
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy.exc import IntegrityError
+from models import db, RevokedToken, TokenVersion
+
+PURGE_INTERVAL = 600  # seconds between DELETEs of expired rows
+SYNC_OVERLAP = timedelta(seconds=5)  # re-read window for rows committed late
+
+_lock = threading.Lock()
+_revoked = {}  # jti -> expires_at (naive UTC)
+_versions = {}  # employee_id -> current token version
+_last_sync = None  # datetime of the last successful pull
+_next_sync = 0.0  # monotonic deadline for the next pull
+_next_purge = 0.0
+
+
+def _sync():
+    global _last_sync, _next_sync, _next_purge
+    now = datetime.utcnow()
+    tokens = db.session.query(RevokedToken.jti, RevokedToken.expires_at).filter(
+        RevokedToken.expires_at > now
+    )
+    versions = db.session.query(TokenVersion.employee_id, TokenVersion.version)
+    if _last_sync is not None:
+        tokens = tokens.filter(RevokedToken.revoked_at >= _last_sync - SYNC_OVERLAP)
+        versions = versions.filter(TokenVersion.updated_at >= _last_sync - SYNC_OVERLAP)
+
+    for jti, expires_at in tokens:
+        _revoked[jti] = expires_at
+    for jti in [j for j, exp in _revoked.items() if exp <= now]:
+        del _revoked[jti]
+    for employee_id, version in versions:
+        _versions[employee_id] = version
+
+    _last_sync = now
+    _next_sync = time.monotonic() + current_app.config.get('TOKEN_REVOCATION_SYNC_SECONDS', 1.0)
+
+    if time.monotonic() >= _next_purge:
+        RevokedToken.query.filter(RevokedToken.expires_at <= now).delete(synchronize_session=False)
+        db.session.commit()
+        _next_purge = time.monotonic() + PURGE_INTERVAL
+
+
+def is_revoked(jwt_payload):
+    if time.monotonic() >= _next_sync:
+        with _lock:
+            if time.monotonic() >= _next_sync:
+                _sync()
+
+    if jwt_payload['jti'] in _revoked:
+        return True
+    try:
+        employee_id = int(jwt_payload['sub'])
+    except (KeyError, TypeError, ValueError):
+        return False
+    return jwt_payload.get('ver', 0) < _versions.get(employee_id, 0)
+
+
+def revoke(jti, exp):
+    """Revoke a token until its ``exp`` (a Unix timestamp from the JWT)."""
+    expires_at = datetime.utcfromtimestamp(exp)
+    db.session.add(RevokedToken(jti=jti, expires_at=expires_at))
+    try:
+        db.session.commit()
+    except IntegrityError:
+        db.session.rollback()  # already revoked
+    with _lock:
+        _revoked[jti] = expires_at
+
+
+def current_version(employee_id):
+    row = db.session.get(TokenVersion, employee_id)
+    return row.version if row else 0
+
+
+def revoke_all_for(employee_id):
+    """Invalidate every token issued so far to an employee.
+
+    Only adds to the session; the caller's commit makes it effective.
+    """
+    row = db.session.get(TokenVersion, employee_id)
+    if row is None:
+        row = TokenVersion(employee_id=employee_id, version=0)
+        db.session.add(row)
+    row.version = (row.version or 0) + 1
+    row.updated_at = datetime.utcnow()
+    with _lock:
+        _versions[employee_id] = row.version
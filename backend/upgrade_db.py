@@ -0,0 +1,359 @@
+# backend/upgrade_db.py
+#
+# In-place upgrades for an existing database. db.create_all() only creates
+# missing tables; it never adds columns or indexes to tables that already
+# exist. Run this after pulling model changes:
+#
+#     python upgrade_db.py
+#
+# Every step is idempotent, so running it again is harmless.
+from datetime import datetime
+from sqlalchemy import inspect, text
+from app import create_app
+from models import db, Employee, Hotel, Media, Certificate, Location, LocationHistory, LocationRollup
+from geo import parse_lat_lon, geohash_encode
+import io
+import os
+import storage
+import certificates
+import locations
+import geofence
+import photo_processing
+
+BATCH_SIZE = 1000
+
+
+def _add_column(table, column, ddl):
+    columns = {c['name'] for c in inspect(db.engine).get_columns(table)}
+    if column not in columns:
+        db.session.execute(text(f'ALTER TABLE {table} ADD COLUMN {column} {ddl}'))
+        db.session.commit()
+        print(f"  + {table}.{column}")
+
+
+#=============================
+#========= Media latitude/longitude
+#=============================
+
+def add_media_coordinates():
+    _add_column('media', 'latitude', 'FLOAT')
+    _add_column('media', 'longitude', 'FLOAT')
+
+    # Backfill from the raw location string, one batch of ids at a time.
+    last_id, updated = 0, 0
+    while True:
+        rows = db.session.execute(text(
+            'SELECT id, location FROM media '
+            'WHERE id > :last_id AND latitude IS NULL AND location IS NOT NULL '
+            'ORDER BY id LIMIT :limit'
+        ), {'last_id': last_id, 'limit': BATCH_SIZE}).all()
+        if not rows:
+            break
+        last_id = rows[-1].id
+
+        params = []
+        for row in rows:
+            lat, lon = parse_lat_lon(row.location)
+            if lat is not None:
+                params.append({'id': row.id, 'lat': lat, 'lon': lon})
+        if params:
+            db.session.execute(
+                text('UPDATE media SET latitude = :lat, longitude = :lon WHERE id = :id'),
+                params
+            )
+            db.session.commit()
+            updated += len(params)
+
+    print(f"  media coordinates backfilled: {updated}")
+
+
+#=============================
+#========= Composite indexes
+#=============================
+
+def add_indexes():
+    for model in (Employee, Hotel, Media, Location, LocationHistory, LocationRollup):
+        for index in model.__table__.indexes:
+            index.create(db.engine, checkfirst=True)
+    db.session.execute(text('ANALYZE'))
+    db.session.commit()
+    print("  indexes created")
+
+
+#=============================
+#========= Content-addressed uploads
+#=============================
+
+def move_media_to_content_store():
+    _add_column('media', 'original_filename', 'VARCHAR(255)')
+    _add_column('media', 'content_hash', 'VARCHAR(64)')
+    for index in Media.__table__.indexes:
+        index.create(db.engine, checkfirst=True)
+
+    # Hash each legacy flat file once and move it to its sharded path.
+    last_id, moved, missing = 0, 0, 0
+    while True:
+        rows = db.session.execute(text(
+            'SELECT id, filename FROM media '
+            'WHERE id > :last_id AND content_hash IS NULL '
+            'ORDER BY id LIMIT :limit'
+        ), {'last_id': last_id, 'limit': BATCH_SIZE}).all()
+        if not rows:
+            break
+        last_id = rows[-1].id
+
+        for row in rows:
+            old_path = storage.absolute_path(row.filename)
+            if not os.path.isfile(old_path):
+                missing += 1
+                continue
+            # Legacy names are "<timestamp>_<original name>"
+            original = row.filename.split('_', 1)[-1]
+            ext = row.filename.rsplit('.', 1)[-1]
+            relpath, digest = storage.store_file(old_path, ext)
+            db.session.execute(text(
+                'UPDATE media SET filename = :new, content_hash = :digest, '
+                'original_filename = COALESCE(original_filename, :original) '
+                'WHERE filename = :old'
+            ), {'new': relpath, 'digest': digest, 'original': original, 'old': row.filename})
+            moved += 1
+        db.session.commit()
+
+    print(f"  files moved to content store: {moved} (missing on disk: {missing})")
+
+
+#=============================
+#========= Video metadata
+#=============================
+
+def add_video_metadata():
+    _add_column('media', 'poster_filename', 'VARCHAR(255)')
+    _add_column('media', 'duration', 'FLOAT')
+    _add_column('media', 'width', 'INTEGER')
+    _add_column('media', 'height', 'INTEGER')
+    _add_column('media', 'video_codec', 'VARCHAR(32)')
+
+
+#=============================
+#========= Hotel coordinates
+#=============================
+
+def geocode_hotels():
+    _add_column('hotels', 'latitude', 'FLOAT')
+    _add_column('hotels', 'longitude', 'FLOAT')
+    _add_column('hotels', 'geohash', 'VARCHAR(12)')
+
+    # Hotels whose location text already holds coordinates get them filled in;
+    # the rest wait for an admin to enter latitude/longitude.
+    geocoded = 0
+    for hotel_id, location in db.session.execute(text(
+        'SELECT id, location FROM hotels WHERE geohash IS NULL'
+    )).all():
+        lat, lon = parse_lat_lon(location)
+        if lat is None:
+            continue
+        db.session.execute(
+            text('UPDATE hotels SET latitude = :lat, longitude = :lon, geohash = :geohash WHERE id = :id'),
+            {'lat': lat, 'lon': lon, 'geohash': geohash_encode(lat, lon), 'id': hotel_id}
+        )
+        geocoded += 1
+    db.session.commit()
+    print(f"  hotels geocoded from location text: {geocoded}")
+
+
+#=============================
+#========= Upload geofence
+#=============================
+
+def add_media_geofence():
+    _add_column('media', 'distance_m', 'FLOAT')
+    _add_column('media', 'location_verified', 'BOOLEAN')
+
+    # Only geocoded hotels have anything to compare against; the rest stay NULL.
+    checked = 0
+    for hotel in Hotel.query.filter(Hotel.latitude.isnot(None)).all():
+        checked += geofence.recheck_hotel(hotel, BATCH_SIZE)
+        db.session.commit()
+    print(f"  uploads checked against their hotel: {checked}")
+
+
+#=============================
+#========= Photo processing
+#=============================
+
+def add_photo_columns():
+    _add_column('media', 'original_file', 'VARCHAR(255)')
+    _add_column('media', 'taken_at', 'DATETIME')
+    _add_column('media', 'processed_at', 'DATETIME')
+
+
+def add_content_hash_column():
+    # Indexed now, for the reconciliation sweep's derived-file lookups (see reconcile.py)
+    _add_column('media', 'content_hash', 'VARCHAR(64)')
+
+
+def process_existing_photos():
+    # Same pipeline as new uploads, run inline; rows already done are skipped.
+    last_id, processed = 0, 0
+    while True:
+        ids = [row.id for row in db.session.execute(text(
+            "SELECT id FROM media WHERE id > :last_id AND media_type = 'image' AND processed_at IS NULL "
+            "ORDER BY id LIMIT :limit"
+        ), {'last_id': last_id, 'limit': BATCH_SIZE}).all()]
+        if not ids:
+            break
+        last_id = ids[-1]
+        for media_id in ids:
+            processed += photo_processing.process(media_id)
+        print(f"  ... up to media {last_id}")
+    print(f"  photos processed: {processed}")
+
+
+#=============================
+#========= Certificate files
+#=============================
+
+def move_certificates_to_files():
+    columns = {c['name'] for c in inspect(db.engine).get_columns('certificates')}
+    if 'certificate' in columns:
+        _stream_certificate_blobs()
+    for index in Certificate.__table__.indexes:
+        index.create(db.engine, checkfirst=True)
+
+
+def _stream_certificate_blobs():
+    _add_column('certificates', 'filename', 'VARCHAR(255)')
+    _add_column('certificates', 'content_hash', 'VARCHAR(64)')
+    _add_column('certificates', 'size', 'BIGINT')
+    _add_column('certificates', 'mime_type', 'VARCHAR(100)')
+    _add_column('certificates', 'uploaded_at', 'DATETIME')
+
+    # Each blob is streamed to its file in COPY_BUFFER_SIZE pieces through
+    # sqlite3's incremental blob I/O, so no certificate is ever whole in memory.
+    last_id, moved = 0, 0
+    while True:
+        ids = [row.id for row in db.session.execute(text(
+            'SELECT id FROM certificates WHERE id > :last_id AND content_hash IS NULL '
+            'ORDER BY id LIMIT :limit'
+        ), {'last_id': last_id, 'limit': BATCH_SIZE})]
+        if not ids:
+            break
+        last_id = ids[-1]
+
+        connection = db.session.connection().connection.driver_connection
+        for certificate_id in ids:
+            if hasattr(connection, 'blobopen'):
+                blob = connection.blobopen('certificates', 'certificate', certificate_id, readonly=True)
+            else:  # other databases: one certificate in memory at a time
+                blob = io.BytesIO(db.session.execute(text(
+                    'SELECT certificate FROM certificates WHERE id = :id'), {'id': certificate_id}).scalar())
+            with blob:
+                mime_type = certificates.sniff_mime(blob.read(certificates.SNIFF_BYTES)) or 'application/octet-stream'
+                blob.seek(0)
+                content_hash, size = certificates.save(blob, mime_type)
+            db.session.execute(text(
+                'UPDATE certificates SET content_hash = :hash, size = :size, mime_type = :mime, '
+                'uploaded_at = COALESCE(uploaded_at, :now) WHERE id = :id'
+            ), {'hash': content_hash, 'size': size, 'mime': mime_type, 'now': datetime.utcnow(), 'id': certificate_id})
+            moved += 1
+        db.session.commit()
+
+    db.session.execute(text('ALTER TABLE certificates DROP COLUMN certificate'))
+    db.session.commit()
+    # Hand the blobs' pages back to the filesystem
+    with db.engine.connect().execution_options(isolation_level='AUTOCOMMIT') as connection:
+        connection.execute(text('VACUUM'))
+    print(f"  certificates moved to {certificates.folder()}: {moved}")
+
+
+#=============================
+#========= Background jobs
+#=============================
+
+def add_job_progress():
+    _add_column('jobs', 'progress', 'TEXT')
+
+
+#=============================
+#========= Location history
+#=============================
+
+def keep_latest_location_only():
+    _add_column('locations', 'updated_at', 'DATETIME')
+    db.session.execute(text('UPDATE locations SET updated_at = timestamp WHERE updated_at IS NULL'))
+    db.session.commit()
+
+    # locations is now the one-row-per-worker latest position; drop older
+    # duplicates so add_indexes can create its unique index.
+    result = db.session.execute(text(
+        'DELETE FROM locations WHERE id NOT IN ('
+        '  SELECT MAX(id) FROM locations GROUP BY worker_id'
+        ')'
+    ))
+    db.session.commit()
+    print(f"  duplicate latest positions removed: {result.rowcount}")
+
+    # Seed the history with the positions we have
+    result = db.session.execute(text(
+        'INSERT INTO location_history (worker_id, latitude, longitude, recorded_at, received_at) '
+        'SELECT l.worker_id, l.latitude, l.longitude, l.timestamp, l.timestamp FROM locations l '
+        'WHERE l.timestamp IS NOT NULL AND NOT EXISTS ('
+        '  SELECT 1 FROM location_history h '
+        '  WHERE h.worker_id = l.worker_id AND h.recorded_at = l.timestamp'
+        ')'
+    ))
+    db.session.commit()
+    print(f"  history seeded with {result.rowcount} positions")
+
+
+def build_location_rollups():
+    # Rollups are kept up to date at ingest; fill them once from existing history.
+    # One transaction, so an interrupted run leaves the table empty and is redone.
+    if db.session.query(LocationRollup.id).first() is not None:
+        print("  rollups already built")
+        return
+
+    last_id, total = 0, 0
+    while True:
+        rows = db.session.query(
+            LocationHistory.id, LocationHistory.worker_id,
+            LocationHistory.latitude, LocationHistory.longitude, LocationHistory.recorded_at
+        ).filter(LocationHistory.id > last_id).order_by(LocationHistory.id).limit(BATCH_SIZE).all()
+        if not rows:
+            break
+        by_worker = {}
+        for _, worker_id, latitude, longitude, recorded_at in rows:
+            by_worker.setdefault(worker_id, []).append((latitude, longitude, recorded_at))
+        for worker_id, points in by_worker.items():
+            locations.add_to_rollups(worker_id, points)
+        last_id = rows[-1].id
+        total += len(rows)
+    db.session.commit()
+    print(f"  rolled up {total} history points")
+
+
+STEPS = [
+    add_media_coordinates,
+    keep_latest_location_only,  # before add_indexes (unique locations.worker_id)
+    geocode_hotels,  # before add_indexes (hotels.geohash)
+    add_media_geofence,  # after geocode_hotels, before add_indexes (media.location_verified)
+    add_photo_columns,  # before add_indexes (media.original_file)
+    add_content_hash_column,  # before add_indexes (media.content_hash)
+    add_indexes,
+    move_media_to_content_store,
+    add_video_metadata,
+    build_location_rollups,
+    add_job_progress,
+    move_certificates_to_files,
+    process_existing_photos,  # after move_media_to_content_store
+]
+
+
+if __name__ == '__main__':
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+        for step in STEPS:
+            print(f"▶ {step.__name__}")
+            step()
+    print("✅ Database upgraded successfully.")
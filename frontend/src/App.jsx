@@ -27,13 +27,15 @@ export default function App() {
   const handleLogout = async () => {
     const token = sessionStorage.getItem("token");
     try {
-      await axios.post("/api/logout", {}, {
+      const refreshToken = sessionStorage.getItem("refresh_token");
+      await axios.post("/api/logout", { refresh_token: refreshToken }, {
         headers: { Authorization: `Bearer ${token}` },
       });
     } catch (err) {
       console.error("Logout failed", err);
     } finally {
       sessionStorage.removeItem("token");
+      sessionStorage.removeItem("refresh_token");
       sessionStorage.removeItem("role");
       sessionStorage.removeItem("username");
       setIsLoggedIn(false);
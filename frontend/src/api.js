@@ -1,5 +1,6 @@
 // src/api.js
 import axios from "axios";
+import { refreshOnUnauthorized } from "./utils/tokenHelper";
 
 const API = axios.create({
   baseURL: "/api", // 🔄 If using Vite proxy
@@ -15,6 +16,9 @@ API.interceptors.request.use((config) => {
   return config;
 });
 
+// 🔄 Renew an expired access token with the refresh token
+refreshOnUnauthorized(API);
+
 // 🔐 Optional: Token getter
 export const getAuthToken = () => {
   return sessionStorage.getItem("token");
@@ -34,7 +38,7 @@ export const login = async (data) => {
 // 🔴 LOGOUT
 export const logout = async () => {
   try {
-    const res = await API.post("/logout");
+    const res = await API.post("/logout", { refresh_token: sessionStorage.getItem("refresh_token") });
     return res.data;
   } catch (error) {
     console.error("Logout error:", error);
@@ -20,6 +20,7 @@ export default function Login() {
       });
 
       sessionStorage.setItem("token", res.data.access_token);
+      sessionStorage.setItem("refresh_token", res.data.refresh_token);
       sessionStorage.setItem("user", JSON.stringify(res.data.user));
 
       const role = res.data.user.role;
@@ -8,6 +8,7 @@ import "./SuperAdminMedia.css";
  
 function SuperAdminMedia() {
   const [media, setMedia] = useState([]);
+  const [nextCursor, setNextCursor] = useState(null);
   const [areas, setAreas] = useState([]);
   const [hotels, setHotels] = useState([]);
   const [workers, setWorkers] = useState([]);
@@ -34,13 +35,16 @@ function SuperAdminMedia() {
     }
   };
  
-  const fetchMedia = async () => {
+  const fetchMedia = async (cursor = null) => {
     try {
-      const query = new URLSearchParams(filters).toString();
+      const params = { ...filters };
+      if (cursor) params.cursor = cursor;
+      const query = new URLSearchParams(params).toString();
       const res = await axios.get(`/api/media/superadmin/view?${query}`, {
         headers: { Authorization: `Bearer ${token}` },
       });
-      setMedia(res.data);
+      setMedia((prev) => (cursor ? [...prev, ...res.data.items] : res.data.items));
+      setNextCursor(res.data.next_cursor);
     } catch (err) {
       console.error("Error fetching media", err);
     }
@@ -170,9 +174,9 @@ function SuperAdminMedia() {
             {media.map((m) => (
               <div key={m.id} className="media-card" onClick={() => setSelectedMedia(m)}>
                 {m.media_type === "image" ? (
-                  <img src={m.file_url} alt={m.description || "Media"} />
+                  <img src={m.thumb_url || m.file_url} alt={m.description || "Media"} />
                 ) : (
-                  <video src={m.file_url} muted />
+                  <video src={m.file_url} poster={m.poster_url || undefined} preload="none" muted />
                 )}
                 <p><strong>Type:</strong> {m.media_type}</p>
                 <p><strong>Hotel:</strong> {m.hotel?.name || "Unknown"}</p>
@@ -196,12 +200,18 @@ function SuperAdminMedia() {
           </div>
         )}
  
+        {nextCursor && (
+          <button className="clear-filters-button" onClick={() => fetchMedia(nextCursor)}>
+            Load More
+          </button>
+        )}
+ 
         {/* Media Preview Modal */}
         {selectedMedia && (
           <div className="media-modal" onClick={closeModal}>
             <div className="media-modal-content" onClick={(e) => e.stopPropagation()}>
               {selectedMedia.media_type === "image" ? (
-                <img src={selectedMedia.file_url} alt="Expanded" />
+                <img src={selectedMedia.preview_url || selectedMedia.file_url} alt="Expanded" />
               ) : (
                 <video src={selectedMedia.file_url} controls autoPlay />
               )}
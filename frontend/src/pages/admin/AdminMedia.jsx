@@ -6,6 +6,7 @@ import "./AdminMedia.css";
  
 function AdminMedia() {
   const [media, setMedia] = useState([]);
+  const [nextCursor, setNextCursor] = useState(null);
   const [filters, setFilters] = useState({
     hotel_id: '',
     worker_id: '',
@@ -27,13 +28,16 @@ function AdminMedia() {
     }
   };
  
-  const fetchMedia = async () => {
+  const fetchMedia = async (cursor = null) => {
     try {
-      const query = new URLSearchParams(filters).toString();
+      const params = { ...filters };
+      if (cursor) params.cursor = cursor;
+      const query = new URLSearchParams(params).toString();
       const res = await axios.get(`/api/media/admin/view?${query}`, {
         headers: { Authorization: `Bearer ${token}` },
       });
-      setMedia(res.data);
+      setMedia((prev) => (cursor ? [...prev, ...res.data.items] : res.data.items));
+      setNextCursor(res.data.next_cursor);
     } catch (err) {
       console.error("Error fetching media", err);
     }
@@ -129,10 +133,10 @@ function AdminMedia() {
               onClick={() => setModalMedia(m)}
             >
               {m.media_type === 'image' && (
-                <img src={m.file_url} alt={m.description} className="media-thumbnail" />
+                <img src={m.thumb_url || m.file_url} alt={m.description} className="media-thumbnail" />
               )}
               {m.media_type === 'video' && (
-                <video src={m.file_url} className="media-thumbnail" muted />
+                <video src={m.file_url} poster={m.poster_url || undefined} preload="none" className="media-thumbnail" muted />
               )}
             </div>
  
@@ -159,13 +163,19 @@ function AdminMedia() {
         ))}
       </div>
  
+      {nextCursor && (
+        <button className="clear-btn" onClick={() => fetchMedia(nextCursor)}>
+          Load More
+        </button>
+      )}
+ 
       {/* Modal */}
       {modalMedia && (
         <div className="media-modal" onClick={() => setModalMedia(null)}>
           <div className="media-modal-content" onClick={(e) => e.stopPropagation()}>
             <span className="modal-close" onClick={() => setModalMedia(null)}>&times;</span>
             {modalMedia.media_type === 'image' && (
-              <img src={modalMedia.file_url} alt="Full view" />
+              <img src={modalMedia.preview_url || modalMedia.file_url} alt="Full view" />
             )}
             {modalMedia.media_type === 'video' && (
               <video src={modalMedia.file_url} controls autoPlay />
@@ -4,6 +4,7 @@ import "./WorkerMedia.css";
 
 function WorkerMedia() {
   const [media, setMedia] = useState([]);
+  const [nextCursor, setNextCursor] = useState(null);
   const [hotels, setHotels] = useState([]);
   const [filters, setFilters] = useState({ hotel_id: '', media_type: '' });
   const [selectedMedia, setSelectedMedia] = useState(null);
@@ -22,13 +23,16 @@ function WorkerMedia() {
     }
   };
 
-  const fetchMedia = async () => {
+  const fetchMedia = async (cursor = null) => {
     try {
-      const query = new URLSearchParams(filters).toString();
+      const params = { ...filters };
+      if (cursor) params.cursor = cursor;
+      const query = new URLSearchParams(params).toString();
       const res = await axios.get(`/api/media/worker/view?${query}`, {
         headers: { Authorization: `Bearer ${token}` },
       });
-      setMedia(res.data);
+      setMedia((prev) => (cursor ? [...prev, ...res.data.items] : res.data.items));
+      setNextCursor(res.data.next_cursor);
     } catch (err) {
       console.error("Error fetching media", err);
     }
@@ -102,9 +106,9 @@ function WorkerMedia() {
             {media.map((m) => (
               <div key={m.id} className="media-card" onClick={() => setSelectedMedia(m)}>
                 {m.media_type === "image" ? (
-                  <img src={m.file_url} alt={m.description || "Media"} />
+                  <img src={m.thumb_url || m.file_url} alt={m.description || "Media"} />
                 ) : (
-                  <video src={m.file_url} muted />
+                  <video src={m.file_url} poster={m.poster_url || undefined} preload="none" muted />
                 )}
                 <p><strong>Type:</strong> {m.media_type}</p>
                 <p><strong>Hotel:</strong> {m.hotel?.name || "Unknown"}</p>
@@ -118,11 +122,17 @@ function WorkerMedia() {
           </div>
         )}
 
+        {nextCursor && (
+          <button className="clear-filters-button" onClick={() => fetchMedia(nextCursor)}>
+            Load More
+          </button>
+        )}
+
         {selectedMedia && (
           <div className="media-modal" onClick={closeModal}>
             <div className="media-modal-content" onClick={(e) => e.stopPropagation()}>
               {selectedMedia.media_type === "image" ? (
-                <img src={selectedMedia.file_url} alt="Expanded" />
+                <img src={selectedMedia.preview_url || selectedMedia.file_url} alt="Expanded" />
               ) : (
                 <video src={selectedMedia.file_url} controls autoPlay />
               )}
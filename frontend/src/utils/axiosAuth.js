@@ -1,5 +1,6 @@
 // src/utils/axiosAuth.js
 import axios from 'axios';
+import { refreshOnUnauthorized } from './tokenHelper';
 
 const API = axios.create({
   baseURL: 'http://localhost:5000/api',
@@ -13,4 +14,6 @@ API.interceptors.request.use((config) => {
   return config;
 });
 
+refreshOnUnauthorized(API);
+
 export default API;
@@ -1,3 +1,5 @@
+import axios from 'axios';
+
 export function getUserRole() {
   const token = sessionStorage.getItem('token');
   if (!token) return null;
@@ -21,3 +23,38 @@ export function decodeJWT() {
     return null;
   }
 }
+
+// On a 401, trade the refresh token for a new access token once and retry,
+// so an expired access token doesn't send the user back to the login form.
+export function refreshOnUnauthorized(api) {
+  let pending = null;
+
+  api.interceptors.response.use(
+    (response) => response,
+    async (error) => {
+      const original = error.config;
+      const refreshToken = sessionStorage.getItem('refresh_token');
+      if (error.response?.status !== 401 || !refreshToken || !original || original._retried) {
+        return Promise.reject(error);
+      }
+      original._retried = true;
+
+      try {
+        // Plain axios: the instance's request interceptor would send the expired access token
+        pending = pending || axios.post('/refresh', null, {
+          baseURL: api.defaults.baseURL,
+          headers: { Authorization: `Bearer ${refreshToken}` },
+        });
+        const res = await pending;
+        sessionStorage.setItem('token', res.data.access_token);
+      } catch (refreshError) {
+        return Promise.reject(error);
+      } finally {
+        pending = null;
+      }
+
+      original.headers.Authorization = `Bearer ${sessionStorage.getItem('token')}`;
+      return api(original);
+    }
+  );
+}